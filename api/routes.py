@@ -1,5 +1,6 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, g
 from functools import wraps
+import contextvars
 import sys
 import os
 
@@ -11,9 +12,33 @@ from database import (
     get_transactions_by_date_range, update_transaction, delete_transaction,
     create_income, get_income, get_all_income,
     get_income_by_date_range, update_income, delete_income,
-    create_user, authenticate_user, validate_token, logout_user
+    iter_transactions_by_date_range, iter_income_by_date_range,
+    TRANSACTION_COLUMNS, INCOME_COLUMNS,
+    get_transactions_columnar, get_income_columnar,
+    bulk_update_transactions, bulk_delete_transactions,
+    bulk_update_income, bulk_delete_income,
+    get_ledger_page,
+    get_categories, rename_category, get_sources, rename_source,
+    get_account_balance, get_balance_history,
+    create_budget, get_budget, get_all_budgets, update_budget, delete_budget,
+    get_budget_status,
+    create_recurring_schedule, get_recurring_schedule, get_all_recurring_schedules,
+    update_recurring_schedule, delete_recurring_schedule,
+    get_database_stats, snapshot, main_database, get_fx_rates,
+    create_user, authenticate_user, logout_user, get_token_user, tenant
 )
-from services import StatsService, ForecastService
+from services import (
+    StatsService, ForecastService, ExportService, ImportService, SimulationService, AnomalyService,
+    RecurringService, MaintenanceService, BackupService, FxService
+)
+from config import (
+    IMPORT_ERROR_LIMIT, RECONCILE_WINDOW_DAYS, SIMULATION_PATHS, ANOMALY_THRESHOLD,
+    FORECAST_BOOTSTRAP_REPLICATES, FORECAST_BOOTSTRAP_MAX_REPLICATES,
+    BACKUP_STEP_PAGES, BACKUP_STEP_SLEEP, ADMIN_USERNAMES
+)
+
+
+LIST_FORMATS = ('json', 'columnar')
 
 
 def require_auth(f):
@@ -24,15 +49,142 @@ def require_auth(f):
         if token and token.startswith('Bearer '):
             token = token[7:]
 
-        if not token or not validate_token(token):
+        user = get_token_user(token)
+        if not user:
             return jsonify({"error": "Unauthorized. Please login first."}), 401
 
+        g.user = user
+        # Every query in the view goes to this user's own database
+        with tenant(user["id"]):
+            return f(*args, **kwargs)
+
+    return decorated
+
+
+def require_admin(f):
+    # Goes under require_auth; only ADMIN_USERNAMES get through
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if g.user["username"] not in ADMIN_USERNAMES:
+            return jsonify({"error": "Admin access required"}), 403
         return f(*args, **kwargs)
 
     return decorated
 
 
+def snapshot_arg(f):
+    # ?snapshot=<backup id> runs the view against that point-in-time copy
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        backup_id = request.args.get('snapshot')
+        if not backup_id:
+            return f(*args, **kwargs)
+
+        try:
+            path = BackupService.snapshot_path(backup_id)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        with snapshot(path):
+            return f(*args, **kwargs)
+
+    return decorated
+
+
+def parse_fields_arg():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+def parse_bool_arg(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def optional_int(data, name):
+    return int(data[name]) if data.get(name) is not None else None
+
+
+def parse_replicates_arg():
+    # Bootstrap replicates for forecast intervals; None when intervals are off
+    if not parse_bool_arg('intervals'):
+        return None
+    replicates = request.args.get('replicates', default=FORECAST_BOOTSTRAP_REPLICATES, type=int)
+    if replicates < 100 or replicates > FORECAST_BOOTSTRAP_MAX_REPLICATES:
+        raise ValueError(f"replicates must be between 100 and {FORECAST_BOOTSTRAP_MAX_REPLICATES}")
+    return replicates
+
+
+def parse_base_currency_arg():
+    # ?base_currency=XXX converts amounts before aggregating; None keeps each
+    # account's own currency
+    base_currency = request.args.get('base_currency')
+    return FxService.validate_currency(base_currency) if base_currency else None
+
+
+def transaction_filter_args():
+    return {
+        "from_date": request.args.get('from'),
+        "to_date": request.args.get('to'),
+        "account_id": request.args.get('account_id'),
+        "type": request.args.get('type'),
+        "category": request.args.get('category')
+    }
+
+
+def income_filter_args():
+    return {
+        "from_date": request.args.get('from'),
+        "to_date": request.args.get('to'),
+        "account_id": request.args.get('account_id'),
+        "source": request.args.get('source')
+    }
+
+
+def stream_in_context(body):
+    # Streamed bodies are consumed after the view returns and require_auth has
+    # left the tenant block, so the context is copied here, while the view
+    # runs; each step then runs in it and queries still reach the tenant's database
+    context = contextvars.copy_context()
+
+    def steps():
+        try:
+            while True:
+                try:
+                    yield context.run(next, body)
+                except StopIteration:
+                    return
+        finally:
+            context.run(body.close)
+
+    return steps()
+
+
+def export_response(name, fmt, columns, chunks):
+    body = ExportService.encode(fmt, columns, chunks)
+    mimetype = ExportService.FORMATS[fmt]
+    filename = f"{name}.{fmt}"
+
+    if parse_bool_arg('gzip'):
+        body = ExportService.gzip_stream(body)
+        mimetype = "application/gzip"
+        filename += ".gz"
+
+    return Response(
+        stream_in_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 def register_routes(app):
+
+    @app.before_request
+    def note_activity():
+        # Background maintenance waits for the API to go quiet
+        MaintenanceService.touch()
+
     # ==================== AUTH ROUTES (Public) ====================
 
     @app.route('/auth/register', methods=['POST'])
@@ -95,13 +247,19 @@ def register_routes(app):
     @app.route('/accounts', methods=['GET'])
     @require_auth
     def list_accounts():
-        accounts = get_all_accounts()
+        try:
+            accounts = get_all_accounts(fields=parse_fields_arg())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         return jsonify({"accounts": accounts, "count": len(accounts)})
 
     @app.route('/accounts/<account_id>', methods=['GET'])
     @require_auth
     def get_single_account(account_id):
-        account = get_account(account_id)
+        try:
+            account = get_account(account_id, fields=parse_fields_arg())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if not account:
             return jsonify({"error": f"Account '{account_id}' not found"}), 404
         return jsonify(account)
@@ -155,6 +313,39 @@ def register_routes(app):
             return jsonify({"message": f"Account '{account_id}' deleted"})
         return jsonify({"error": f"Account '{account_id}' not found"}), 404
 
+    @app.route('/accounts/<account_id>/balance', methods=['GET'])
+    @require_auth
+    def get_balance(account_id):
+        account = get_account(account_id)
+        if not account:
+            return jsonify({"error": f"Account '{account_id}' not found"}), 404
+
+        try:
+            balance = get_account_balance(account_id, as_of=request.args.get('as_of'))
+            balance["currency"] = account["currency"]
+            return jsonify(balance)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/accounts/<account_id>/balance_history', methods=['GET'])
+    @require_auth
+    def get_account_balance_history(account_id):
+        account = get_account(account_id)
+        if not account:
+            return jsonify({"error": f"Account '{account_id}' not found"}), 404
+
+        try:
+            history = get_balance_history(
+                account_id,
+                granularity=request.args.get('granularity', 'month'),
+                from_month=request.args.get('from'),
+                to_month=request.args.get('to')
+            )
+            history["currency"] = account["currency"]
+            return jsonify(history)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     # ==================== TRANSACTION ROUTES (Protected) ====================
 
     @app.route('/transactions', methods=['GET'])
@@ -165,18 +356,35 @@ def register_routes(app):
         account_id = request.args.get('account_id')
         type_filter = request.args.get('type')
         category = request.args.get('category')
+        fields = parse_fields_arg()
+        fmt = request.args.get('format', 'json')
+
+        if fmt not in LIST_FORMATS:
+            return jsonify({"error": "format must be 'json' or 'columnar'"}), 400
 
         try:
+            if fmt == 'columnar':
+                columns, data, count = get_transactions_columnar(
+                    from_date=from_date,
+                    to_date=to_date,
+                    account_id=account_id,
+                    type=type_filter,
+                    category=category,
+                    fields=fields
+                )
+                return jsonify({"columns": columns, "data": data, "count": count})
+
             if from_date or to_date or account_id or type_filter or category:
                 transactions = get_transactions_by_date_range(
                     from_date=from_date,
                     to_date=to_date,
                     account_id=account_id,
                     type=type_filter,
-                    category=category
+                    category=category,
+                    fields=fields
                 )
             else:
-                transactions = get_all_transactions()
+                transactions = get_all_transactions(fields=fields)
 
             return jsonify({"transactions": transactions, "count": len(transactions)})
         except ValueError as e:
@@ -185,7 +393,10 @@ def register_routes(app):
     @app.route('/transactions/<transaction_id>', methods=['GET'])
     @require_auth
     def get_single_transaction(transaction_id):
-        transaction = get_transaction(transaction_id)
+        try:
+            transaction = get_transaction(transaction_id, fields=parse_fields_arg())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if not transaction:
             return jsonify({"error": f"Transaction '{transaction_id}' not found"}), 404
         return jsonify(transaction)
@@ -242,11 +453,54 @@ def register_routes(app):
     @app.route('/transactions/<transaction_id>', methods=['DELETE'])
     @require_auth
     def remove_transaction(transaction_id):
-        deleted = delete_transaction(transaction_id)
+        try:
+            deleted = delete_transaction(transaction_id)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if deleted:
             return jsonify({"message": f"Transaction '{transaction_id}' deleted"})
         return jsonify({"error": f"Transaction '{transaction_id}' not found"}), 404
 
+    @app.route('/transactions', methods=['PATCH'])
+    @require_auth
+    def bulk_edit_transactions():
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        try:
+            changes = dict(data)
+            if 'amount' in changes:
+                changes['amount'] = float(changes['amount'])
+            result = bulk_update_transactions(
+                **transaction_filter_args(),
+                changes=changes,
+                dry_run=parse_bool_arg('dry_run')
+            )
+            # Bulk updates skip the per-row anomaly updates; recompute them in
+            # one pass when the expense series changed (dates set its order)
+            if result["changed"] and {'amount', 'type', 'category', 'date'} & set(changes):
+                AnomalyService.backfill()
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/transactions', methods=['DELETE'])
+    @require_auth
+    def bulk_remove_transactions():
+        try:
+            result = bulk_delete_transactions(
+                **transaction_filter_args(),
+                dry_run=parse_bool_arg('dry_run')
+            )
+            # The category statistics still include the deleted expenses
+            if result["changed"]:
+                AnomalyService.backfill()
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     # ==================== INCOME ROUTES (Protected) ====================
 
     @app.route('/income', methods=['GET'])
@@ -256,17 +510,33 @@ def register_routes(app):
         to_date = request.args.get('to')
         account_id = request.args.get('account_id')
         source = request.args.get('source')
+        fields = parse_fields_arg()
+        fmt = request.args.get('format', 'json')
+
+        if fmt not in LIST_FORMATS:
+            return jsonify({"error": "format must be 'json' or 'columnar'"}), 400
 
         try:
+            if fmt == 'columnar':
+                columns, data, count = get_income_columnar(
+                    from_date=from_date,
+                    to_date=to_date,
+                    account_id=account_id,
+                    source=source,
+                    fields=fields
+                )
+                return jsonify({"columns": columns, "data": data, "count": count})
+
             if from_date or to_date or account_id or source:
                 income_list = get_income_by_date_range(
                     from_date=from_date,
                     to_date=to_date,
                     account_id=account_id,
-                    source=source
+                    source=source,
+                    fields=fields
                 )
             else:
-                income_list = get_all_income()
+                income_list = get_all_income(fields=fields)
 
             return jsonify({"income": income_list, "count": len(income_list)})
         except ValueError as e:
@@ -275,7 +545,10 @@ def register_routes(app):
     @app.route('/income/<income_id>', methods=['GET'])
     @require_auth
     def get_single_income(income_id):
-        income = get_income(income_id)
+        try:
+            income = get_income(income_id, fields=parse_fields_arg())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if not income:
             return jsonify({"error": f"Income '{income_id}' not found"}), 404
         return jsonify(income)
@@ -328,63 +601,632 @@ def register_routes(app):
     @app.route('/income/<income_id>', methods=['DELETE'])
     @require_auth
     def remove_income(income_id):
-        deleted = delete_income(income_id)
+        try:
+            deleted = delete_income(income_id)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if deleted:
             return jsonify({"message": f"Income '{income_id}' deleted"})
         return jsonify({"error": f"Income '{income_id}' not found"}), 404
 
+    @app.route('/income', methods=['PATCH'])
+    @require_auth
+    def bulk_edit_income():
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        try:
+            changes = dict(data)
+            if 'amount' in changes:
+                changes['amount'] = float(changes['amount'])
+            result = bulk_update_income(
+                **income_filter_args(),
+                changes=changes,
+                dry_run=parse_bool_arg('dry_run')
+            )
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/income', methods=['DELETE'])
+    @require_auth
+    def bulk_remove_income():
+        try:
+            result = bulk_delete_income(
+                **income_filter_args(),
+                dry_run=parse_bool_arg('dry_run')
+            )
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ==================== LEDGER ROUTES (Protected) ====================
+
+    @app.route('/ledger', methods=['GET'])
+    @require_auth
+    def get_ledger():
+        try:
+            page = get_ledger_page(
+                **transaction_filter_args(),
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', default=100, type=int)
+            )
+            return jsonify(page)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ==================== CATEGORY ROUTES (Protected) ====================
+
+    @app.route('/categories', methods=['GET'])
+    @require_auth
+    def list_categories():
+        categories = get_categories()
+        return jsonify({"categories": categories, "count": len(categories)})
+
+    @app.route('/categories/<int:category_id>', methods=['PUT'])
+    @require_auth
+    def edit_category(category_id):
+        data = request.get_json(silent=True) or {}
+
+        try:
+            category = rename_category(category_id, data.get('name'))
+            if not category:
+                return jsonify({"error": "Category not found"}), 404
+            return jsonify(category)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/sources', methods=['GET'])
+    @require_auth
+    def list_sources():
+        sources = get_sources()
+        return jsonify({"sources": sources, "count": len(sources)})
+
+    @app.route('/sources/<int:source_id>', methods=['PUT'])
+    @require_auth
+    def edit_source(source_id):
+        data = request.get_json(silent=True) or {}
+
+        try:
+            source = rename_source(source_id, data.get('name'))
+            if not source:
+                return jsonify({"error": "Source not found"}), 404
+            return jsonify(source)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ==================== BUDGET ROUTES (Protected) ====================
+
+    @app.route('/budgets', methods=['GET'])
+    @require_auth
+    def list_budgets():
+        budgets = get_all_budgets()
+        return jsonify({"budgets": budgets, "count": len(budgets)})
+
+    @app.route('/budgets/status', methods=['GET'])
+    @require_auth
+    def get_budgets_status():
+        try:
+            status = get_budget_status(month=request.args.get('month'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if parse_bool_arg('over_only'):
+            status = [budget for budget in status if budget["over_budget"]]
+        return jsonify({"budgets": status, "count": len(status)})
+
+    @app.route('/budgets/<budget_id>', methods=['GET'])
+    @require_auth
+    def get_single_budget(budget_id):
+        budget = get_budget(budget_id)
+        if not budget:
+            return jsonify({"error": f"Budget '{budget_id}' not found"}), 404
+        return jsonify(budget)
+
+    @app.route('/budgets/<budget_id>/status', methods=['GET'])
+    @require_auth
+    def get_single_budget_status(budget_id):
+        try:
+            status = get_budget_status(month=request.args.get('month'), budget_id=budget_id)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not status:
+            return jsonify({"error": f"Budget '{budget_id}' not found"}), 404
+        return jsonify(status[0])
+
+    @app.route('/budgets', methods=['POST'])
+    @require_auth
+    def add_budget():
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        required = ['id', 'name', 'amount']
+        for field in required:
+            if field not in data:
+                return jsonify({"error": f"'{field}' is required"}), 400
+
+        try:
+            budget = create_budget(
+                id=data['id'],
+                name=data['name'],
+                amount=float(data['amount']),
+                category=data.get('category'),
+                account_id=data.get('account_id'),
+                currency=data.get('currency')
+            )
+            return jsonify(budget), 201
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/budgets/<budget_id>', methods=['PUT'])
+    @require_auth
+    def edit_budget(budget_id):
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        try:
+            amount = float(data['amount']) if 'amount' in data else None
+            budget = update_budget(
+                budget_id=budget_id,
+                name=data.get('name'),
+                amount=amount,
+                category=data.get('category'),
+                account_id=data.get('account_id'),
+                currency=data.get('currency')
+            )
+            return jsonify(budget)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/budgets/<budget_id>', methods=['DELETE'])
+    @require_auth
+    def remove_budget(budget_id):
+        deleted = delete_budget(budget_id)
+        if deleted:
+            return jsonify({"message": f"Budget '{budget_id}' deleted"})
+        return jsonify({"error": f"Budget '{budget_id}' not found"}), 404
+
+    # ==================== RECURRING ROUTES (Protected) ====================
+
+    @app.route('/recurring', methods=['GET'])
+    @require_auth
+    def list_recurring_schedules():
+        schedules = get_all_recurring_schedules(active_on=request.args.get('active_on'))
+        return jsonify({"schedules": schedules, "count": len(schedules)})
+
+    @app.route('/recurring/<schedule_id>', methods=['GET'])
+    @require_auth
+    def get_single_recurring_schedule(schedule_id):
+        schedule = get_recurring_schedule(schedule_id)
+        if not schedule:
+            return jsonify({"error": f"Schedule '{schedule_id}' not found"}), 404
+        return jsonify(schedule)
+
+    @app.route('/recurring', methods=['POST'])
+    @require_auth
+    def add_recurring_schedule():
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        required = ['id', 'name', 'target', 'account_id', 'amount', 'frequency', 'start_date']
+        for field in required:
+            if field not in data:
+                return jsonify({"error": f"'{field}' is required"}), 400
+
+        try:
+            schedule = create_recurring_schedule(
+                id=data['id'],
+                name=data['name'],
+                target=data['target'],
+                account_id=data['account_id'],
+                amount=float(data['amount']),
+                frequency=data['frequency'],
+                start_date=data['start_date'],
+                type=data.get('type'),
+                category=data.get('category'),
+                note=data.get('note'),
+                interval=int(data.get('interval', 1)),
+                day_of_month=optional_int(data, 'day_of_month'),
+                weekday=optional_int(data, 'weekday'),
+                week_of_month=optional_int(data, 'week_of_month'),
+                end_date=data.get('end_date')
+            )
+            return jsonify(schedule), 201
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/recurring/<schedule_id>', methods=['PUT'])
+    @require_auth
+    def edit_recurring_schedule(schedule_id):
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        try:
+            amount = float(data['amount']) if 'amount' in data else None
+            schedule = update_recurring_schedule(
+                schedule_id=schedule_id,
+                name=data.get('name'),
+                amount=amount,
+                category=data.get('category'),
+                note=data.get('note'),
+                end_date=data.get('end_date')
+            )
+            return jsonify(schedule)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/recurring/<schedule_id>', methods=['DELETE'])
+    @require_auth
+    def remove_recurring_schedule(schedule_id):
+        deleted = delete_recurring_schedule(schedule_id)
+        if deleted:
+            return jsonify({"message": f"Schedule '{schedule_id}' deleted"})
+        return jsonify({"error": f"Schedule '{schedule_id}' not found"}), 404
+
+    @app.route('/recurring/materialize', methods=['POST'])
+    @require_auth
+    def materialize_recurring():
+        data = request.get_json(silent=True) or {}
+
+        try:
+            result = RecurringService.materialize(
+                through=data.get('through'),
+                schedule_id=data.get('schedule_id')
+            )
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ==================== EXPORT ROUTES (Protected) ====================
+
+    @app.route('/export/transactions', methods=['GET'])
+    @require_auth
+    def export_transactions():
+        fmt = request.args.get('format', 'csv')
+
+        if fmt not in ExportService.FORMATS:
+            return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+
+        try:
+            chunks = iter_transactions_by_date_range(
+                from_date=request.args.get('from'),
+                to_date=request.args.get('to'),
+                account_id=request.args.get('account_id'),
+                type=request.args.get('type'),
+                category=request.args.get('category')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return export_response("transactions", fmt, TRANSACTION_COLUMNS, chunks)
+
+    @app.route('/export/income', methods=['GET'])
+    @require_auth
+    def export_income():
+        fmt = request.args.get('format', 'csv')
+
+        if fmt not in ExportService.FORMATS:
+            return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+
+        try:
+            chunks = iter_income_by_date_range(
+                from_date=request.args.get('from'),
+                to_date=request.args.get('to'),
+                account_id=request.args.get('account_id'),
+                source=request.args.get('source')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return export_response("income", fmt, INCOME_COLUMNS, chunks)
+
+    # ==================== IMPORT ROUTES (Protected) ====================
+
+    @app.route('/import/csv', methods=['POST'])
+    @require_auth
+    def import_csv():
+        upload = request.files.get('file')
+
+        if upload is None:
+            return jsonify({"error": "A CSV file is required in the 'file' field"}), 400
+
+        try:
+            report = ImportService.import_csv(
+                upload.stream,
+                profile_name=request.values.get('profile', 'default'),
+                account_id=request.values.get('account_id'),
+                error_limit=IMPORT_ERROR_LIMIT,
+                skip_duplicates=request.values.get('skip_duplicates', 'true').lower() in ('1', 'true', 'yes'),
+                window_days=request.values.get('window_days', default=RECONCILE_WINDOW_DAYS, type=int)
+            )
+            return jsonify(report), 201
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ==================== FX RATE ROUTES (Protected) ====================
+
+    @app.route('/fx/rates', methods=['GET'])
+    @require_auth
+    def list_fx_rates():
+        try:
+            rates = get_fx_rates(
+                currency=request.args.get('currency'),
+                from_date=request.args.get('from'),
+                to_date=request.args.get('to')
+            )
+            return jsonify({"rates": rates, "count": len(rates)})
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/fx/rates/import', methods=['POST'])
+    @require_auth
+    @require_admin
+    def import_fx_rates():
+        upload = request.files.get('file')
+
+        if upload is None:
+            return jsonify({"error": "A CSV file is required in the 'file' field"}), 400
+
+        try:
+            report = FxService.import_csv(upload.stream)
+            return jsonify(report), 201
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     # ==================== STATISTICS ROUTES (Protected) ====================
 
     @app.route('/stats/summary', methods=['GET'])
     @require_auth
+    @snapshot_arg
     def get_stats_summary():
         from_date = request.args.get('from')
         to_date = request.args.get('to')
 
-        summary = StatsService.get_summary(from_date, to_date)
-        return jsonify(summary)
+        try:
+            summary = StatsService.get_summary(from_date, to_date, parse_base_currency_arg())
+            return jsonify(summary)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     @app.route('/stats/transactions', methods=['GET'])
     @require_auth
+    @snapshot_arg
     def get_transaction_stats():
         from_date = request.args.get('from')
         to_date = request.args.get('to')
 
-        stats = StatsService.get_transaction_stats(from_date, to_date)
-        return jsonify(stats)
+        try:
+            stats = StatsService.get_transaction_stats(from_date, to_date, parse_base_currency_arg())
+            return jsonify(stats)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     @app.route('/stats/income', methods=['GET'])
     @require_auth
+    @snapshot_arg
     def get_income_stats():
         from_date = request.args.get('from')
         to_date = request.args.get('to')
 
-        stats = StatsService.get_income_stats(from_date, to_date)
-        return jsonify(stats)
+        try:
+            stats = StatsService.get_income_stats(from_date, to_date, parse_base_currency_arg())
+            return jsonify(stats)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/stats/timeseries', methods=['GET'])
+    @require_auth
+    @snapshot_arg
+    def get_timeseries():
+        try:
+            series = StatsService.get_timeseries(
+                metric=request.args.get('metric', 'expense'),
+                granularity=request.args.get('granularity', 'month'),
+                group_by=request.args.get('group_by'),
+                from_date=request.args.get('from'),
+                to_date=request.args.get('to'),
+                base_currency=parse_base_currency_arg()
+            )
+            return jsonify(series)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     # ==================== FORECAST ROUTES (Protected) ====================
 
     @app.route('/stats/income_forecast', methods=['GET'])
     @require_auth
+    @snapshot_arg
     def get_income_forecast():
         months = request.args.get('months', default=3, type=int)
 
         if months < 1 or months > 12:
             return jsonify({"error": "months must be between 1 and 12"}), 400
 
-        forecast = ForecastService.get_income_forecast(months_ahead=months)
-        return jsonify(forecast)
+        try:
+            forecast = ForecastService.get_income_forecast(
+                months_ahead=months,
+                model=request.args.get('model', 'auto'),
+                replicates=parse_replicates_arg(),
+                base_currency=parse_base_currency_arg()
+            )
+            return jsonify(forecast)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     @app.route('/stats/expense_forecast', methods=['GET'])
     @require_auth
+    @snapshot_arg
     def get_expense_forecast():
         months = request.args.get('months', default=3, type=int)
 
         if months < 1 or months > 12:
             return jsonify({"error": "months must be between 1 and 12"}), 400
 
-        forecast = ForecastService.get_expense_trend(months_ahead=months)
-        return jsonify(forecast)
+        try:
+            forecast = ForecastService.get_expense_trend(
+                months_ahead=months,
+                model=request.args.get('model', 'auto'),
+                replicates=parse_replicates_arg(),
+                base_currency=parse_base_currency_arg()
+            )
+            return jsonify(forecast)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/stats/anomalies', methods=['GET'])
+    @require_auth
+    def get_anomalies():
+        limit = request.args.get('limit', default=100, type=int)
+        if limit < 1 or limit > 1000:
+            return jsonify({"error": "limit must be between 1 and 1000"}), 400
+
+        try:
+            anomalies = AnomalyService.get_anomalies(
+                from_date=request.args.get('from'),
+                to_date=request.args.get('to'),
+                category=request.args.get('category'),
+                min_score=request.args.get('min_score', default=ANOMALY_THRESHOLD, type=float),
+                limit=limit
+            )
+            return jsonify(anomalies)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/stats/recurring_projection', methods=['GET'])
+    @require_auth
+    @snapshot_arg
+    def get_recurring_projection():
+        months = request.args.get('months', default=12, type=int)
+
+        if months < 1 or months > 120:
+            return jsonify({"error": "months must be between 1 and 120"}), 400
+
+        try:
+            projection = ForecastService.get_recurring_projection(
+                months_ahead=months,
+                from_month=request.args.get('from'),
+                base_currency=parse_base_currency_arg()
+            )
+            return jsonify(projection)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/stats/simulate', methods=['POST'])
+    @require_auth
+    @snapshot_arg
+    def simulate_cash_flow():
+        data = request.get_json(silent=True) or {}
+
+        try:
+            shocks = data.get('shocks', [])
+            if not isinstance(shocks, list):
+                raise ValueError("'shocks' must be a list")
+            starting_balance = data.get('starting_balance')
+            result = SimulationService.simulate(
+                months_ahead=int(data.get('months', 12)),
+                paths=int(data.get('paths', SIMULATION_PATHS)),
+                shocks=shocks,
+                method=data.get('method', 'bootstrap'),
+                account_id=data.get('account_id'),
+                starting_balance=float(starting_balance) if starting_balance is not None else None,
+                from_date=data.get('from'),
+                to_date=data.get('to'),
+                percentiles=data.get('percentiles', SimulationService.PERCENTILES),
+                seed=data.get('seed'),
+                base_currency=parse_base_currency_arg()
+            )
+            return jsonify(result)
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/stats/category_forecast', methods=['GET'])
+    @require_auth
+    @snapshot_arg
+    def get_category_forecast():
+        months = request.args.get('months', default=3, type=int)
+
+        if months < 1 or months > 12:
+            return jsonify({"error": "months must be between 1 and 12"}), 400
+
+        try:
+            forecast = ForecastService.get_category_forecast(
+                months_ahead=months,
+                metric=request.args.get('metric', 'expense'),
+                group_by=request.args.get('group_by', 'category'),
+                base_currency=parse_base_currency_arg()
+            )
+            return jsonify(forecast)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ==================== ADMIN ROUTES (Protected) ====================
+
+    @app.route('/admin/maintenance', methods=['GET'])
+    @require_auth
+    @require_admin
+    def maintenance_status():
+        return jsonify({
+            "scheduler": MaintenanceService.status(),
+            "database": get_database_stats()
+        })
+
+    @app.route('/admin/maintenance', methods=['POST'])
+    @require_auth
+    @require_admin
+    def run_maintenance():
+        data = request.get_json(silent=True) or {}
+        tasks = data.get('tasks') or list(MaintenanceService.TASKS)
+
+        if not isinstance(tasks, list):
+            return jsonify({"error": "tasks must be a list"}), 400
+
+        unknown = [task for task in tasks if task not in MaintenanceService.TASKS]
+        if unknown:
+            return jsonify({"error": f"Unknown task(s): {', '.join(map(str, unknown))}. "
+                                     f"Allowed: {', '.join(MaintenanceService.TASKS)}"}), 400
+
+        runs = {task: MaintenanceService.run_task(task) for task in tasks}
+        return jsonify({"runs": runs, "database": get_database_stats()})
+
+    @app.route('/admin/backup', methods=['POST'])
+    @require_auth
+    @require_admin
+    def create_backup():
+        data = request.get_json(silent=True) or {}
+
+        try:
+            report = BackupService.backup_all(
+                backup_id=data.get('id'),
+                username=data.get('user'),
+                compress=bool(data.get('gzip', False)),
+                pages=int(data.get('pages', BACKUP_STEP_PAGES)),
+                sleep=float(data.get('sleep', BACKUP_STEP_SLEEP))
+            )
+            return jsonify(report), 201
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route('/admin/backups', methods=['GET'])
+    @require_auth
+    @require_admin
+    def list_backups():
+        with main_database():
+            return jsonify(BackupService.list_backups())
+
+    @app.route('/backups', methods=['GET'])
+    @require_auth
+    def list_own_backups():
+        # Backups of the caller's database, usable as ?snapshot=<id>
+        return jsonify(BackupService.list_backups())
 
     # ==================== UTILITY ROUTES (Public) ====================
 
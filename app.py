@@ -1,6 +1,9 @@
 from flask import Flask, render_template
-from database import init_db, seed_sample_data, get_all_accounts, init_users_table
+from database import init_db, get_all_accounts, init_users_table, init_fx_rates_table, anomaly_stats_missing
 from api import register_routes
+from cli import register_commands
+from services import AnomalyService, MaintenanceService
+from config import MAINTENANCE_ENABLED
 import webbrowser
 from threading import Timer
 
@@ -8,6 +11,7 @@ app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
 
 register_routes(app)
+register_commands(app)
 
 
 @app.route('/app')
@@ -18,13 +22,18 @@ def frontend():
 def setup_database():
     init_db()
     init_users_table()
+    init_fx_rates_table()
 
+    # Each user's data lives in their own database, created on first use (and
+    # seeded with sample data in demo setups); anything left here predates that
     accounts = get_all_accounts()
-    if not accounts:
-        print("No data found. Seeding sample data...")
-        seed_sample_data()
-    else:
-        print(f"Database has {len(accounts)} accounts")
+    if accounts:
+        print(f"Main database has {len(accounts)} accounts; "
+              "run 'flask --app app assign-data <username>' to give them to a user")
+
+    if anomaly_stats_missing():
+        print("Scoring existing expenses for anomaly detection...")
+        AnomalyService.backfill()
 
 
 def open_browser():
@@ -37,6 +46,8 @@ if __name__ == '__main__':
     print("=" * 50)
 
     setup_database()
+    if MAINTENANCE_ENABLED:
+        MaintenanceService.start()
 
     print("\nStarting server...")
     print("API running at: http://127.0.0.1:5000")
@@ -0,0 +1,228 @@
+import csv
+import click
+from datetime import datetime
+from functools import wraps
+
+from config import RECONCILE_WINDOW_DAYS, ARCHIVE_HOT_YEARS, BACKUP_STEP_PAGES, BACKUP_STEP_SLEEP
+from database import (
+    rebuild_balance_checkpoints, rebuild_budget_spend, archive_ledger, vacuum_database,
+    tenant, get_user_by_username, get_all_users, copy_main_to_tenant, init_fx_rates_table
+)
+from services import ImportService, AnomalyService, RecurringService, MaintenanceService, BackupService, FxService
+
+
+def find_user(username):
+    user = get_user_by_username(username)
+    if not user:
+        raise click.ClickException(f"User '{username}' not found")
+    return user
+
+
+def user_option(command):
+    # Without --user, commands run against the main database
+    @click.option('--user', 'username', default=None, help="Run against this user's database")
+    @wraps(command)
+    def wrapper(username, **kwargs):
+        if username is None:
+            return command(**kwargs)
+        with tenant(find_user(username)["id"]):
+            return command(**kwargs)
+
+    return wrapper
+
+
+def register_commands(app):
+
+    @app.cli.command('import-csv')
+    @user_option
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--profile', default='default', help='Column mapping profile from config.IMPORT_PROFILES')
+    @click.option('--account-id', default=None, help='Account for profiles without an account column')
+    @click.option('--errors', 'errors_path', default=None, type=click.Path(dir_okay=False),
+                  help='Write rejected rows to this CSV file')
+    @click.option('--keep-duplicates', is_flag=True, help='Import rows that exactly match existing ones')
+    @click.option('--window-days', default=RECONCILE_WINDOW_DAYS, show_default=True,
+                  help='Date window for reporting possible duplicates')
+    def import_csv_command(path, profile, account_id, errors_path, keep_duplicates, window_days):
+        """Import a bank statement or ledger CSV."""
+        try:
+            report = ImportService.import_csv(
+                path,
+                profile_name=profile,
+                account_id=account_id,
+                skip_duplicates=not keep_duplicates,
+                window_days=window_days
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        click.echo(f"Read {report['rows_read']} rows into {report['target']}: "
+                   f"{report['imported']} imported, {report['rejected']} rejected")
+        click.echo(f"Exact duplicates: {report['exact_duplicates']}, "
+                   f"possible duplicates: {len(report['possible_duplicates'])}")
+
+        if errors_path and report["errors"]:
+            with open(errors_path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=["line", "id", "error"])
+                writer.writeheader()
+                writer.writerows(report["errors"])
+            click.echo(f"Error report written to {errors_path}")
+
+    @app.cli.command('import-fx-rates')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_fx_rates_command(path):
+        """Import exchange rates (date, currency, rate rows or an ECB reference rate file)."""
+        init_fx_rates_table()
+        try:
+            report = FxService.import_csv(path)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        click.echo(f"Imported {report['imported']} rates for {len(report['currencies'])} currencies "
+                   f"from {report['from']} to {report['to']}")
+
+    @app.cli.command('rebuild-balances')
+    @user_option
+    def rebuild_balances_command():
+        """Recompute monthly balance checkpoints from the ledger."""
+        count = rebuild_balance_checkpoints()
+        click.echo(f"Rebuilt {count} balance checkpoints")
+
+    @app.cli.command('rebuild-budgets')
+    @user_option
+    def rebuild_budgets_command():
+        """Recompute budget spend counters from the ledger."""
+        count = rebuild_budget_spend()
+        click.echo(f"Rebuilt {count} budget spend counters")
+
+    @app.cli.command('rebuild-anomalies')
+    @user_option
+    def rebuild_anomalies_command():
+        """Recompute per-category expense statistics and anomaly scores."""
+        count = AnomalyService.backfill()
+        click.echo(f"Scored {count} expense transactions")
+
+    @app.cli.command('archive-ledger')
+    @user_option
+    @click.option('--before', default=None,
+                  help=f'Archive rows dated before this day (YYYY-MM-DD, default January 1st '
+                       f'{ARCHIVE_HOT_YEARS} years ago)')
+    def archive_ledger_command(before):
+        """Move old transactions and income into per-year archive databases."""
+        before = before or f"{datetime.now().year - ARCHIVE_HOT_YEARS}-01-01"
+        try:
+            result = archive_ledger(before)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        archived = result["archived"]
+        click.echo(f"Archived {archived['transactions']} transactions and {archived['income']} income records "
+                   f"dated before {before} into {len(result['years'])} yearly partitions")
+
+    @app.cli.command('maintenance')
+    @click.option('--task', 'tasks', multiple=True, type=click.Choice(list(MaintenanceService.TASKS)),
+                  help='Run only this task (repeatable); default all')
+    @click.option('--full-vacuum', is_flag=True,
+                  help='Rebuild every database with VACUUM first (enables incremental vacuum on old files)')
+    def maintenance_command(tasks, full_vacuum):
+        """Run the background maintenance tasks once on every database."""
+        if full_vacuum:
+            for user_id in MaintenanceService.databases():
+                if user_id is None:
+                    result = vacuum_database()
+                else:
+                    with tenant(user_id):
+                        result = vacuum_database()
+                click.echo(f"{'main' if user_id is None else f'user {user_id}'}: "
+                           f"VACUUM freed {result['freed_pages']} pages")
+
+        for name in tasks or MaintenanceService.TASKS:
+            run = MaintenanceService.run_task(name)
+            click.echo(f"{name}: {run['databases']} databases in {run['duration_ms']} ms {run['result']}")
+            for error in run["errors"]:
+                target = "main" if error["user_id"] is None else f"user {error['user_id']}"
+                click.echo(f"  {target}: {error['error']}", err=True)
+
+    @app.cli.command('backup')
+    @user_option
+    @click.option('--id', 'backup_id', default=None, help='Backup id (default: the current timestamp)')
+    @click.option('--gzip', 'compress', is_flag=True, help='Compress each copied file (not usable as a snapshot)')
+    @click.option('--pages', default=BACKUP_STEP_PAGES, show_default=True, help='Pages copied per step')
+    @click.option('--sleep', default=BACKUP_STEP_SLEEP, show_default=True, help='Seconds to pause between steps')
+    @click.option('--all-users', is_flag=True, help="Also copy every user's database under the same id")
+    def backup_command(backup_id, compress, pages, sleep, all_users):
+        """Copy the database online, without blocking writers."""
+        reported = {}
+
+        def progress(step):
+            # One line per file per tenth of its pages
+            percent = step["copied_pages"] * 100 // max(step["total_pages"], 1)
+            if percent // 10 > reported.get(step["file"], -1):
+                reported[step["file"]] = percent // 10
+                click.echo(f"  {step['file']}: {step['copied_pages']}/{step['total_pages']} pages "
+                           f"({percent}%) after {step['elapsed_seconds']}s")
+
+        try:
+            if all_users:
+                report = BackupService.backup_all(backup_id, compress=compress, pages=pages,
+                                                  sleep=sleep, progress=progress)
+            else:
+                report = BackupService.create_backup(backup_id, compress=compress, pages=pages,
+                                                     sleep=sleep, progress=progress)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        if all_users:
+            for database in report["databases"]:
+                click.echo(f"{database['database']}: {len(database['files'])} files, {database['pages']} pages "
+                           f"in {database['seconds']}s to {database['path']}")
+            click.echo(f"Backup {report['id']}: {len(report['databases'])} databases, "
+                       f"{report['size_bytes']} bytes written")
+            return
+        click.echo(f"Backup {report['id']}: {len(report['files'])} files, {report['pages']} pages "
+                   f"in {report['steps']} steps, {report['seconds']}s ({report['mb_per_second']} MB/s), "
+                   f"{report['size_bytes']} bytes written to {report['path']}")
+
+    @app.cli.command('materialize-recurring')
+    @click.option('--through', default=None, help='Last date to materialize (YYYY-MM-DD, default today)')
+    @click.option('--schedule-id', default=None, help='Only materialize this schedule')
+    @click.option('--user', 'username', default=None, help="Run against this user's database")
+    @click.option('--all-users', is_flag=True, help="Run against every user's database")
+    def materialize_recurring_command(through, schedule_id, username, all_users):
+        """Insert due occurrences of recurring schedules into the ledger."""
+        if username and all_users:
+            raise click.ClickException("Use either --user or --all-users")
+
+        if all_users:
+            targets = get_all_users()
+        elif username:
+            targets = [find_user(username)]
+        else:
+            targets = [None]
+
+        for user in targets:
+            try:
+                if user is None:
+                    result = RecurringService.materialize(through=through, schedule_id=schedule_id)
+                else:
+                    with tenant(user["id"]):
+                        result = RecurringService.materialize(through=through, schedule_id=schedule_id)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+
+            created = result["created"]
+            prefix = f"{user['username']}: " if user else ""
+            click.echo(f"{prefix}Materialized {result['schedules']} schedules through {result['through']}: "
+                       f"{created['transactions']} transactions, {created['income']} income records")
+
+    @app.cli.command('assign-data')
+    @click.argument('username')
+    @click.option('--replace', is_flag=True, help="Overwrite the user's existing database")
+    def assign_data_command(username, replace):
+        """Copy the main database's accounts and ledger into a user's database."""
+        user = find_user(username)
+        try:
+            path = copy_main_to_tenant(user["id"], replace=replace)
+        except ValueError as e:
+            raise click.ClickException(f"{e}; use --replace to overwrite it")
+        click.echo(f"Copied main database to {path}")
@@ -4,6 +4,143 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_NAME = "finance.db"
 DATABASE_PATH = os.path.join(BASE_DIR, DATABASE_NAME)
 
+# Idle read-only connections kept open per database file
+DB_READER_POOL_SIZE = 4
+
+# Rows fetched from the cursor per batch when streaming exports
+EXPORT_CHUNK_SIZE = 1000
+
+# CSV import: rows per pandas chunk and how many rejected rows the API reports
+IMPORT_CHUNK_SIZE = 50000
+IMPORT_ERROR_LIMIT = 1000
+
+# Imported rows within this many days of an existing row with the same
+# account and amount are reported as possible duplicates
+RECONCILE_WINDOW_DAYS = 3
+
+# Forecast model selection: months per season, joblib worker count, and the
+# number of backtest fits below which candidates are evaluated in-process
+FORECAST_SEASON_LENGTH = 12
+FORECAST_N_JOBS = -1
+FORECAST_PARALLEL_MIN_FITS = 200
+
+# Fitted forecast models kept in memory, and bootstrap replicates per interval request
+FORECAST_CACHE_SIZE = 128
+FORECAST_BOOTSTRAP_REPLICATES = 2000
+FORECAST_BOOTSTRAP_MAX_REPLICATES = 20000
+
+# Column mappings for CSV imports. "columns" maps our field -> CSV header.
+# With "signed_amounts", negative amounts become expenses and positive ones income.
+IMPORT_PROFILES = {
+    'default': {
+        'target': 'transactions',
+        'columns': {
+            'id': 'id', 'account_id': 'account_id', 'date': 'date', 'amount': 'amount',
+            'type': 'type', 'category': 'category', 'note': 'note'
+        },
+        'date_format': '%Y-%m-%d',
+        'delimiter': ',',
+        'signed_amounts': False
+    },
+    'income': {
+        'target': 'income',
+        'columns': {
+            'id': 'id', 'account_id': 'account_id', 'date': 'date',
+            'amount': 'amount', 'source': 'source'
+        },
+        'date_format': '%Y-%m-%d',
+        'delimiter': ','
+    },
+    'bank_statement': {
+        'target': 'transactions',
+        'columns': {
+            'id': 'Reference', 'date': 'Booking Date', 'amount': 'Amount',
+            'category': 'Category', 'note': 'Description'
+        },
+        'date_format': '%d/%m/%Y',
+        'delimiter': ',',
+        'signed_amounts': True
+    }
+}
+
+# Monte Carlo cash-flow simulation: default and maximum paths/months, and the
+# path count above which runs are split into chunks over worker processes
+SIMULATION_PATHS = 10000
+SIMULATION_MAX_PATHS = 2000000
+SIMULATION_MAX_MONTHS = 60
+SIMULATION_N_JOBS = -1
+SIMULATION_PARALLEL_MIN_PATHS = 500000
+SIMULATION_CHUNK_PATHS = 250000
+
+# Expense anomaly detection: EWMA smoothing factor, |z-score| that flags a
+# transaction, observations a category needs before it is scored, and the
+# minimum deviation as a fraction of the category mean
+ANOMALY_EWMA_ALPHA = 0.1
+ANOMALY_THRESHOLD = 3.0
+ANOMALY_MIN_COUNT = 5
+ANOMALY_MIN_STD_RATIO = 0.05
+
+# Each user's accounts and ledger live in their own SQLite file in this
+# directory; the main database keeps only the users table (and legacy data)
+TENANT_DATABASE_DIR = os.path.join(BASE_DIR, "tenants")
+# Demo setups only: fill each new user's database with the sample accounts and
+# ledger, which would otherwise show up in their statistics and forecasts
+TENANT_SEED_SAMPLE_DATA = False
+
+# Cold ledger rows move to per-year files in an archive/ directory next to
+# their database. By default archive-ledger keeps the current year and the
+# ARCHIVE_HOT_YEARS before it; queries attach at most ARCHIVE_MAX_ATTACHED
+# partitions at once (SQLite's default compile-time limit)
+ARCHIVE_HOT_YEARS = 2
+ARCHIVE_MAX_ATTACHED = 10
+
+# Usernames allowed to use the /admin endpoints and to import the FX rates,
+# which act on every user's data. Empty leaves admin work to the CLI commands
+ADMIN_USERNAMES = ()
+
+# Background maintenance: the scheduler wakes every MAINTENANCE_POLL_SECONDS
+# and, once no request has arrived for MAINTENANCE_IDLE_SECONDS, runs each
+# task whose interval (seconds) has passed on every database
+MAINTENANCE_ENABLED = True
+MAINTENANCE_POLL_SECONDS = 30
+MAINTENANCE_IDLE_SECONDS = 60
+MAINTENANCE_INTERVALS = {
+    "checkpoint": 300,
+    "vacuum": 3600,
+    "optimize": 3600,
+    "analyze": 86400,
+    "refresh": 900
+}
+# Free pages returned to the OS per incremental vacuum pass (None = all) and
+# rows sampled per index by ANALYZE (0 = no limit)
+MAINTENANCE_VACUUM_PAGES = 2000
+MAINTENANCE_ANALYSIS_LIMIT = 1000
+# Forecast horizons (months) kept warm in the forecast cache
+MAINTENANCE_FORECAST_HORIZONS = (3, 6, 12)
+
+# Online backups copy BACKUP_STEP_PAGES pages per step and sleep
+# BACKUP_STEP_SLEEP seconds between steps so writers keep committing. Each
+# database's backups go to BACKUP_DIR/<database name>/<backup id>/
+BACKUP_DIR = os.path.join(BASE_DIR, "backups")
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.005
+
+
+# Ledger, balance and budget amounts are stored as integers in the minor unit
+# of the account's currency; ISO 4217 decimal places for the currencies that
+# don't have DEFAULT_MINOR_UNITS
+DEFAULT_MINOR_UNITS = 2
+CURRENCY_MINOR_UNITS = {
+    "BHD": 3, "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "IQD": 3, "ISK": 0, "JOD": 3,
+    "JPY": 0, "KMF": 0, "KRW": 0, "KWD": 3, "LYD": 3, "OMR": 3, "PYG": 0, "RWF": 0,
+    "TND": 3, "UGX": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0
+}
+
+# Exchange rates (shared by all users) are quoted as units of each currency per
+# one FX_REFERENCE_CURRENCY, as in the ECB reference rate files. With a base
+# currency, statistics and forecasts convert each month at its average rate
+FX_REFERENCE_CURRENCY = "EUR"
+
 
 class Config:
     DEBUG = True
@@ -24,4 +161,4 @@ config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
     'default': DevelopmentConfig
-}
\ No newline at end of file
+}
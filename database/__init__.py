@@ -1,7 +1,33 @@
 from .db import (
     init_db,
     get_db_connection,
+    get_main_connection,
+    get_read_connection,
+    get_main_read_connection,
     close_db_connection,
+    tenant,
+    snapshot,
+    main_database,
+    tenant_database_path,
+    current_database_path,
+    copy_main_to_tenant,
+    validate_date_format,
+    validate_month_format,
+    ACCOUNT_COLUMNS,
+    TRANSACTION_COLUMNS,
+    INCOME_COLUMNS,
+    lookup_id,
+    resolve_lookup_ids,
+    get_categories,
+    rename_category,
+    get_sources,
+    rename_source,
+    currency_scale,
+    to_minor_units,
+    major_units,
+    get_account_scale,
+    get_account_scales,
+    get_account_currencies,
     create_account,
     get_account,
     get_all_accounts,
@@ -11,22 +37,80 @@ from .db import (
     get_transaction,
     get_all_transactions,
     get_transactions_by_date_range,
+    iter_transactions_by_date_range,
+    get_transactions_columnar,
     update_transaction,
     delete_transaction,
     create_income,
     get_income,
     get_all_income,
     get_income_by_date_range,
+    iter_income_by_date_range,
+    get_income_columnar,
     update_income,
     delete_income,
+    get_account_ids,
+    get_existing_ids,
+    bulk_update_transactions,
+    bulk_delete_transactions,
+    bulk_update_income,
+    bulk_delete_income,
+    get_max_rowid,
+    get_rows_in_window,
+    bulk_insert_transactions,
+    bulk_insert_income,
+    get_ledger_page,
+    rebuild_balance_checkpoints,
+    get_account_balance,
+    get_balance_history,
+    anomaly_stats_missing,
+    get_expense_series,
+    rebuild_budget_spend,
+    create_budget,
+    get_budget,
+    get_all_budgets,
+    update_budget,
+    delete_budget,
+    get_budget_status,
+    SCHEDULE_FREQUENCIES,
+    create_recurring_schedule,
+    get_recurring_schedule,
+    get_all_recurring_schedules,
+    update_recurring_schedule,
+    delete_recurring_schedule,
+    materialize_occurrences,
+    archive_database_path,
+    archive_ledger,
+    get_archive_partitions,
+    checkpoint_wal,
+    incremental_vacuum,
+    analyze_database,
+    optimize_database,
+    vacuum_database,
+    get_database_stats,
+    backup_file,
+    replace_anomaly_scores,
+    get_anomalies,
+    init_fx_rates_table,
+    import_fx_rates,
+    get_fx_rates,
+    get_fx_rates_version,
+    get_monthly_fx_rates,
     get_monthly_income_totals,
+    get_monthly_expense_totals,
+    get_bucket_totals,
     get_transactions_for_stats,
     get_income_for_stats,
+    get_category_totals,
+    get_source_totals,
     seed_sample_data,
     drop_all_tables,
     init_users_table,
     create_user,
     authenticate_user,
     validate_token,
+    get_token_user,
+    get_user_by_username,
+    get_all_users,
     logout_user,
 )
\ No newline at end of file
@@ -1,17 +1,231 @@
 import sqlite3
-from datetime import datetime
+import json
+import base64
+import heapq
+import itertools
+import math
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal, InvalidOperation
+from urllib.request import pathname2url
+from datetime import datetime, timedelta
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import DATABASE_PATH
+from config import (
+    DATABASE_PATH, DB_READER_POOL_SIZE, EXPORT_CHUNK_SIZE, TENANT_DATABASE_DIR, TENANT_SEED_SAMPLE_DATA,
+    ARCHIVE_MAX_ATTACHED, DEFAULT_MINOR_UNITS, CURRENCY_MINOR_UNITS, FX_REFERENCE_CURRENCY,
+    ANOMALY_EWMA_ALPHA, ANOMALY_THRESHOLD, ANOMALY_MIN_COUNT, ANOMALY_MIN_STD_RATIO
+)
+
+ACCOUNT_COLUMNS = ("id", "name", "currency", "created_at")
+TRANSACTION_COLUMNS = ("id", "account_id", "date", "amount", "type", "category", "note", "created_at")
+INCOME_COLUMNS = ("id", "account_id", "date", "amount", "source", "created_at")
+BUDGET_COLUMNS = ("id", "name", "category", "account_id", "currency", "amount", "created_at")
+SCHEDULE_COLUMNS = (
+    "id", "name", "target", "account_id", "amount", "type", "category", "note",
+    "frequency", "interval", "day_of_month", "weekday", "week_of_month",
+    "start_date", "end_date", "materialized_through", "created_at"
+)
+SCHEDULE_FREQUENCIES = ("monthly", "weekly", "nth_weekday")
+
+# Category and source names are stored once, in lookup tables; ledger rows,
+# budgets and archived totals carry the integer id. Amounts are stored in minor
+# units of the account's currency (see AMOUNTS). The API columns above keep
+# names and major units, decoded with a primary-key lookup per row.
+LOOKUP_COLUMNS = {"categories": "category_id", "sources": "source_id"}
+DEFAULT_SCALE = 10 ** DEFAULT_MINOR_UNITS
+ACCOUNT_SCALE = "COALESCE((SELECT scale FROM accounts WHERE id = {account}), " + str(DEFAULT_SCALE) + ")"
+ACCOUNT_CURRENCY = "(SELECT currency FROM accounts WHERE id = {account})"
+DECODED_COLUMNS = {
+    "category": "(SELECT name FROM categories WHERE id = category_id) AS category",
+    "source": "(SELECT name FROM sources WHERE id = source_id) AS source",
+    "amount": "amount * 1.0 / " + ACCOUNT_SCALE.format(account="account_id") + " AS amount"
+}
+# Budgets on an account are in its currency; the others store their own
+# currency and scale
+BUDGET_SCALE = "COALESCE(scale, " + ACCOUNT_SCALE.format(account="account_id") + ")"
+BUDGET_DECODED_COLUMNS = {
+    **DECODED_COLUMNS,
+    "currency": "COALESCE(currency, " + ACCOUNT_CURRENCY.format(account="account_id") + ") AS currency",
+    "amount": "amount * 1.0 / " + BUDGET_SCALE + " AS amount"
+}
+# A schedule's category is the category of its transactions or the source of
+# its income, whichever its target uses
+SCHEDULE_DECODED_COLUMNS = {
+    **DECODED_COLUMNS,
+    "category": "COALESCE((SELECT name FROM categories WHERE id = category_id), "
+                "(SELECT name FROM sources WHERE id = source_id)) AS category"
+}
+TRANSACTION_STORED_COLUMNS = ("id", "account_id", "date", "amount", "type", "category_id", "note", "created_at")
+INCOME_STORED_COLUMNS = ("id", "account_id", "date", "amount", "source_id", "created_at")
+
+
+# Database file of the tenant the current request runs as; None outside a
+# request (CLI, setup), which falls back to the main database
+_tenant_database = ContextVar("tenant_database", default=None)
+# Set while a view reads from a backup snapshot, which must never be written
+_snapshot_database = ContextVar("snapshot_database", default=None)
+_ready_tenants = set()
+_tenant_lock = threading.Lock()
+
+
+def read_only_uri(path):
+    return "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+
+
+class PooledConnection(sqlite3.Connection):
+    # close() hands the connection back to its pool instead of closing it
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+class WriterPool:
+    # One read-write connection per database file, used by one thread at a
+    # time; nested acquires from the same thread share it
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.conn = None
+
+    def acquire(self):
+        self.lock.acquire()
+        self.depth += 1
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, factory=PooledConnection)
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self.conn.pool = self
+        if self.depth == 1:
+            self.conn.row_factory = sqlite3.Row
+        return self.conn
+
+    def release(self, conn):
+        self.depth -= 1
+        if self.depth == 0 and conn.in_transaction:
+            # Whatever the caller did not commit never happened
+            conn.rollback()
+        self.lock.release()
+
+
+class ReaderPool:
+    # Read-only connections; in WAL mode they read the last committed state
+    # without waiting on the writer
+    def __init__(self, path):
+        self.uri = read_only_uri(path)
+        self.lock = threading.Lock()
+        self.idle = []
+
+    def acquire(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False, factory=PooledConnection)
+            conn.pool = self
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            if len(self.idle) < DB_READER_POOL_SIZE:
+                self.idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(path, kind):
+    key = (path, kind)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = (WriterPool if kind == "write" else ReaderPool)(path)
+    return pool
+
+
+def current_database_path():
+    return _tenant_database.get() or DATABASE_PATH
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+    if _snapshot_database.get():
+        raise ValueError("Snapshots are read-only")
+    return _pool(current_database_path(), "write").acquire()
+
+
+def get_read_connection():
+    return _pool(current_database_path(), "read").acquire()
+
+
+def get_main_connection():
+    # Users and tokens always live in the main database
+    return _pool(DATABASE_PATH, "write").acquire()
+
+
+def get_main_read_connection():
+    return _pool(DATABASE_PATH, "read").acquire()
+
+
+def tenant_database_path(user_id):
+    return os.path.join(TENANT_DATABASE_DIR, f"user_{int(user_id)}.db")
+
+
+@contextmanager
+def tenant(user_id):
+    path = tenant_database_path(user_id)
+    reset = _tenant_database.set(path)
+    try:
+        if path not in _ready_tenants:
+            with _tenant_lock:
+                if path not in _ready_tenants:
+                    os.makedirs(TENANT_DATABASE_DIR, exist_ok=True)
+                    created = not os.path.exists(path)
+                    init_db(verbose=False)
+                    if created and TENANT_SEED_SAMPLE_DATA:
+                        seed_sample_data(verbose=False)
+                    _ready_tenants.add(path)
+        yield path
+    finally:
+        _tenant_database.reset(reset)
+
+
+@contextmanager
+def main_database():
+    # Queries in the block go to the main database, also inside a user's request
+    reset = _tenant_database.set(None)
+    try:
+        yield DATABASE_PATH
+    finally:
+        _tenant_database.reset(reset)
+
+
+@contextmanager
+def snapshot(path):
+    # Reads inside the block go to a backup copy instead of the live database
+    if not os.path.exists(path):
+        raise ValueError("Snapshot not found")
+    reset = _tenant_database.set(path)
+    reset_snapshot = _snapshot_database.set(path)
+    try:
+        yield path
+    finally:
+        _snapshot_database.reset(reset_snapshot)
+        _tenant_database.reset(reset)
 
 
 def close_db_connection(conn):
@@ -19,131 +233,180 @@ def close_db_connection(conn):
         conn.close()
 
 
-def init_db():
+def init_db(verbose=True):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS accounts
-                   (
-                       id
-                       TEXT
-                       PRIMARY
-                       KEY,
-                       name
-                       TEXT
-                       NOT
-                       NULL,
-                       currency
-                       TEXT
-                       NOT
-                       NULL
-                       DEFAULT
-                       'USD',
-                       created_at
-                       TEXT
-                       DEFAULT
-                       CURRENT_TIMESTAMP
-                   )
-                   ''')
-
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS transactions
-                   (
-                       id
-                       TEXT
-                       PRIMARY
-                       KEY,
-                       account_id
-                       TEXT
-                       NOT
-                       NULL,
-                       date
-                       TEXT
-                       NOT
-                       NULL,
-                       amount
-                       REAL
-                       NOT
-                       NULL,
-                       type
-                       TEXT
-                       NOT
-                       NULL
-                       CHECK (
-                       type
-                       IN
-                   (
-                       'expense',
-                       'income'
-                   )),
-                       category TEXT,
-                       note TEXT,
-                       created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                       FOREIGN KEY
-                   (
-                       account_id
-                   ) REFERENCES accounts
-                   (
-                       id
-                   ) ON DELETE CASCADE
-                       )
-                   ''')
-
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS income
-                   (
-                       id
-                       TEXT
-                       PRIMARY
-                       KEY,
-                       account_id
-                       TEXT
-                       NOT
-                       NULL,
-                       date
-                       TEXT
-                       NOT
-                       NULL,
-                       amount
-                       REAL
-                       NOT
-                       NULL,
-                       source
-                       TEXT,
-                       created_at
-                       TEXT
-                       DEFAULT
-                       CURRENT_TIMESTAMP,
-                       FOREIGN
-                       KEY
-                   (
-                       account_id
-                   ) REFERENCES accounts
-                   (
-                       id
-                   ) ON DELETE CASCADE
+    try:
+        # Only takes effect on a new file (or with vacuum_database); lets
+        # maintenance give freed pages back a few at a time
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Readers see the last commit instead of waiting for the writer
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+        create_lookup_tables(cursor)
+
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS accounts
+                       (
+                           id
+                           TEXT
+                           PRIMARY
+                           KEY,
+                           name
+                           TEXT
+                           NOT
+                           NULL,
+                           currency
+                           TEXT
+                           NOT
+                           NULL
+                           DEFAULT
+                           'USD',
+                           scale INTEGER NOT NULL,
+                           created_at
+                           TEXT
+                           DEFAULT
+                           CURRENT_TIMESTAMP
                        )
-                   ''')
+                       ''')
+
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS transactions
+                       (
+                           id
+                           TEXT
+                           PRIMARY
+                           KEY,
+                           account_id
+                           TEXT
+                           NOT
+                           NULL,
+                           date
+                           TEXT
+                           NOT
+                           NULL,
+                           amount
+                           INTEGER
+                           NOT
+                           NULL,
+                           type
+                           TEXT
+                           NOT
+                           NULL
+                           CHECK (
+                           type
+                           IN
+                       (
+                           'expense',
+                           'income'
+                       )),
+                           category_id INTEGER REFERENCES categories (id),
+                           note TEXT,
+                           created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                           FOREIGN KEY
+                       (
+                           account_id
+                       ) REFERENCES accounts
+                       (
+                           id
+                       ) ON DELETE CASCADE
+                           )
+                       ''')
+
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS income
+                       (
+                           id
+                           TEXT
+                           PRIMARY
+                           KEY,
+                           account_id
+                           TEXT
+                           NOT
+                           NULL,
+                           date
+                           TEXT
+                           NOT
+                           NULL,
+                           amount
+                           INTEGER
+                           NOT
+                           NULL,
+                           source_id INTEGER REFERENCES sources (id),
+                           created_at
+                           TEXT
+                           DEFAULT
+                           CURRENT_TIMESTAMP,
+                           FOREIGN
+                           KEY
+                       (
+                           account_id
+                       ) REFERENCES accounts
+                       (
+                           id
+                       ) ON DELETE CASCADE
+                           )
+                       ''')
+
+        if migrate_lookup_columns(cursor) and verbose:
+            print("Moved category and source names into lookup tables")
+        if migrate_amount_columns(cursor) and verbose:
+            print("Converted amounts to integer minor units")
+
+        # Date-leading covering indexes: narrow ?fields= listings (date, amount, category, ...)
+        # are answered from the index alone. They replace the plain date indexes.
+        cursor.execute('DROP INDEX IF EXISTS idx_transactions_date')
+        cursor.execute('DROP INDEX IF EXISTS idx_income_date')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date_cover '
+                       'ON transactions(date, account_id, type, category_id, amount)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_date_cover '
+                       'ON income(date, account_id, source_id, amount)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_account ON income(account_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions(account_id, date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions(date, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_date_id ON income(date, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_account_date ON income(account_id, date)')
+
+        create_bucket_columns(cursor)
+        # Before the checkpoints: their first build also counts archived rows
+        create_archive_tables(cursor)
+        create_balance_checkpoints(cursor)
+        create_anomaly_tables(cursor)
+        create_budget_tables(cursor)
+        create_recurring_tables(cursor)
 
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_date ON income(date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_account ON income(account_id)')
-
-    conn.commit()
-    close_db_connection(conn)
-    print("Database initialized successfully")
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    if verbose:
+        print("Database initialized successfully")
 
 
 def drop_all_tables():
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS transactions")
-    cursor.execute("DROP TABLE IF EXISTS income")
-    cursor.execute("DROP TABLE IF EXISTS accounts")
-    conn.commit()
-    close_db_connection(conn)
+
+    try:
+        cursor.execute("DROP TABLE IF EXISTS archived_ledger_totals")
+        cursor.execute("DROP TABLE IF EXISTS archived_ids")
+        cursor.execute("DROP TABLE IF EXISTS archive_partitions")
+        cursor.execute("DROP TABLE IF EXISTS recurring_schedules")
+        cursor.execute("DROP TABLE IF EXISTS budget_spend")
+        cursor.execute("DROP TABLE IF EXISTS budgets")
+        cursor.execute("DROP TABLE IF EXISTS account_balance_checkpoints")
+        cursor.execute("DROP TABLE IF EXISTS transaction_anomalies")
+        cursor.execute("DROP TABLE IF EXISTS category_expense_stats")
+        cursor.execute("DROP TABLE IF EXISTS transactions")
+        cursor.execute("DROP TABLE IF EXISTS income")
+        cursor.execute("DROP TABLE IF EXISTS accounts")
+        cursor.execute("DROP TABLE IF EXISTS categories")
+        cursor.execute("DROP TABLE IF EXISTS sources")
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    clear_lookup_cache()
     print("All tables dropped")
 
 
@@ -157,6 +420,86 @@ def rows_to_list(rows):
     return [dict(row) for row in rows]
 
 
+def rows_to_columns(columns, rows):
+    # Transpose cursor tuples into one list per column without building row dicts
+    if not rows:
+        return {column: [] for column in columns}
+    return {column: list(values) for column, values in zip(columns, zip(*rows))}
+
+
+def fetch_ledger(table, columns, where, params, from_date, to_date, select, row_factory=sqlite3.Row):
+    # Runs select(source) over the hot table and the archive partitions that
+    # overlap [from_date, to_date]; batches come back newest first
+    conn = get_read_connection()
+    conn.row_factory = row_factory
+    try:
+        rows = []
+        for schemas, bounds in attached_partitions(conn, from_date, to_date):
+            source, source_params = ledger_source(table, columns, where, params, schemas, bounds)
+            cursor = conn.execute(select(source), source_params)
+            rows.extend(cursor.fetchall())
+        return [description[0] for description in cursor.description], rows
+    finally:
+        close_db_connection(conn)
+
+
+def _get_ledger_row(table, stored_columns, columns, row_id):
+    # Hot table first; on a miss, archived_ids names the one partition to attach
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    try:
+        row = cursor.execute(f"SELECT {columns} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+        if row is not None:
+            return row_to_dict(row)
+        archived = cursor.execute(
+            "SELECT year FROM archived_ids WHERE ledger = ? AND id = ?", (table, row_id)
+        ).fetchone()
+    finally:
+        close_db_connection(conn)
+    if archived is None:
+        return None
+
+    year = archived["year"]
+    _, rows = fetch_ledger(table, stored_columns, " WHERE id = ?", [row_id], f"{year}-01-01", f"{year}-12-31",
+                           lambda source: f"SELECT {columns} FROM {source}")
+    return row_to_dict(rows[0]) if rows else None
+
+
+def select_list(fields, allowed, decoded=DECODED_COLUMNS):
+    # Always name the columns: SELECT * would also return the generated bucket columns
+    if not fields:
+        return ", ".join(decoded.get(column, column) for column in allowed)
+
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+
+    # Preserve the table's column order and drop repeats
+    return ", ".join(decoded.get(column, column) for column in allowed if column in fields)
+
+
+def iter_ledger_chunks(table, columns, where, params, from_date, to_date, select,
+                       chunk_size=EXPORT_CHUNK_SIZE):
+    # Rows come back as plain tuples in batches of chunk_size; the connection
+    # stays open only while the caller keeps consuming the generator.
+    conn = get_read_connection()
+    conn.row_factory = None
+    try:
+        for schemas, bounds in attached_partitions(conn, from_date, to_date):
+            source, source_params = ledger_source(table, columns, where, params, schemas, bounds)
+            cursor = conn.execute(select(source), source_params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+    finally:
+        close_db_connection(conn)
+
+
 def validate_date_format(date_str):
     try:
         datetime.strptime(date_str, "%Y-%m-%d")
@@ -165,6 +508,357 @@ def validate_date_format(date_str):
         return False
 
 
+def validate_month_format(month_str):
+    try:
+        datetime.strptime(month_str, "%Y-%m")
+        return True
+    except ValueError:
+        return False
+
+
+def copy_main_to_tenant(user_id, replace=False):
+    # Hands the main database's accounts and ledger (data from before
+    # per-user databases) to one user
+    path = tenant_database_path(user_id)
+    if os.path.exists(path) and not replace:
+        raise ValueError(f"User {user_id} already has a database")
+
+    os.makedirs(TENANT_DATABASE_DIR, exist_ok=True)
+    source = get_main_read_connection()
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.execute("DROP TABLE IF EXISTS users")
+    target.commit()
+    target.close()
+    _ready_tenants.discard(path)
+    clear_lookup_cache(path)
+    return path
+
+
+# ==================== CATEGORIES AND SOURCES ====================
+
+# name -> id per (database file, lookup table). Ids are never reused, so an
+# entry only changes when its name is renamed.
+_lookup_cache = {}
+_lookup_lock = threading.Lock()
+
+
+def create_lookup_tables(cursor):
+    for table in LOOKUP_COLUMNS:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+
+
+def _lookup_ids(table):
+    key = (current_database_path(), table)
+    ids = _lookup_cache.get(key)
+    if ids is None:
+        conn = get_read_connection()
+        try:
+            ids = {row["name"]: row["id"] for row in conn.execute(f"SELECT id, name FROM {table}")}
+        finally:
+            close_db_connection(conn)
+        with _lookup_lock:
+            ids = _lookup_cache.setdefault(key, ids)
+    return ids
+
+
+def clear_lookup_cache(path=None):
+    path = path or current_database_path()
+    with _lookup_lock:
+        for key in [key for key in _lookup_cache if key[0] == path]:
+            del _lookup_cache[key]
+
+
+def lookup_id(table, name):
+    # Id of an existing name, for filters; None (which matches no row) if unknown
+    if name is None:
+        return None
+    name = str(name)
+    ids = _lookup_ids(table)
+    if name not in ids:
+        # Possibly added by another process since the cache was filled
+        conn = get_read_connection()
+        try:
+            row = conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()
+        finally:
+            close_db_connection(conn)
+        if row is None:
+            return None
+        with _lookup_lock:
+            ids[name] = row["id"]
+    return ids[name]
+
+
+def resolve_lookup_ids(table, names):
+    # Ids for the given names, adding the missing ones. They are committed on
+    # their own, so call this before opening the write transaction that uses them
+    ids = _lookup_ids(table)
+    names = {name: str(name) for name in names if name is not None}
+    missing = {text for text in names.values() if text not in ids}
+    if missing:
+        conn = get_db_connection()
+        try:
+            conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in missing])
+            rows = conn.execute(
+                f"SELECT id, name FROM {table} WHERE name IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(missing)),)
+            ).fetchall()
+            conn.commit()
+        finally:
+            close_db_connection(conn)
+        with _lookup_lock:
+            ids.update((row["name"], row["id"]) for row in rows)
+    return {name: ids[text] for name, text in names.items()}
+
+
+def resolve_lookup_id(table, name):
+    return resolve_lookup_ids(table, [name]).get(name)
+
+
+def _get_lookup_values(table):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, name FROM {table} ORDER BY name")
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+    return rows_to_list(rows)
+
+
+def _rename_lookup_value(table, id, name):
+    # Every row refers to the id, so a rename touches one row
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("name must be a non-empty string")
+    name = name.strip()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        old = cursor.execute(f"SELECT name FROM {table} WHERE id = ?", (id,)).fetchone()
+        if old is None:
+            return None
+        cursor.execute(f"UPDATE {table} SET name = ? WHERE id = ?", (name, id))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        raise ValueError(f"'{name}' already exists")
+    finally:
+        close_db_connection(conn)
+
+    ids = _lookup_ids(table)
+    with _lookup_lock:
+        ids.pop(old["name"], None)
+        ids[name] = id
+    return {"id": id, "name": name}
+
+
+def get_categories():
+    return _get_lookup_values("categories")
+
+
+def rename_category(category_id, name):
+    return _rename_lookup_value("categories", category_id, name)
+
+
+def get_sources():
+    return _get_lookup_values("sources")
+
+
+def rename_source(source_id, name):
+    return _rename_lookup_value("sources", source_id, name)
+
+
+def _table_columns(cursor, schema, table):
+    # table_xinfo (unlike table_info) also lists generated columns
+    return {row[1] for row in cursor.execute(f"PRAGMA {schema}.table_xinfo({table})").fetchall()}
+
+
+def _encode_lookup_column(cursor, schema, table, column, lookup):
+    # Replaces a column of names with the lookup id. Indexes on the table are
+    # dropped with it; init_db (or _create_partition_tables) creates them again
+    if column not in _table_columns(cursor, schema, table):
+        return
+    id_column = LOOKUP_COLUMNS[lookup]
+
+    cursor.execute(f"INSERT OR IGNORE INTO main.{lookup} (name) "
+                   f"SELECT DISTINCT {column} FROM {schema}.{table} WHERE {column} IS NOT NULL")
+    _drop_table_indexes(cursor, schema, table)
+
+    # Partitions are separate files, so their ids carry no foreign key
+    references = f" REFERENCES {lookup} (id)" if schema == "main" else ""
+    cursor.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {id_column} INTEGER{references}")
+    cursor.execute(f"UPDATE {schema}.{table} SET {id_column} = "
+                   f"(SELECT id FROM main.{lookup} WHERE name = {column}) WHERE {column} IS NOT NULL")
+    cursor.execute(f"ALTER TABLE {schema}.{table} DROP COLUMN {column}")
+
+
+def _drop_table_indexes(cursor, schema, table):
+    for (name,) in cursor.execute(
+            f"SELECT name FROM {schema}.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)).fetchall():
+        cursor.execute(f"DROP INDEX {schema}.{name}")
+
+
+def _migrate_partitions(cursor, migrate):
+    # Runs migrate(cursor, "archive") on every partition before the main
+    # tables, each in its own commit (ATTACH needs no open transaction); if the
+    # main tables' migration does not finish, the next run checks the
+    # partitions again and skips the ones already done. Trigger bodies name the
+    # old columns, so the main database's are dropped; init_db creates them again
+    partitions = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archive_partitions'"
+    ).fetchone()
+    years = [row[0] for row in cursor.execute("SELECT year FROM archive_partitions")] if partitions else []
+    cursor.connection.commit()
+    for year in years:
+        cursor.execute("ATTACH DATABASE ? AS archive", (archive_database_path(year),))
+        try:
+            migrate(cursor, "archive")
+            _create_partition_tables(cursor, "archive")
+            cursor.connection.commit()
+        finally:
+            cursor.connection.rollback()
+            cursor.execute("DETACH DATABASE archive")
+
+    for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+        cursor.execute(f"DROP TRIGGER {name}")
+
+
+def _encode_partition_lookups(cursor, schema):
+    _encode_lookup_column(cursor, schema, "transactions", "category", "categories")
+    _encode_lookup_column(cursor, schema, "income", "source", "sources")
+
+
+def migrate_lookup_columns(cursor):
+    # Databases from before the lookup tables stored the names on every row
+    if "category" not in _table_columns(cursor, "main", "transactions"):
+        return False
+
+    _migrate_partitions(cursor, _encode_partition_lookups)
+    for table, column, lookup in (("transactions", "category", "categories"),
+                                  ("income", "source", "sources"),
+                                  ("budgets", "category", "categories"),
+                                  ("archived_ledger_totals", "category", "categories")):
+        _encode_lookup_column(cursor, "main", table, column, lookup)
+    return True
+
+
+# ==================== AMOUNTS ====================
+
+# Amounts are integers in the minor unit of their account's currency (cents,
+# yen, fils); accounts.scale is 10 ** the currency's decimal places. They are
+# converted from and to major units only where they enter or leave this
+# module, so sums in SQL and NumPy are exact integer sums.
+
+def currency_scale(currency):
+    return 10 ** CURRENCY_MINOR_UNITS.get(currency.upper(), DEFAULT_MINOR_UNITS)
+
+
+def to_minor_units(amount, scale):
+    # Amounts finer than the currency's minor unit are rejected, not rounded
+    try:
+        minor = Decimal(str(amount)) * scale
+    except InvalidOperation:
+        raise ValueError("Amount must be a number")
+    if not minor.is_finite() or minor != minor.to_integral_value():
+        raise ValueError(f"Amount must have at most {len(str(scale)) - 1} decimal places in this currency")
+    return int(minor)
+
+
+def major_units(rows):
+    # Rows of (*key, scale, total) with integer totals per account or scale.
+    # Scales are powers of ten, so each key's totals are rescaled to its finest
+    # scale, added exactly and divided once
+    totals = {}
+    for *key, scale, total in rows:
+        by_scale = totals.setdefault(tuple(key), {})
+        by_scale[scale] = by_scale.get(scale, 0) + total
+    result = {}
+    for key, by_scale in totals.items():
+        common = max(by_scale)
+        result[key] = sum(total * (common // scale) for scale, total in by_scale.items()) / common
+    return result
+
+
+def get_account_scale(account_id):
+    # None if the account does not exist
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT scale FROM accounts WHERE id = ?", (account_id,))
+    row = cursor.fetchone()
+    close_db_connection(conn)
+    return row["scale"] if row else None
+
+
+def get_account_scales():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, scale FROM accounts")
+    scales = {row["id"]: row["scale"] for row in cursor.fetchall()}
+    close_db_connection(conn)
+    return scales
+
+
+def get_account_currencies():
+    # Account key (rowid) -> (currency, scale)
+    conn = get_read_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+    cursor.execute("SELECT rowid, currency, scale FROM accounts")
+    accounts = {key: (currency, scale) for key, currency, scale in cursor.fetchall()}
+    close_db_connection(conn)
+    return accounts
+
+
+def _column_type(cursor, schema, table, column):
+    for row in cursor.execute(f"PRAGMA {schema}.table_xinfo({table})").fetchall():
+        if row[1] == column:
+            return row[2].upper()
+    return None
+
+
+def _encode_amount_column(cursor, schema, table, column, scale):
+    # Replaces a REAL column of major units with INTEGER minor units; scale is
+    # the SQL expression for a row's scale. Indexes go as in _encode_lookup_column
+    if _column_type(cursor, schema, table, column) != "REAL":
+        return
+    _drop_table_indexes(cursor, schema, table)
+    cursor.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {column}_minor INTEGER NOT NULL DEFAULT 0")
+    cursor.execute(f"UPDATE {schema}.{table} SET {column}_minor = CAST(ROUND({column} * {scale}) AS INTEGER)")
+    cursor.execute(f"ALTER TABLE {schema}.{table} DROP COLUMN {column}")
+    cursor.execute(f"ALTER TABLE {schema}.{table} RENAME COLUMN {column}_minor TO {column}")
+
+
+def _encode_partition_amounts(cursor, schema):
+    for table in LEDGER_TABLES:
+        _encode_amount_column(cursor, schema, table, "amount", ACCOUNT_SCALE.format(account="account_id"))
+
+
+def migrate_amount_columns(cursor):
+    # Databases from before integer amounts stored REAL major units
+    if "scale" not in _table_columns(cursor, "main", "accounts"):
+        cursor.execute(f"ALTER TABLE accounts ADD COLUMN scale INTEGER NOT NULL DEFAULT {DEFAULT_SCALE}")
+        currencies = [row[0] for row in cursor.execute("SELECT DISTINCT currency FROM accounts").fetchall()]
+        cursor.executemany("UPDATE accounts SET scale = ? WHERE currency = ?",
+                           [(currency_scale(currency), currency) for currency in currencies])
+    if _column_type(cursor, "main", "transactions", "amount") != "REAL":
+        return False
+
+    _migrate_partitions(cursor, _encode_partition_amounts)
+    account_scale = ACCOUNT_SCALE.format(account="account_id")
+    budget_scale = (f"COALESCE((SELECT {ACCOUNT_SCALE.format(account='b.account_id')} "
+                    f"FROM budgets b WHERE b.id = budget_id), {DEFAULT_SCALE})")
+    for table, column, scale in (("transactions", "amount", account_scale),
+                                 ("income", "amount", account_scale),
+                                 ("account_balance_checkpoints", "net", account_scale),
+                                 ("account_balance_checkpoints", "balance", account_scale),
+                                 ("archived_ledger_totals", "total", account_scale),
+                                 ("budget_spend", "spent", budget_scale),
+                                 ("budgets", "amount", account_scale)):
+        _encode_amount_column(cursor, "main", table, column, scale)
+    return True
+
+
 # ==================== ACCOUNT OPERATIONS ====================
 
 def create_account(id, name, currency="USD"):
@@ -180,8 +874,8 @@ def create_account(id, name, currency="USD"):
 
     try:
         cursor.execute(
-            "INSERT INTO accounts (id, name, currency) VALUES (?, ?, ?)",
-            (id.strip(), name.strip(), currency.upper())
+            "INSERT INTO accounts (id, name, currency, scale) VALUES (?, ?, ?, ?)",
+            (id.strip(), name.strip(), currency.upper(), currency_scale(currency))
         )
         conn.commit()
         return {"id": id.strip(), "name": name.strip(), "currency": currency.upper()}
@@ -191,19 +885,21 @@ def create_account(id, name, currency="USD"):
         close_db_connection(conn)
 
 
-def get_account(account_id):
-    conn = get_db_connection()
+def get_account(account_id, fields=None):
+    columns = select_list(fields, ACCOUNT_COLUMNS)
+    conn = get_read_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM accounts WHERE id = ?", (account_id,))
+    cursor.execute(f"SELECT {columns} FROM accounts WHERE id = ?", (account_id,))
     row = cursor.fetchone()
     close_db_connection(conn)
     return row_to_dict(row)
 
 
-def get_all_accounts():
-    conn = get_db_connection()
+def get_all_accounts(fields=None):
+    columns = select_list(fields, ACCOUNT_COLUMNS)
+    conn = get_read_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM accounts ORDER BY name")
+    cursor.execute(f"SELECT {columns} FROM accounts ORDER BY name")
     rows = cursor.fetchall()
     close_db_connection(conn)
     return rows_to_list(rows)
@@ -228,6 +924,8 @@ def update_account(account_id, name=None, currency=None):
             raise ValueError("Currency must be a 3-letter code")
         updates.append("currency = ?")
         params.append(currency.upper())
+        updates.append("scale = ?")
+        params.append(currency_scale(currency))
 
     if not updates:
         return existing
@@ -235,20 +933,47 @@ def update_account(account_id, name=None, currency=None):
     params.append(account_id)
     conn = get_db_connection()
     cursor = conn.cursor()
-    query = f"UPDATE accounts SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    close_db_connection(conn)
+
+    try:
+        # Stored amounts are in the old currency's minor unit
+        if currency is not None and currency_scale(currency) != currency_scale(existing["currency"]):
+            in_use = cursor.execute(
+                """SELECT EXISTS (SELECT 1 FROM transactions WHERE account_id = ?)
+                       OR EXISTS (SELECT 1 FROM income WHERE account_id = ?)
+                       OR EXISTS (SELECT 1 FROM archived_ledger_totals WHERE account_id = ?)
+                       OR EXISTS (SELECT 1 FROM budgets WHERE account_id = ?)
+                       OR EXISTS (SELECT 1 FROM recurring_schedules WHERE account_id = ?)""",
+                (account_id,) * 5
+            ).fetchone()[0]
+            if in_use:
+                raise ValueError(f"Cannot change the currency to {currency.upper()}: it has a different "
+                                 f"number of decimal places and the account already has amounts")
+        query = f"UPDATE accounts SET {', '.join(updates)} WHERE id = ?"
+        cursor.execute(query, params)
+        # Its expenses now count toward the budgets and anomaly statistics of the new currency
+        if currency is not None and currency.upper() != existing["currency"]:
+            _rebuild_budget_spend(cursor)
+            _rescore_expenses(cursor)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
     return get_account(account_id)
 
 
 def delete_account(account_id):
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
-    conn.commit()
-    deleted = cursor.rowcount > 0
-    close_db_connection(conn)
+
+    try:
+        # Deleted before the account (not by the cascade) so the ledger
+        # triggers can still look up the account's scale
+        for table in LEDGER_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE account_id = ?", (account_id,))
+        cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+        conn.commit()
+        deleted = cursor.rowcount > 0
+    finally:
+        close_db_connection(conn)
     return deleted
 
 
@@ -259,7 +984,8 @@ def create_transaction(id, account_id, date, amount, type, category=None, note=N
         raise ValueError("Transaction ID cannot be empty")
     if not account_id:
         raise ValueError("Account ID is required")
-    if not get_account(account_id):
+    scale = get_account_scale(account_id)
+    if scale is None:
         raise ValueError(f"Account '{account_id}' does not exist")
     if not validate_date_format(date):
         raise ValueError("Date must be in YYYY-MM-DD format")
@@ -268,46 +994,43 @@ def create_transaction(id, account_id, date, amount, type, category=None, note=N
     if type not in ('expense', 'income'):
         raise ValueError("Type must be 'expense' or 'income'")
 
+    minor = to_minor_units(amount, scale)
+    if get_existing_ids("transactions", [id.strip()]):
+        raise ValueError(f"Transaction with ID '{id}' already exists")
+    category_id = resolve_lookup_id("categories", category)
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
         cursor.execute(
-            "INSERT INTO transactions (id, account_id, date, amount, type, category, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (id.strip(), account_id, date, amount, type, category, note)
+            "INSERT INTO transactions (id, account_id, date, amount, type, category_id, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (id.strip(), account_id, date, minor, type, category_id, note)
         )
-        conn.commit()
-        return {
+        transaction = {
             "id": id.strip(), "account_id": account_id, "date": date,
             "amount": amount, "type": type, "category": category, "note": note
         }
+        if type == 'expense':
+            transaction["anomaly"] = _score_expense(cursor, id.strip(), account_id, category_id, amount)
+        conn.commit()
+        return transaction
     except sqlite3.IntegrityError:
         raise ValueError(f"Transaction with ID '{id}' already exists")
     finally:
         close_db_connection(conn)
 
 
-def get_transaction(transaction_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
-    row = cursor.fetchone()
-    close_db_connection(conn)
-    return row_to_dict(row)
+def get_transaction(transaction_id, fields=None):
+    columns = select_list(fields, TRANSACTION_COLUMNS)
+    return _get_ledger_row("transactions", TRANSACTION_STORED_COLUMNS, columns, transaction_id)
 
 
-def get_all_transactions():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions ORDER BY date DESC")
-    rows = cursor.fetchall()
-    close_db_connection(conn)
-    return rows_to_list(rows)
+def get_all_transactions(fields=None):
+    return get_transactions_by_date_range(fields=fields)
 
 
-def get_transactions_by_date_range(from_date=None, to_date=None, account_id=None,
-                                   type=None, category=None):
-    query = "SELECT * FROM transactions WHERE 1=1"
+def _transaction_filters(from_date=None, to_date=None, account_id=None, type=None, category=None):
+    query = " WHERE 1=1"
     params = []
 
     if from_date:
@@ -331,25 +1054,51 @@ def get_transactions_by_date_range(from_date=None, to_date=None, account_id=None
         params.append(type)
 
     if category:
-        query += " AND category = ?"
-        params.append(category)
+        query += " AND category_id = ?"
+        params.append(lookup_id("categories", category))
 
-    query += " ORDER BY date DESC"
+    return query, params
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    close_db_connection(conn)
+
+def get_transactions_by_date_range(from_date=None, to_date=None, account_id=None,
+                                   type=None, category=None, fields=None):
+    columns = select_list(fields, TRANSACTION_COLUMNS)
+    where, params = _transaction_filters(from_date, to_date, account_id, type, category)
+    _, rows = fetch_ledger("transactions", TRANSACTION_STORED_COLUMNS, where, params, from_date, to_date,
+                           lambda source: f"SELECT {columns} FROM {source} ORDER BY date DESC")
     return rows_to_list(rows)
 
 
-def update_transaction(transaction_id, date=None, amount=None, type=None,
-                       category=None, note=None):
-    existing = get_transaction(transaction_id)
-    if not existing:
-        raise ValueError(f"Transaction with ID '{transaction_id}' not found")
+def iter_transactions_by_date_range(from_date=None, to_date=None, account_id=None,
+                                    type=None, category=None, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = select_list(None, TRANSACTION_COLUMNS)
+    where, params = _transaction_filters(from_date, to_date, account_id, type, category)
+    return iter_ledger_chunks("transactions", TRANSACTION_STORED_COLUMNS, where, params, from_date, to_date,
+                              lambda source: f"SELECT {columns} FROM {source} ORDER BY date DESC", chunk_size)
+
 
+def get_transactions_columnar(from_date=None, to_date=None, account_id=None,
+                              type=None, category=None, fields=None):
+    columns = select_list(fields or TRANSACTION_COLUMNS, TRANSACTION_COLUMNS)
+    where, params = _transaction_filters(from_date, to_date, account_id, type, category)
+    names, rows = fetch_ledger("transactions", TRANSACTION_STORED_COLUMNS, where, params, from_date, to_date,
+                               lambda source: f"SELECT {columns} FROM {source} ORDER BY date DESC",
+                               row_factory=None)
+    return names, rows_to_columns(names, rows), len(rows)
+
+
+def _amount_update(amount, account_id=None):
+    # SET clause scaling the amount per row; it is checked against the scale
+    # of the given account, or of every account when rows of any may change
+    if amount <= 0:
+        raise ValueError("Amount must be positive")
+    scales = [get_account_scale(account_id)] if account_id else set(get_account_scales().values())
+    for scale in scales:
+        to_minor_units(amount, scale or DEFAULT_SCALE)
+    return f"amount = CAST(ROUND(? * {ACCOUNT_SCALE.format(account='account_id')}) AS INTEGER)"
+
+
+def _transaction_updates(date=None, amount=None, type=None, category=None, note=None, account_id=None):
     updates = []
     params = []
 
@@ -360,10 +1109,8 @@ def update_transaction(transaction_id, date=None, amount=None, type=None,
         params.append(date)
 
     if amount is not None:
-        if amount <= 0:
-            raise ValueError("Amount must be positive")
-        updates.append("amount = ?")
-        params.append(amount)
+        updates.append(_amount_update(amount, account_id))
+        params.append(float(amount))
 
     if type is not None:
         if type not in ('expense', 'income'):
@@ -372,33 +1119,71 @@ def update_transaction(transaction_id, date=None, amount=None, type=None,
         params.append(type)
 
     if category is not None:
-        updates.append("category = ?")
-        params.append(category)
+        updates.append("category_id = ?")
+        params.append(resolve_lookup_id("categories", category))
 
     if note is not None:
         updates.append("note = ?")
         params.append(note)
 
+    return updates, params
+
+
+def update_transaction(transaction_id, date=None, amount=None, type=None,
+                       category=None, note=None):
+    existing = get_transaction(transaction_id)
+    if not existing:
+        raise ValueError(f"Transaction with ID '{transaction_id}' not found")
+
+    updates, params = _transaction_updates(date, amount, type, category, note, existing["account_id"])
+
     if not updates:
         return existing
 
     params.append(transaction_id)
     conn = get_db_connection()
     cursor = conn.cursor()
-    query = f"UPDATE transactions SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    close_db_connection(conn)
-    return get_transaction(transaction_id)
+
+    try:
+        query = f"UPDATE transactions SET {', '.join(updates)} WHERE id = ?"
+        cursor.execute(query, params)
+        if cursor.rowcount == 0:
+            raise ValueError(f"Transaction '{transaction_id}' is archived and cannot be changed")
+
+        # Amount, type or category changes are folded into the category statistics
+        # as a new observation and the transaction is scored again
+        anomaly = None
+        if amount is not None or type is not None or category is not None:
+            row = cursor.execute(
+                f"SELECT type, account_id, category_id, {DECODED_COLUMNS['amount']} FROM transactions WHERE id = ?",
+                (transaction_id,)
+            ).fetchone()
+            if row["type"] == 'expense':
+                anomaly = _score_expense(cursor, transaction_id, row["account_id"], row["category_id"], row["amount"])
+            else:
+                cursor.execute("DELETE FROM transaction_anomalies WHERE transaction_id = ?", (transaction_id,))
+
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    transaction = get_transaction(transaction_id)
+    if anomaly is not None:
+        transaction["anomaly"] = anomaly
+    return transaction
 
 
 def delete_transaction(transaction_id):
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
-    conn.commit()
-    deleted = cursor.rowcount > 0
-    close_db_connection(conn)
+
+    try:
+        cursor.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+        conn.commit()
+        deleted = cursor.rowcount > 0
+    finally:
+        close_db_connection(conn)
+    if not deleted and get_transaction(transaction_id, ["id"]):
+        raise ValueError(f"Transaction '{transaction_id}' is archived and cannot be deleted")
     return deleted
 
 
@@ -409,20 +1194,25 @@ def create_income(id, account_id, date, amount, source=None):
         raise ValueError("Income ID cannot be empty")
     if not account_id:
         raise ValueError("Account ID is required")
-    if not get_account(account_id):
+    scale = get_account_scale(account_id)
+    if scale is None:
         raise ValueError(f"Account '{account_id}' does not exist")
     if not validate_date_format(date):
         raise ValueError("Date must be in YYYY-MM-DD format")
     if amount <= 0:
         raise ValueError("Amount must be positive")
 
+    minor = to_minor_units(amount, scale)
+    if get_existing_ids("income", [id.strip()]):
+        raise ValueError(f"Income with ID '{id}' already exists")
+    source_id = resolve_lookup_id("sources", source)
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
         cursor.execute(
-            "INSERT INTO income (id, account_id, date, amount, source) VALUES (?, ?, ?, ?, ?)",
-            (id.strip(), account_id, date, amount, source)
+            "INSERT INTO income (id, account_id, date, amount, source_id) VALUES (?, ?, ?, ?, ?)",
+            (id.strip(), account_id, date, minor, source_id)
         )
         conn.commit()
         return {
@@ -435,26 +1225,17 @@ def create_income(id, account_id, date, amount, source=None):
         close_db_connection(conn)
 
 
-def get_income(income_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM income WHERE id = ?", (income_id,))
-    row = cursor.fetchone()
-    close_db_connection(conn)
-    return row_to_dict(row)
+def get_income(income_id, fields=None):
+    columns = select_list(fields, INCOME_COLUMNS)
+    return _get_ledger_row("income", INCOME_STORED_COLUMNS, columns, income_id)
 
 
-def get_all_income():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM income ORDER BY date DESC")
-    rows = cursor.fetchall()
-    close_db_connection(conn)
-    return rows_to_list(rows)
+def get_all_income(fields=None):
+    return get_income_by_date_range(fields=fields)
 
 
-def get_income_by_date_range(from_date=None, to_date=None, account_id=None, source=None):
-    query = "SELECT * FROM income WHERE 1=1"
+def _income_filters(from_date=None, to_date=None, account_id=None, source=None):
+    query = " WHERE 1=1"
     params = []
 
     if from_date:
@@ -473,13 +1254,1284 @@ def get_income_by_date_range(from_date=None, to_date=None, account_id=None, sour
         query += " AND account_id = ?"
         params.append(account_id)
 
-    if source:
-        query += " AND source = ?"
-        params.append(source)
+    if source:
+        query += " AND source_id = ?"
+        params.append(lookup_id("sources", source))
+
+    return query, params
+
+
+def get_income_by_date_range(from_date=None, to_date=None, account_id=None, source=None,
+                             fields=None):
+    columns = select_list(fields, INCOME_COLUMNS)
+    where, params = _income_filters(from_date, to_date, account_id, source)
+    _, rows = fetch_ledger("income", INCOME_STORED_COLUMNS, where, params, from_date, to_date,
+                           lambda ledger: f"SELECT {columns} FROM {ledger} ORDER BY date DESC")
+    return rows_to_list(rows)
+
+
+def iter_income_by_date_range(from_date=None, to_date=None, account_id=None, source=None,
+                              chunk_size=EXPORT_CHUNK_SIZE):
+    columns = select_list(None, INCOME_COLUMNS)
+    where, params = _income_filters(from_date, to_date, account_id, source)
+    return iter_ledger_chunks("income", INCOME_STORED_COLUMNS, where, params, from_date, to_date,
+                              lambda ledger: f"SELECT {columns} FROM {ledger} ORDER BY date DESC", chunk_size)
+
+
+def get_income_columnar(from_date=None, to_date=None, account_id=None, source=None, fields=None):
+    columns = select_list(fields or INCOME_COLUMNS, INCOME_COLUMNS)
+    where, params = _income_filters(from_date, to_date, account_id, source)
+    names, rows = fetch_ledger("income", INCOME_STORED_COLUMNS, where, params, from_date, to_date,
+                               lambda ledger: f"SELECT {columns} FROM {ledger} ORDER BY date DESC",
+                               row_factory=None)
+    return names, rows_to_columns(names, rows), len(rows)
+
+
+def _income_updates(date=None, amount=None, source=None, account_id=None):
+    updates = []
+    params = []
+
+    if date is not None:
+        if not validate_date_format(date):
+            raise ValueError("Date must be in YYYY-MM-DD format")
+        updates.append("date = ?")
+        params.append(date)
+
+    if amount is not None:
+        updates.append(_amount_update(amount, account_id))
+        params.append(float(amount))
+
+    if source is not None:
+        updates.append("source_id = ?")
+        params.append(resolve_lookup_id("sources", source))
+
+    return updates, params
+
+
+def update_income(income_id, date=None, amount=None, source=None):
+    existing = get_income(income_id)
+    if not existing:
+        raise ValueError(f"Income with ID '{income_id}' not found")
+
+    updates, params = _income_updates(date, amount, source, existing["account_id"])
+
+    if not updates:
+        return existing
+
+    params.append(income_id)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        query = f"UPDATE income SET {', '.join(updates)} WHERE id = ?"
+        cursor.execute(query, params)
+        if cursor.rowcount == 0:
+            raise ValueError(f"Income '{income_id}' is archived and cannot be changed")
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return get_income(income_id)
+
+
+def delete_income(income_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("DELETE FROM income WHERE id = ?", (income_id,))
+        conn.commit()
+        deleted = cursor.rowcount > 0
+    finally:
+        close_db_connection(conn)
+    if not deleted and get_income(income_id, ["id"]):
+        raise ValueError(f"Income '{income_id}' is archived and cannot be deleted")
+    return deleted
+
+
+# ==================== BULK OPERATIONS ====================
+
+LEDGER_TABLES = ('transactions', 'income')
+
+
+def get_account_ids():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM accounts")
+    ids = {row["id"] for row in cursor.fetchall()}
+    close_db_connection(conn)
+    return ids
+
+
+def get_existing_ids(table, ids):
+    if table not in LEDGER_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+
+    # json_each keeps this a single bound parameter however many ids are
+    # checked; archived ids stay taken, and are found in archived_ids without
+    # attaching the partitions
+    conn = get_read_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?1))
+            UNION ALL
+            SELECT id FROM archived_ids WHERE ledger = ?2 AND id IN (SELECT value FROM json_each(?1))""",
+        (json.dumps(list(ids)), table)
+    )
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+    return {row[0] for row in rows}
+
+
+def get_max_rowid(table):
+    if table not in LEDGER_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}")
+    max_rowid = cursor.fetchone()[0]
+    close_db_connection(conn)
+    return max_rowid
+
+
+def get_rows_in_window(table, account_ids, from_date, to_date, max_rowid=None):
+    # Amounts stay in minor units, which is what reconciliation compares
+    if table not in LEDGER_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+
+    note_column = "note" if table == "transactions" else DECODED_COLUMNS["source"]
+    query = f"""SELECT id, account_id, date, amount, {note_column}
+                FROM {{schema}}.{table}
+                WHERE account_id IN (SELECT value FROM json_each(?))
+                  AND date BETWEEN ? AND ?"""
+    params = [json.dumps(list(account_ids)), from_date, to_date]
+
+    conn = get_read_connection()
+    conn.row_factory = None
+    try:
+        # max_rowid only bounds the hot table; archived rows all predate the import
+        hot = query + (" AND rowid <= ?" if max_rowid is not None else "")
+        rows = conn.execute(hot.format(schema="main"),
+                            params + ([max_rowid] if max_rowid is not None else [])).fetchall()
+        for schema in archive_schemas(conn, from_date, to_date):
+            rows.extend(conn.execute(query.format(schema=schema), params).fetchall())
+    finally:
+        close_db_connection(conn)
+    return rows
+
+
+def _check_not_archived(table, where, params, from_date, to_date):
+    # Bulk changes apply to the hot rows only; archived rows are read-only and
+    # their totals are frozen, so filters that match any of them are rejected
+    conn = get_read_connection()
+    conn.row_factory = None
+    try:
+        archived = 0
+        for schema in archive_schemas(conn, from_date, to_date):
+            archived += conn.execute(f"SELECT COUNT(*) FROM {schema}.{table}" + where, params).fetchone()[0]
+    finally:
+        close_db_connection(conn)
+    if archived:
+        raise ValueError(f"{archived} matching {table} rows are archived and cannot be changed; "
+                         "narrow the filters to dates after the archive cutoff")
+
+
+def _run_bulk(table, where, params, updates=None, update_params=None, dry_run=False,
+              from_date=None, to_date=None):
+    _check_not_archived(table, where, params, from_date, to_date)
+
+    # Count and change in one transaction so the reported count matches what was written
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"SELECT COUNT(*) FROM {table}" + where, params)
+        matched = cursor.fetchone()[0]
+
+        if dry_run or matched == 0:
+            conn.rollback()
+            return {"matched": matched, "changed": 0, "dry_run": dry_run}
+
+        if updates:
+            cursor.execute(f"UPDATE {table} SET {', '.join(updates)}" + where, update_params + params)
+        else:
+            cursor.execute(f"DELETE FROM {table}" + where, params)
+        changed = cursor.rowcount
+        conn.commit()
+        return {"matched": matched, "changed": changed, "dry_run": False}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_db_connection(conn)
+
+
+def _require_filters(params):
+    if not params:
+        raise ValueError("At least one filter is required for bulk operations")
+
+
+def bulk_update_transactions(from_date=None, to_date=None, account_id=None, type=None,
+                             category=None, changes=None, dry_run=False):
+    where, params = _transaction_filters(from_date, to_date, account_id, type, category)
+    _require_filters(params)
+
+    changes = changes or {}
+    unknown = set(changes) - {"date", "amount", "type", "category", "note"}
+    if unknown:
+        raise ValueError(f"Cannot bulk update field(s): {', '.join(sorted(unknown))}")
+
+    updates, update_params = _transaction_updates(**changes, account_id=account_id)
+    if not updates:
+        raise ValueError("No fields to update")
+
+    return _run_bulk("transactions", where, params, updates, update_params, dry_run, from_date, to_date)
+
+
+def bulk_delete_transactions(from_date=None, to_date=None, account_id=None, type=None,
+                             category=None, dry_run=False):
+    where, params = _transaction_filters(from_date, to_date, account_id, type, category)
+    _require_filters(params)
+    return _run_bulk("transactions", where, params, dry_run=dry_run, from_date=from_date, to_date=to_date)
+
+
+def bulk_update_income(from_date=None, to_date=None, account_id=None, source=None,
+                       changes=None, dry_run=False):
+    where, params = _income_filters(from_date, to_date, account_id, source)
+    _require_filters(params)
+
+    changes = changes or {}
+    unknown = set(changes) - {"date", "amount", "source"}
+    if unknown:
+        raise ValueError(f"Cannot bulk update field(s): {', '.join(sorted(unknown))}")
+
+    updates, update_params = _income_updates(**changes, account_id=account_id)
+    if not updates:
+        raise ValueError("No fields to update")
+
+    return _run_bulk("income", where, params, updates, update_params, dry_run, from_date, to_date)
+
+
+def bulk_delete_income(from_date=None, to_date=None, account_id=None, source=None, dry_run=False):
+    where, params = _income_filters(from_date, to_date, account_id, source)
+    _require_filters(params)
+    return _run_bulk("income", where, params, dry_run=dry_run, from_date=from_date, to_date=to_date)
+
+
+def _encode_rows(rows, index, table):
+    # Rows arrive in the API's shape, (id, account_id, date, amount, ...) with
+    # names and major units; swap in the lookup ids and minor units
+    ids = resolve_lookup_ids(table, {row[index] for row in rows})
+    scales = get_account_scales() if rows else {}
+    return [row[:3] + (to_minor_units(row[3], scales.get(row[1], DEFAULT_SCALE)),)
+            + row[4:index] + (ids.get(row[index]),) + row[index + 1:] for row in rows]
+
+
+def bulk_insert_transactions(rows):
+    rows = _encode_rows(rows, 5, "categories")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(
+            "INSERT INTO transactions (id, account_id, date, amount, type, category_id, note) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        return cursor.rowcount
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise ValueError(f"Bulk insert failed: {e}")
+    finally:
+        close_db_connection(conn)
+
+
+def bulk_insert_income(rows):
+    rows = _encode_rows(rows, 4, "sources")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(
+            "INSERT INTO income (id, account_id, date, amount, source_id) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        return cursor.rowcount
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise ValueError(f"Bulk insert failed: {e}")
+    finally:
+        close_db_connection(conn)
+
+
+# ==================== LEDGER ====================
+
+LEDGER_COLUMNS = ("record_type", "id", "account_id", "date", "amount", "type", "category", "note")
+LEDGER_PAGE_LIMIT = 1000
+
+
+def encode_ledger_cursor(entry):
+    key = [entry["date"], entry["record_type"], entry["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_ledger_cursor(cursor):
+    try:
+        date, record_type, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid ledger cursor")
+    return date, record_type, id
+
+
+def _ledger_keyset(record_type, after):
+    # Entries are ordered by (date, record_type, id) descending. Each table has a
+    # fixed record_type, so the cursor becomes a plain (date, id) bound per table.
+    if after is None:
+        return "", []
+
+    date, after_type, id = after
+    if record_type == after_type:
+        return " AND (date, id) < (?, ?)", [date, id]
+    if record_type < after_type:
+        return " AND date <= ?", [date]
+    return " AND date < ?", [date]
+
+
+def get_ledger_page(from_date=None, to_date=None, account_id=None, type=None,
+                    category=None, cursor=None, limit=100):
+    if limit < 1 or limit > LEDGER_PAGE_LIMIT:
+        raise ValueError(f"limit must be between 1 and {LEDGER_PAGE_LIMIT}")
+
+    after = decode_ledger_cursor(cursor) if cursor else None
+    streams = [("transaction", "transactions", TRANSACTION_STORED_COLUMNS,
+                _transaction_filters(from_date, to_date, account_id, type, category),
+                f"'transaction', id, account_id, date, {DECODED_COLUMNS['amount']}, type, "
+                f"{DECODED_COLUMNS['category']}, note")]
+    # Income table rows are always income, with the source shown as category
+    if type in (None, 'income'):
+        streams.append(("income", "income", INCOME_STORED_COLUMNS,
+                        _income_filters(from_date, to_date, account_id, category),
+                        f"'income', id, account_id, date, {DECODED_COLUMNS['amount']}, 'income', "
+                        f"{DECODED_COLUMNS['source']}, NULL"))
+
+    # Each table (hot rows and archive partitions) yields at most limit + 1
+    # entries past the cursor; the page is the newest limit + 1 of them all
+    rows = []
+    conn = get_read_connection()
+    conn.row_factory = None
+    try:
+        for schemas, bounds in attached_partitions(conn, from_date, to_date):
+            for record_type, table, columns, (where, params), select in streams:
+                keyset, keyset_params = _ledger_keyset(record_type, after)
+                source, source_params = ledger_source(table, columns, where + keyset, params + keyset_params,
+                                                      schemas, bounds)
+                rows.extend(conn.execute(
+                    f"SELECT {select} FROM {source} ORDER BY date DESC, id DESC LIMIT ?",
+                    source_params + [limit + 1]
+                ).fetchall())
+    finally:
+        close_db_connection(conn)
+
+    rows = heapq.nlargest(limit + 1, rows, key=lambda row: (row[3], row[0], row[1]))
+    entries = [dict(zip(LEDGER_COLUMNS, row)) for row in rows[:limit]]
+    next_cursor = encode_ledger_cursor(entries[-1]) if len(rows) > limit else None
+    return {"entries": entries, "count": len(entries), "next_cursor": next_cursor}
+
+
+# ==================== BUCKET COLUMNS ====================
+
+# Generated from date so month and day aggregates can walk an index instead of
+# evaluating strftime() per row. SQLite only allows VIRTUAL generated columns to
+# be added to an existing table; indexing them stores the computed values.
+BUCKET_COLUMNS = {
+    "month_key": "TEXT GENERATED ALWAYS AS (substr(date, 1, 7)) VIRTUAL",
+    "epoch_day": "INTEGER GENERATED ALWAYS AS (CAST(julianday(date) - 2440587.5 AS INTEGER)) VIRTUAL"
+}
+
+
+def add_column_if_missing(cursor, table, column, definition):
+    # table_xinfo (unlike table_info) also lists generated columns
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})").fetchall()}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_bucket_columns(cursor):
+    for table in LEDGER_TABLES:
+        for column, definition in BUCKET_COLUMNS.items():
+            add_column_if_missing(cursor, table, column, definition)
+
+    # Monthly sums group by account too, to scale each account's integer total
+    cursor.execute('DROP INDEX IF EXISTS idx_transactions_month')
+    cursor.execute('DROP INDEX IF EXISTS idx_income_month')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_month_account '
+                   'ON transactions(type, month_key, account_id, amount)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_epoch_day '
+                   'ON transactions(epoch_day, type, month_key, category_id, account_id, amount)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_month_account '
+                   'ON income(month_key, account_id, amount)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_income_epoch_day '
+                   'ON income(epoch_day, month_key, source_id, account_id, amount)')
+
+
+def to_epoch_day(date_str):
+    return (datetime.strptime(date_str, "%Y-%m-%d") - datetime(1970, 1, 1)).days
+
+
+def _epoch_day_filters(from_date=None, to_date=None, account_id=None):
+    query = " WHERE 1=1"
+    params = []
+
+    if account_id:
+        query += " AND account_id = ?"
+        params.append(account_id)
+
+    if from_date:
+        if not validate_date_format(from_date):
+            raise ValueError("from_date must be in YYYY-MM-DD format")
+        query += " AND epoch_day >= ?"
+        params.append(to_epoch_day(from_date))
+
+    if to_date:
+        if not validate_date_format(to_date):
+            raise ValueError("to_date must be in YYYY-MM-DD format")
+        query += " AND epoch_day <= ?"
+        params.append(to_epoch_day(to_date))
+
+    return query, params
+
+
+# ==================== BALANCES ====================
+
+# Signed effect of a row on its account balance
+TRANSACTION_DELTA = "CASE WHEN {row}.type = 'income' THEN {row}.amount ELSE -{row}.amount END"
+INCOME_DELTA = "{row}.amount"
+
+
+def _balance_apply_sql(row, delta, seed=True):
+    # For new rows, make sure the row's month has a checkpoint (seeded from the
+    # previous month's closing balance); then shift that month and every later one.
+    # Removed rows always have a checkpoint already.
+    account = f"{row}.account_id"
+    month = f"substr({row}.date, 1, 7)"
+    delta = delta.format(row=row)
+    sql = ""
+    if seed:
+        sql += f"""
+        INSERT OR IGNORE INTO account_balance_checkpoints (account_id, month, net, balance)
+        VALUES ({account}, {month}, 0, COALESCE((
+            SELECT balance FROM account_balance_checkpoints
+            WHERE account_id = {account} AND month < {month}
+            ORDER BY month DESC LIMIT 1), 0));"""
+    return sql + f"""
+        UPDATE account_balance_checkpoints
+        SET net = net + CASE WHEN month = {month} THEN ({delta}) ELSE 0 END,
+            balance = balance + ({delta})
+        WHERE account_id = {account} AND month >= {month};"""
+
+
+def create_balance_checkpoints(cursor):
+    created = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'account_balance_checkpoints'"
+    ).fetchone() is None
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS account_balance_checkpoints
+                   (
+                       account_id TEXT NOT NULL,
+                       month TEXT NOT NULL,
+                       net INTEGER NOT NULL DEFAULT 0,
+                       balance INTEGER NOT NULL DEFAULT 0,
+                       PRIMARY KEY (account_id, month),
+                       FOREIGN KEY (account_id) REFERENCES accounts (id) ON DELETE CASCADE
+                   )
+                   ''')
+
+    for table, delta, columns in (
+            ("transactions", TRANSACTION_DELTA, "account_id, date, amount, type"),
+            ("income", INCOME_DELTA, "account_id, date, amount")):
+        for event, body in (
+                ("INSERT", _balance_apply_sql("NEW", delta)),
+                ("DELETE", _balance_apply_sql("OLD", "-(" + delta + ")", seed=False)),
+                (f"UPDATE OF {columns}",
+                 _balance_apply_sql("OLD", "-(" + delta + ")", seed=False) + _balance_apply_sql("NEW", delta))):
+            name = f"trg_{table}_balance_{event.split()[0].lower()}"
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {body} END")
+
+    if created:
+        _rebuild_balance_checkpoints(cursor)
+
+
+def _rebuild_balance_checkpoints(cursor):
+    cursor.execute("DELETE FROM account_balance_checkpoints")
+    cursor.execute(f"""
+        INSERT INTO account_balance_checkpoints (account_id, month, net, balance)
+        SELECT account_id, month, net,
+               SUM(net) OVER (PARTITION BY account_id ORDER BY month)
+        FROM (
+            SELECT account_id, month, SUM(delta) AS net
+            FROM (
+                SELECT t.account_id, substr(t.date, 1, 7) AS month, {TRANSACTION_DELTA.format(row="t")} AS delta
+                FROM transactions t
+                UNION ALL
+                SELECT i.account_id, substr(i.date, 1, 7), {INCOME_DELTA.format(row="i")}
+                FROM income i
+                UNION ALL
+                SELECT a.account_id, a.month, CASE WHEN a.type = 'income' THEN a.total ELSE -a.total END
+                FROM archived_ledger_totals a
+            )
+            GROUP BY account_id, month
+        )
+    """)
+    return cursor.rowcount
+
+
+def rebuild_balance_checkpoints():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        count = _rebuild_balance_checkpoints(cursor)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return count
+
+
+def get_account_balance(account_id, as_of=None):
+    as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+    if not validate_date_format(as_of):
+        raise ValueError("as_of must be in YYYY-MM-DD format")
+
+    month = as_of[:7]
+    scale = get_account_scale(account_id) or DEFAULT_SCALE
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    # Closing balance of the latest month before as_of ...
+    cursor.execute(
+        """SELECT balance FROM account_balance_checkpoints
+           WHERE account_id = ? AND month < ? ORDER BY month DESC LIMIT 1""",
+        (account_id, month)
+    )
+    row = cursor.fetchone()
+    checkpoint = row["balance"] if row else 0
+
+    # ... plus the rows from the start of as_of's month up to as_of, which
+    # may sit in an archive partition
+    where = " WHERE account_id = ? AND date >= ? AND date <= ?"
+    params = [account_id, month + "-01", as_of]
+    tail = 0
+    try:
+        for schemas, bounds in attached_partitions(conn, month + "-01", as_of):
+            transactions, transaction_params = ledger_source(
+                "transactions", ("date", "amount", "type"), where, params, schemas, bounds)
+            income, income_params = ledger_source("income", ("date", "amount"), where, params, schemas, bounds)
+            cursor.execute(
+                f"""SELECT COALESCE(SUM(delta), 0) AS tail FROM (
+                        SELECT {TRANSACTION_DELTA.format(row="t")} AS delta
+                        FROM (SELECT type, amount FROM {transactions}) t
+                        UNION ALL
+                        SELECT {INCOME_DELTA.format(row="i")} FROM (SELECT amount FROM {income}) i
+                    )""",
+                transaction_params + income_params
+            )
+            tail += cursor.fetchone()["tail"]
+    finally:
+        close_db_connection(conn)
+
+    return {"account_id": account_id, "as_of": as_of, "balance": (checkpoint + tail) / scale}
+
+
+def get_balance_history(account_id, granularity="month", from_month=None, to_month=None):
+    if granularity not in ("month", "year"):
+        raise ValueError("granularity must be 'month' or 'year'")
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT month, net, balance FROM account_balance_checkpoints WHERE account_id = ? ORDER BY month",
+        (account_id,)
+    )
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+
+    # Months without activity have no checkpoint; carry the balance forward
+    history = []
+    balance = 0
+    by_month = {row["month"]: row for row in rows}
+    if rows:
+        current = datetime.strptime(rows[0]["month"] + "-01", "%Y-%m-%d")
+        last = rows[-1]["month"]
+        while True:
+            month = current.strftime("%Y-%m")
+            row = by_month.get(month)
+            net = row["net"] if row else 0
+            balance = row["balance"] if row else balance
+            history.append({"period": month, "net": net, "balance": balance})
+            if month == last:
+                break
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    if granularity == "year":
+        years = {}
+        for entry in history:
+            year = entry["period"][:4]
+            if year not in years:
+                years[year] = {"period": year, "net": 0, "balance": 0}
+            years[year]["net"] += entry["net"]
+            years[year]["balance"] = entry["balance"]
+        history = list(years.values())
+
+    if from_month:
+        history = [entry for entry in history if entry["period"] >= from_month[:len(entry["period"])]]
+    if to_month:
+        history = [entry for entry in history if entry["period"] <= to_month[:len(entry["period"])]]
+
+    scale = get_account_scale(account_id) or DEFAULT_SCALE
+    for entry in history:
+        entry["net"] /= scale
+        entry["balance"] /= scale
+
+    return {"account_id": account_id, "granularity": granularity, "history": history}
+
+
+# ==================== ANOMALIES ====================
+
+# Exponentially weighted mean/variance of expense amounts per category and
+# account currency, so amounts in different currencies are never mixed.
+# Single writes update them in O(1); rebuilds recompute them from the ledger.
+
+def create_anomaly_tables(cursor):
+    # Statistics were keyed by category name before the lookup tables, then by
+    # category id alone; both are dropped and recomputed per currency below
+    columns = _table_columns(cursor, "main", "category_expense_stats")
+    if "category" in columns:
+        cursor.execute("INSERT OR IGNORE INTO categories (name) "
+                       "SELECT category FROM category_expense_stats WHERE category <> 'Uncategorized'")
+    stale = bool(columns) and "currency" not in columns
+    if stale:
+        cursor.execute("DROP TABLE category_expense_stats")
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS category_expense_stats
+                   (
+                       category_id INTEGER NOT NULL,
+                       currency TEXT NOT NULL,
+                       count INTEGER NOT NULL,
+                       mean REAL NOT NULL,
+                       var REAL NOT NULL,
+                       PRIMARY KEY (category_id, currency)
+                   )
+                   ''')
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS transaction_anomalies
+                   (
+                       transaction_id TEXT PRIMARY KEY,
+                       score REAL,
+                       expected REAL,
+                       baseline_count INTEGER NOT NULL,
+                       FOREIGN KEY (transaction_id) REFERENCES transactions (id) ON DELETE CASCADE
+                   )
+                   ''')
+    if stale:
+        _rescore_expenses(cursor)
+
+
+def anomaly_key(category_id):
+    # Uncategorized expenses share key 0 (lookup ids start at 1)
+    return category_id if category_id is not None else 0
+
+
+def anomaly_score(amount, mean, var):
+    # The deviation is floored so near-constant categories (rent) are not
+    # flagged for a few cents' difference
+    std = max(math.sqrt(var), ANOMALY_MIN_STD_RATIO * abs(mean), 0.01)
+    return (amount - mean) / std
+
+
+def anomaly_summary(score, expected, baseline_count):
+    return {
+        "score": round(score, 2) if score is not None else None,
+        "expected": round(expected, 2) if expected is not None else None,
+        "flagged": (score is not None and baseline_count >= ANOMALY_MIN_COUNT
+                    and abs(score) >= ANOMALY_THRESHOLD)
+    }
+
+
+def _score_expense(cursor, transaction_id, account_id, category_id, amount):
+    key = anomaly_key(category_id)
+    currency = cursor.execute("SELECT currency FROM accounts WHERE id = ?", (account_id,)).fetchone()[0]
+    row = cursor.execute(
+        "SELECT count, mean, var FROM category_expense_stats WHERE category_id = ? AND currency = ?",
+        (key, currency)
+    ).fetchone()
+
+    # Score against the statistics before this transaction, then fold it in
+    if row is None:
+        count, mean, var = 0, amount, 0.0
+        score, expected = None, None
+    else:
+        count, mean, var = row["count"], row["mean"], row["var"]
+        score, expected = anomaly_score(amount, mean, var), mean
+
+    diff = amount - mean
+    increment = ANOMALY_EWMA_ALPHA * diff
+    cursor.execute(
+        """INSERT INTO category_expense_stats (category_id, currency, count, mean, var) VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT(category_id, currency) DO UPDATE SET
+               count = excluded.count, mean = excluded.mean, var = excluded.var""",
+        (key, currency, count + 1, mean + increment, (1 - ANOMALY_EWMA_ALPHA) * (var + diff * increment))
+    )
+    cursor.execute(
+        """INSERT OR REPLACE INTO transaction_anomalies
+           (transaction_id, score, expected, baseline_count) VALUES (?, ?, ?, ?)""",
+        (transaction_id, score, expected, count)
+    )
+    return anomaly_summary(score, expected, count)
+
+
+def _rescore_expenses(cursor):
+    # Replays every expense through the incremental update, in the order
+    # get_expense_series gives them; for migrations and currency changes
+    cursor.execute("DELETE FROM category_expense_stats")
+    cursor.execute("DELETE FROM transaction_anomalies")
+    rows = cursor.execute(
+        f"""SELECT id, account_id, category_id, {DECODED_COLUMNS['amount']}
+            FROM transactions WHERE type = 'expense'
+            ORDER BY date, id"""
+    ).fetchall()
+    for row in rows:
+        _score_expense(cursor, row["id"], row["account_id"], row["category_id"], row["amount"])
+
+
+def anomaly_stats_missing():
+    # True for databases that have expenses but predate the anomaly tables
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT NOT EXISTS (SELECT 1 FROM category_expense_stats)
+                  AND EXISTS (SELECT 1 FROM transactions WHERE type = 'expense')"""
+    )
+    missing = bool(cursor.fetchone()[0])
+    close_db_connection(conn)
+    return missing
+
+
+def get_expense_series():
+    # Expense amounts ordered per category and currency by date, as the
+    # incremental updates would see them
+    conn = get_read_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT id, COALESCE(category_id, 0) AS key, {ACCOUNT_CURRENCY.format(account='account_id')} AS currency,
+                   {DECODED_COLUMNS['amount']}
+            FROM transactions WHERE type = 'expense'
+            ORDER BY key, currency, date, id"""
+    )
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+    return rows
+
+
+def replace_anomaly_scores(stats, scores):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM category_expense_stats")
+        cursor.execute("DELETE FROM transaction_anomalies")
+        cursor.executemany(
+            "INSERT INTO category_expense_stats (category_id, currency, count, mean, var) VALUES (?, ?, ?, ?, ?)",
+            stats
+        )
+        cursor.executemany(
+            """INSERT INTO transaction_anomalies
+               (transaction_id, score, expected, baseline_count) VALUES (?, ?, ?, ?)""",
+            scores
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_db_connection(conn)
+    return len(scores)
+
+
+def get_anomalies(from_date=None, to_date=None, category=None,
+                  min_score=ANOMALY_THRESHOLD, limit=100):
+    # type is matched with a unary + so the planner uses the date index, not type
+    where, params = _transaction_filters(from_date, to_date, None, None, category)
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT t.id, t.account_id, t.date, {DECODED_COLUMNS['amount']}, {DECODED_COLUMNS['category']}, t.note,
+                   a.score, a.expected, a.baseline_count
+            FROM transactions t
+            JOIN transaction_anomalies a ON a.transaction_id = t.id
+            {where} AND +t.type = 'expense' AND a.baseline_count >= ? AND ABS(a.score) >= ?
+            ORDER BY ABS(a.score) DESC, t.date DESC
+            LIMIT ?""",
+        params + [ANOMALY_MIN_COUNT, min_score, limit]
+    )
+    rows = rows_to_list(cursor.fetchall())
+    close_db_connection(conn)
+    return rows
+
+
+# ==================== BUDGETS ====================
+
+# budget_spend holds one expense counter per (budget, month). Triggers on
+# transactions adjust the counters of every matching budget inside the same
+# write transaction, so a status check is a primary-key lookup. A budget has a
+# single currency: its account's, or for budgets on all accounts their own
+# (USD unless given), which then only count expenses of accounts in that
+# currency. Amounts and counters are in that currency's minor unit.
+
+def _budget_match_sql(row):
+    # One indexed lookup per scope: category and account, category only,
+    # account only, and budgets on all expenses
+    currency = ACCOUNT_CURRENCY.format(account=f"{row}.account_id")
+    return f"""SELECT id FROM budgets
+                   WHERE category_id = {row}.category_id AND account_id = {row}.account_id
+               UNION ALL SELECT id FROM budgets
+                   WHERE category_id = {row}.category_id AND account_id IS NULL AND currency = {currency}
+               UNION ALL SELECT id FROM budgets
+                   WHERE category_id IS NULL AND account_id = {row}.account_id
+               UNION ALL SELECT id FROM budgets
+                   WHERE category_id IS NULL AND account_id IS NULL AND currency = {currency}"""
+
+
+def _budget_apply_sql(row, sign=""):
+    # The removed row's counter always exists, so subtracting is an upsert too
+    return f"""INSERT INTO budget_spend (budget_id, month, spent)
+               SELECT id, substr({row}.date, 1, 7), {sign}{row}.amount FROM ({_budget_match_sql(row)})
+               WHERE {row}.type = 'expense'
+               ON CONFLICT (budget_id, month) DO UPDATE SET spent = spent + excluded.spent;"""
+
+
+def create_budget_tables(cursor):
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS budgets
+                   (
+                       id TEXT PRIMARY KEY,
+                       name TEXT NOT NULL,
+                       category_id INTEGER REFERENCES categories (id),
+                       account_id TEXT,
+                       currency TEXT,
+                       scale INTEGER,
+                       amount INTEGER NOT NULL,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       FOREIGN KEY (account_id) REFERENCES accounts (id) ON DELETE CASCADE
+                   )
+                   ''')
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS budget_spend
+                   (
+                       budget_id TEXT NOT NULL,
+                       month TEXT NOT NULL,
+                       spent INTEGER NOT NULL DEFAULT 0,
+                       PRIMARY KEY (budget_id, month),
+                       FOREIGN KEY (budget_id) REFERENCES budgets (id) ON DELETE CASCADE
+                   )
+                   ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_budgets_scope ON budgets(category_id, account_id)')
+
+    # Budgets on all accounts used to add every currency's minor units at the
+    # default scale; they move to the most common account currency
+    add_column_if_missing(cursor, "budgets", "currency", "TEXT")
+    add_column_if_missing(cursor, "budgets", "scale", "INTEGER")
+    if cursor.execute("SELECT EXISTS (SELECT 1 FROM budgets WHERE account_id IS NULL AND currency IS NULL)").fetchone()[0]:
+        row = cursor.execute("SELECT currency FROM accounts GROUP BY currency "
+                             "ORDER BY COUNT(*) DESC, currency LIMIT 1").fetchone()
+        currency = row[0] if row else "USD"
+        scale = currency_scale(currency)
+        cursor.execute(
+            """UPDATE budgets SET currency = ?, scale = ?, amount = CAST(ROUND(amount * ? * 1.0 / ?) AS INTEGER)
+               WHERE account_id IS NULL AND currency IS NULL""",
+            (currency, scale, scale, DEFAULT_SCALE)
+        )
+        _rebuild_budget_spend(cursor)
+
+    for event, body in (
+            ("INSERT", _budget_apply_sql("NEW")),
+            ("DELETE", _budget_apply_sql("OLD", "-")),
+            ("UPDATE OF account_id, date, amount, type, category_id",
+             _budget_apply_sql("OLD", "-") + _budget_apply_sql("NEW"))):
+        name = f"trg_transactions_budget_{event.split()[0].lower()}"
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} AFTER {event} ON transactions BEGIN {body} END")
+
+
+def _rebuild_budget_spend(cursor, budget_id=None):
+    where = " AND b.id = ?" if budget_id else ""
+    params = (budget_id,) * 4 if budget_id else ()
+    cursor.execute(f"DELETE FROM budget_spend{' WHERE budget_id = ?' if budget_id else ''}", params[:1])
+
+    # Monthly expense totals per (category, account), matched to budgets
+    # through the same four indexed scopes the triggers use
+    scopes = (
+        "b.category_id = a.category_id AND b.account_id = a.account_id",
+        "b.category_id = a.category_id AND b.account_id IS NULL AND b.currency = a.currency",
+        "b.category_id IS NULL AND b.account_id = a.account_id",
+        "b.category_id IS NULL AND b.account_id IS NULL AND b.currency = a.currency"
+    )
+    matches = " UNION ALL ".join(
+        f"SELECT b.id, a.month_key, a.total FROM totals a JOIN budgets b ON {scope}{where}"
+        for scope in scopes
+    )
+    cursor.execute(
+        f"""INSERT INTO budget_spend (budget_id, month, spent)
+            WITH ledger AS (
+                SELECT category_id, account_id, month_key, SUM(amount) AS total
+                FROM transactions WHERE type = 'expense'
+                GROUP BY category_id, account_id, month_key
+                UNION ALL
+                SELECT category_id, account_id, month, total
+                FROM archived_ledger_totals WHERE type = 'expense'
+            ),
+            totals AS (
+                SELECT category_id, account_id, month_key, total,
+                       {ACCOUNT_CURRENCY.format(account="account_id")} AS currency
+                FROM ledger
+            )
+            SELECT id, month_key, SUM(total) FROM ({matches})
+            GROUP BY id, month_key""",
+        params
+    )
+    return cursor.rowcount
+
+
+def rebuild_budget_spend():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        count = _rebuild_budget_spend(cursor)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return count
+
+
+def _validate_budget_amount(amount):
+    if amount is None or amount <= 0:
+        raise ValueError("Budget amount must be positive")
+
+
+def _budget_currency(account_id, currency=None):
+    # (currency, scale) of a budget: its account's, or its own for budgets on all accounts
+    if account_id:
+        account = get_account(account_id)
+        if not account:
+            raise ValueError(f"Account '{account_id}' does not exist")
+        if currency and currency.upper() != account["currency"]:
+            raise ValueError(f"A budget on account '{account_id}' is in the account's currency, "
+                             f"{account['currency']}")
+        return account["currency"], currency_scale(account["currency"])
+
+    currency = (currency or "USD").upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError("Currency must be a 3-letter code")
+    return currency, currency_scale(currency)
+
+
+def create_budget(id, name, amount, category=None, account_id=None, currency=None):
+    if not id or not id.strip():
+        raise ValueError("Budget ID cannot be empty")
+    if not name or not name.strip():
+        raise ValueError("Budget name cannot be empty")
+    _validate_budget_amount(amount)
+    currency, scale = _budget_currency(account_id, currency)
+
+    minor = to_minor_units(amount, scale)
+    category_id = resolve_lookup_id("categories", category or None)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        # Only budgets on all accounts store their currency
+        cursor.execute(
+            "INSERT INTO budgets (id, name, category_id, account_id, currency, scale, amount) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (id.strip(), name.strip(), category_id, account_id or None,
+             None if account_id else currency, None if account_id else scale, minor)
+        )
+        # Seed the counters from the expenses recorded before the budget existed
+        _rebuild_budget_spend(cursor, id.strip())
+        conn.commit()
+        return {
+            "id": id.strip(), "name": name.strip(), "category": category or None,
+            "account_id": account_id or None, "currency": currency, "amount": amount
+        }
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Budget with ID '{id}' already exists")
+    finally:
+        close_db_connection(conn)
+
+
+def get_budget(budget_id):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {select_list(None, BUDGET_COLUMNS, BUDGET_DECODED_COLUMNS)} FROM budgets WHERE id = ?",
+                   (budget_id,))
+    row = cursor.fetchone()
+    close_db_connection(conn)
+    return row_to_dict(row)
+
+
+def get_all_budgets():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {select_list(None, BUDGET_COLUMNS, BUDGET_DECODED_COLUMNS)} FROM budgets ORDER BY name")
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+    return rows_to_list(rows)
+
+
+def update_budget(budget_id, name=None, amount=None, category=None, account_id=None, currency=None):
+    existing = get_budget(budget_id)
+    if not existing:
+        raise ValueError(f"Budget with ID '{budget_id}' not found")
+
+    updates = []
+    params = []
+
+    if name is not None:
+        if not name.strip():
+            raise ValueError("Budget name cannot be empty")
+        updates.append("name = ?")
+        params.append(name.strip())
+
+    # A new account or currency may have another minor unit, so the amount is
+    # stored again; budgets on all accounts keep their currency unless given one
+    scope_changed = account_id is not None or currency is not None
+    target_account = account_id or existing["account_id"]
+    currency, scale = _budget_currency(
+        target_account, currency if currency is not None or target_account else existing["currency"]
+    )
+    if scope_changed:
+        updates.append("account_id = ?")
+        params.append(target_account)
+        updates.append("currency = ?")
+        params.append(None if target_account else currency)
+        updates.append("scale = ?")
+        params.append(None if target_account else scale)
+
+    if amount is not None or scope_changed:
+        if amount is not None:
+            _validate_budget_amount(amount)
+        updates.append("amount = ?")
+        params.append(to_minor_units(existing["amount"] if amount is None else amount, scale))
+
+    if category is not None:
+        updates.append("category_id = ?")
+        params.append(resolve_lookup_id("categories", category))
+
+    if not updates:
+        return existing
+
+    params.append(budget_id)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"UPDATE budgets SET {', '.join(updates)} WHERE id = ?", params)
+        # A new scope matches different expenses
+        if category is not None or scope_changed:
+            _rebuild_budget_spend(cursor, budget_id)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return get_budget(budget_id)
+
+
+def delete_budget(budget_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("DELETE FROM budgets WHERE id = ?", (budget_id,))
+        conn.commit()
+        deleted = cursor.rowcount > 0
+    finally:
+        close_db_connection(conn)
+    return deleted
+
+
+def get_budget_status(month=None, budget_id=None):
+    month = month or datetime.now().strftime("%Y-%m")
+    if not validate_month_format(month):
+        raise ValueError("month must be in YYYY-MM format")
+
+    columns = ", ".join(BUDGET_DECODED_COLUMNS.get(c, "b." + c) for c in BUDGET_COLUMNS if c != 'created_at')
+    query = f"""SELECT {columns},
+                       b.amount AS amount_minor, COALESCE(s.spent, 0) AS spent_minor,
+                       {BUDGET_SCALE} AS budget_scale
+                FROM budgets b
+                LEFT JOIN budget_spend s ON s.budget_id = b.id AND s.month = ?"""
+    params = [month]
+    if budget_id:
+        query += " WHERE b.id = ?"
+        params.append(budget_id)
+    query += " ORDER BY b.name"
+
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = rows_to_list(cursor.fetchall())
+    close_db_connection(conn)
+
+    for row in rows:
+        amount, spent, scale = row.pop("amount_minor"), row.pop("spent_minor"), row.pop("budget_scale")
+        row["month"] = month
+        row["spent"] = spent / scale
+        row["remaining"] = (amount - spent) / scale
+        row["utilization"] = round(spent / amount, 4)
+        row["over_budget"] = spent > amount
+    return rows
+
+
+# ==================== RECURRING SCHEDULES ====================
+
+def create_recurring_tables(cursor):
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS recurring_schedules
+                   (
+                       id TEXT PRIMARY KEY,
+                       name TEXT NOT NULL,
+                       target TEXT NOT NULL,
+                       account_id TEXT NOT NULL,
+                       amount INTEGER NOT NULL,
+                       type TEXT,
+                       category_id INTEGER REFERENCES categories (id),
+                       source_id INTEGER REFERENCES sources (id),
+                       note TEXT,
+                       frequency TEXT NOT NULL,
+                       interval INTEGER NOT NULL DEFAULT 1,
+                       day_of_month INTEGER,
+                       weekday INTEGER,
+                       week_of_month INTEGER,
+                       start_date TEXT NOT NULL,
+                       end_date TEXT,
+                       materialized_through TEXT,
+                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                       FOREIGN KEY (account_id) REFERENCES accounts (id) ON DELETE CASCADE
+                   )
+                   ''')
+
+    # Schedules from before this stored the category or source name and REAL
+    # major units
+    if "category" in _table_columns(cursor, "main", "recurring_schedules"):
+        for target, lookup in (("transactions", "categories"), ("income", "sources")):
+            id_column = LOOKUP_COLUMNS[lookup]
+            cursor.execute(f"INSERT OR IGNORE INTO {lookup} (name) SELECT DISTINCT category "
+                           f"FROM recurring_schedules WHERE target = ? AND category IS NOT NULL", (target,))
+            if id_column not in _table_columns(cursor, "main", "recurring_schedules"):
+                cursor.execute(f"ALTER TABLE recurring_schedules ADD COLUMN {id_column} "
+                               f"INTEGER REFERENCES {lookup} (id)")
+            cursor.execute(f"UPDATE recurring_schedules SET {id_column} = "
+                           f"(SELECT id FROM {lookup} WHERE name = category) WHERE target = ?", (target,))
+        cursor.execute("ALTER TABLE recurring_schedules DROP COLUMN category")
+    _encode_amount_column(cursor, "main", "recurring_schedules", "amount", ACCOUNT_SCALE.format(account="account_id"))
+
+
+def _schedule_lookup_ids(target, category):
+    # (category_id, source_id) of a schedule's category name
+    if target == "income":
+        return None, resolve_lookup_id("sources", category)
+    return resolve_lookup_id("categories", category), None
+
+
+def _validate_schedule(target, account_id, amount, type, frequency, interval,
+                       day_of_month, weekday, week_of_month, start_date, end_date):
+    if target not in LEDGER_TABLES:
+        raise ValueError("target must be 'transactions' or 'income'")
+    scale = get_account_scale(account_id) if account_id else None
+    if scale is None:
+        raise ValueError(f"Account '{account_id}' does not exist")
+    if amount is None or amount <= 0:
+        raise ValueError("Amount must be positive")
+    minor = to_minor_units(amount, scale)
+    if target == "transactions" and type not in ('expense', 'income'):
+        raise ValueError("Type must be 'expense' or 'income'")
+    if frequency not in SCHEDULE_FREQUENCIES:
+        raise ValueError("frequency must be one of: " + ", ".join(SCHEDULE_FREQUENCIES))
+    if interval < 1:
+        raise ValueError("interval must be at least 1")
+    if frequency == "monthly" and (day_of_month is None or not (1 <= day_of_month <= 31 or day_of_month == -1)):
+        raise ValueError("day_of_month must be 1-31, or -1 for the last day")
+    if frequency in ("weekly", "nth_weekday") and (weekday is None or not 0 <= weekday <= 6):
+        raise ValueError("weekday must be 0 (Monday) to 6 (Sunday)")
+    if frequency == "nth_weekday" and (week_of_month is None or not (1 <= week_of_month <= 5 or week_of_month == -1)):
+        raise ValueError("week_of_month must be 1-5, or -1 for the last")
+    if not start_date or not validate_date_format(start_date):
+        raise ValueError("start_date must be in YYYY-MM-DD format")
+    if end_date is not None:
+        if not validate_date_format(end_date):
+            raise ValueError("end_date must be in YYYY-MM-DD format")
+        if end_date < start_date:
+            raise ValueError("end_date must not be before start_date")
+    return minor
+
+
+def create_recurring_schedule(id, name, target, account_id, amount, frequency, start_date,
+                              type=None, category=None, note=None, interval=1,
+                              day_of_month=None, weekday=None, week_of_month=None, end_date=None):
+    if not id or not id.strip():
+        raise ValueError("Schedule ID cannot be empty")
+    if not name or not name.strip():
+        raise ValueError("Schedule name cannot be empty")
+    if target == "income":
+        type = None
+    minor = _validate_schedule(target, account_id, amount, type, frequency, interval,
+                               day_of_month, weekday, week_of_month, start_date, end_date)
+    category_id, source_id = _schedule_lookup_ids(target, category)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO recurring_schedules
+               (id, name, target, account_id, amount, type, category_id, source_id, note, frequency,
+                interval, day_of_month, weekday, week_of_month, start_date, end_date)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (id.strip(), name.strip(), target, account_id, minor, type, category_id, source_id, note,
+             frequency, interval, day_of_month, weekday, week_of_month, start_date, end_date)
+        )
+        conn.commit()
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Schedule with ID '{id}' already exists")
+    finally:
+        close_db_connection(conn)
+    return get_recurring_schedule(id.strip())
+
+
+def get_recurring_schedule(schedule_id):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    columns = select_list(None, SCHEDULE_COLUMNS, SCHEDULE_DECODED_COLUMNS)
+    cursor.execute(f"SELECT {columns} FROM recurring_schedules WHERE id = ?", (schedule_id,))
+    row = cursor.fetchone()
+    close_db_connection(conn)
+    return row_to_dict(row)
+
 
-    query += " ORDER BY date DESC"
+def get_all_recurring_schedules(active_on=None):
+    query = f"SELECT {select_list(None, SCHEDULE_COLUMNS, SCHEDULE_DECODED_COLUMNS)} FROM recurring_schedules"
+    params = []
+    if active_on:
+        # Schedules that have started and not ended by active_on
+        query += " WHERE start_date <= ? AND (end_date IS NULL OR end_date >= ?)"
+        params = [active_on, active_on]
+    query += " ORDER BY name"
 
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     cursor.execute(query, params)
     rows = cursor.fetchall()
@@ -487,80 +2539,769 @@ def get_income_by_date_range(from_date=None, to_date=None, account_id=None, sour
     return rows_to_list(rows)
 
 
-def update_income(income_id, date=None, amount=None, source=None):
-    existing = get_income(income_id)
+def update_recurring_schedule(schedule_id, name=None, amount=None, category=None,
+                              note=None, end_date=None):
+    existing = get_recurring_schedule(schedule_id)
     if not existing:
-        raise ValueError(f"Income with ID '{income_id}' not found")
+        raise ValueError(f"Schedule with ID '{schedule_id}' not found")
 
     updates = []
     params = []
 
-    if date is not None:
-        if not validate_date_format(date):
-            raise ValueError("Date must be in YYYY-MM-DD format")
-        updates.append("date = ?")
-        params.append(date)
+    if name is not None:
+        if not name.strip():
+            raise ValueError("Schedule name cannot be empty")
+        updates.append("name = ?")
+        params.append(name.strip())
 
     if amount is not None:
         if amount <= 0:
             raise ValueError("Amount must be positive")
         updates.append("amount = ?")
-        params.append(amount)
+        params.append(to_minor_units(amount, get_account_scale(existing["account_id"]) or DEFAULT_SCALE))
 
-    if source is not None:
-        updates.append("source = ?")
-        params.append(source)
+    if category is not None:
+        updates.append("category_id = ?")
+        updates.append("source_id = ?")
+        params.extend(_schedule_lookup_ids(existing["target"], category))
+
+    if note is not None:
+        updates.append("note = ?")
+        params.append(note)
+
+    if end_date is not None:
+        if not validate_date_format(end_date):
+            raise ValueError("end_date must be in YYYY-MM-DD format")
+        if end_date < existing["start_date"]:
+            raise ValueError("end_date must not be before start_date")
+        updates.append("end_date = ?")
+        params.append(end_date)
 
     if not updates:
         return existing
 
-    params.append(income_id)
+    params.append(schedule_id)
     conn = get_db_connection()
     cursor = conn.cursor()
-    query = f"UPDATE income SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    close_db_connection(conn)
-    return get_income(income_id)
 
+    try:
+        cursor.execute(f"UPDATE recurring_schedules SET {', '.join(updates)} WHERE id = ?", params)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return get_recurring_schedule(schedule_id)
 
-def delete_income(income_id):
+
+def delete_recurring_schedule(schedule_id):
+    # Occurrences already materialized stay in the ledger
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM income WHERE id = ?", (income_id,))
-    conn.commit()
-    deleted = cursor.rowcount > 0
-    close_db_connection(conn)
+
+    try:
+        cursor.execute("DELETE FROM recurring_schedules WHERE id = ?", (schedule_id,))
+        conn.commit()
+        deleted = cursor.rowcount > 0
+    finally:
+        close_db_connection(conn)
     return deleted
 
 
-# ==================== AGGREGATION QUERIES ====================
+def materialize_occurrences(transaction_rows, income_rows, through):
+    # Occurrence ids are derived from (schedule, date), so INSERT OR IGNORE makes
+    # re-runs and overlapping windows no-ops; marks are advanced in the same commit
+    transaction_rows = _encode_rows(transaction_rows, 5, "categories")
+    income_rows = _encode_rows(income_rows, 4, "sources")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(
+            """INSERT OR IGNORE INTO transactions (id, account_id, date, amount, type, category_id, note)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            transaction_rows
+        )
+        transactions_created = cursor.rowcount if transaction_rows else 0
+        cursor.executemany(
+            "INSERT OR IGNORE INTO income (id, account_id, date, amount, source_id) VALUES (?, ?, ?, ?, ?)",
+            income_rows
+        )
+        income_created = cursor.rowcount if income_rows else 0
+        cursor.executemany(
+            "UPDATE recurring_schedules SET materialized_through = ? WHERE id = ?",
+            through
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_db_connection(conn)
+    return {"transactions": transactions_created, "income": income_created}
+
+
+# ==================== ARCHIVE ====================
+
+# Ledger rows older than a cutoff live in per-year database files. The hot
+# database keeps a registry of partitions (with the date range each one
+# covers, for pruning) and the monthly totals of everything archived, so
+# balance and budget rebuilds still count the archived rows.
+
+def archive_database_path(year):
+    database = current_database_path()
+    stem = os.path.splitext(os.path.basename(database))[0]
+    return os.path.join(os.path.dirname(database), "archive", f"{stem}_{year}.db")
+
+
+def create_archive_tables(cursor):
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS archive_partitions
+                   (
+                       year TEXT PRIMARY KEY,
+                       min_date TEXT NOT NULL,
+                       max_date TEXT NOT NULL,
+                       transactions INTEGER NOT NULL DEFAULT 0,
+                       income INTEGER NOT NULL DEFAULT 0,
+                       archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS archived_ledger_totals
+                   (
+                       account_id TEXT NOT NULL,
+                       month TEXT NOT NULL,
+                       type TEXT NOT NULL,
+                       category_id INTEGER REFERENCES categories (id),
+                       total INTEGER NOT NULL,
+                       FOREIGN KEY (account_id) REFERENCES accounts (id) ON DELETE CASCADE
+                   )
+                   ''')
+
+    # Which partition holds each archived id, so id checks and lookups by id
+    # never attach the partitions that do not have it
+    registered = bool(_table_columns(cursor, "main", "archived_ids"))
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS archived_ids
+                   (
+                       ledger TEXT NOT NULL,
+                       id TEXT NOT NULL,
+                       year TEXT NOT NULL,
+                       PRIMARY KEY (ledger, id)
+                   ) WITHOUT ROWID
+                   ''')
+    if not registered:
+        # Partitions from before the registry; ATTACH needs no open transaction
+        years = [row[0] for row in cursor.execute("SELECT year FROM archive_partitions").fetchall()]
+        cursor.connection.commit()
+        for year in years:
+            cursor.execute("ATTACH DATABASE ? AS archive", (read_only_uri(archive_database_path(year)),))
+            try:
+                _register_archived_ids(cursor, "archive", year)
+                cursor.connection.commit()
+            finally:
+                cursor.connection.rollback()
+                cursor.execute("DETACH DATABASE archive")
+
+
+def _register_archived_ids(cursor, schema, year, from_date="0000-01-01", to_date="9999-12-31"):
+    for table in LEDGER_TABLES:
+        cursor.execute(
+            f"""INSERT OR IGNORE INTO archived_ids (ledger, id, year)
+                SELECT ?, id, ? FROM {schema}.{table} WHERE date >= ? AND date < ?""",
+            (table, year, from_date, to_date)
+        )
+
+
+def _create_partition_tables(cursor, schema):
+    # Same columns (generated ones included) as the hot tables, without the
+    # foreign keys and triggers
+    buckets = ", ".join(f"{column} {definition}" for column, definition in BUCKET_COLUMNS.items())
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.transactions (
+                           id TEXT PRIMARY KEY, account_id TEXT NOT NULL, date TEXT NOT NULL,
+                           amount INTEGER NOT NULL, type TEXT NOT NULL, category_id INTEGER, note TEXT,
+                           created_at TEXT, {buckets})""")
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.income (
+                           id TEXT PRIMARY KEY, account_id TEXT NOT NULL, date TEXT NOT NULL,
+                           amount INTEGER NOT NULL, source_id INTEGER, created_at TEXT, {buckets})""")
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_date_cover '
+                   'ON transactions(date, account_id, type, category_id, amount)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_epoch_day '
+                   'ON transactions(epoch_day, type, month_key, category_id, account_id, amount)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_income_date_cover '
+                   'ON income(date, account_id, source_id, amount)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_income_epoch_day '
+                   'ON income(epoch_day, month_key, source_id, account_id, amount)')
+
+
+def attached_partitions(conn, from_date=None, to_date=None):
+    # Attaches the partitions whose rows overlap [from_date, to_date] and
+    # yields (schemas, bounds) for each batch of at most ARCHIVE_MAX_ATTACHED.
+    # With several batches, each one is limited to its own span of years
+    # (the hot rows included), newest first, so their results never overlap.
+    years = [row[0] for row in conn.execute(
+        """SELECT year FROM archive_partitions
+           WHERE max_date >= COALESCE(?, max_date) AND min_date <= COALESCE(?, min_date)
+           ORDER BY year DESC""",
+        (from_date, to_date)
+    ).fetchall()]
+    if not years:
+        yield ["main"], ("", [])
+        return
+
+    batches = [years[i:i + ARCHIVE_MAX_ATTACHED] for i in range(0, len(years), ARCHIVE_MAX_ATTACHED)]
+    for index, batch in enumerate(batches):
+        bound_sql = ""
+        bound_params = []
+        if index < len(batches) - 1:
+            bound_sql += " AND date >= ?"
+            bound_params.append(f"{batch[-1]}-01-01")
+        if index > 0:
+            bound_sql += " AND date < ?"
+            bound_params.append(f"{batches[index - 1][-1]}-01-01")
+
+        schemas = ["main"]
+        try:
+            for year in batch:
+                conn.execute(f"ATTACH DATABASE ? AS archive_{year}", (read_only_uri(archive_database_path(year)),))
+                schemas.append(f"archive_{year}")
+            yield schemas, (bound_sql, bound_params)
+        finally:
+            for schema in schemas[1:]:
+                conn.execute(f"DETACH DATABASE {schema}")
+
+
+def archive_schemas(conn, from_date=None, to_date=None):
+    # The attached partitions overlapping [from_date, to_date] one by one, for
+    # queries that read them apart from the hot table. Consume it to the end
+    # so every batch is detached
+    for schemas, _ in attached_partitions(conn, from_date, to_date):
+        yield from schemas[1:]
+
+
+def ledger_source(table, columns, where, params, schemas, bounds):
+    # FROM clause (filters included) over the hot table and attached partitions;
+    # where must start with " WHERE"
+    bound_sql, bound_params = bounds
+    if len(schemas) == 1 and not bound_sql:
+        return table + where, list(params)
+
+    columns = ", ".join(columns)
+    selects = [f"SELECT {columns} FROM {schema}.{table}{where}{bound_sql}" for schema in schemas]
+    return "(" + " UNION ALL ".join(selects) + ")", (list(params) + bound_params) * len(schemas)
+
+
+def _archive_year(cursor, year, before):
+    # Copies one year's rows (up to the cutoff) into its partition and commits
+    # there first: if the process dies before the hot delete commits, running
+    # the archive again finishes the job instead of losing rows
+    from_date = f"{year}-01-01"
+    to_date = min(before, f"{int(year) + 1}-01-01")
+    path = archive_database_path(year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    cursor.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        _create_partition_tables(cursor, "archive")
+        for table, columns in (("transactions", TRANSACTION_STORED_COLUMNS), ("income", INCOME_STORED_COLUMNS)):
+            columns = ", ".join(columns)
+            cursor.execute(
+                f"""INSERT OR IGNORE INTO archive.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE date >= ? AND date < ? ORDER BY date""",
+                (from_date, to_date)
+            )
+        cursor.connection.commit()
+
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            """INSERT INTO archived_ledger_totals (account_id, month, type, category_id, total)
+               SELECT account_id, month_key, type, category_id, SUM(amount) FROM main.transactions
+               WHERE date >= ? AND date < ? GROUP BY account_id, month_key, type, category_id
+               UNION ALL
+               SELECT account_id, month_key, 'income', NULL, SUM(amount) FROM main.income
+               WHERE date >= ? AND date < ? GROUP BY account_id, month_key""",
+            (from_date, to_date) * 2
+        )
+
+        # Archived rows still count toward balances and budget spend, so the
+        # ledger triggers are put aside for the delete, in the same transaction
+        triggers = cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN (?, ?)",
+            LEDGER_TABLES
+        ).fetchall()
+        for name, _ in triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+        _register_archived_ids(cursor, "main", year, from_date, to_date)
+        moved = {}
+        for table in LEDGER_TABLES:
+            cursor.execute(f"DELETE FROM main.{table} WHERE date >= ? AND date < ?", (from_date, to_date))
+            moved[table] = cursor.rowcount
+        for _, sql in triggers:
+            cursor.execute(sql)
+
+        cursor.execute(
+            """INSERT INTO archive_partitions (year, min_date, max_date, transactions, income)
+               SELECT ?, MIN(date), MAX(date),
+                      (SELECT COUNT(*) FROM archive.transactions), (SELECT COUNT(*) FROM archive.income)
+               FROM (SELECT date FROM archive.transactions UNION ALL SELECT date FROM archive.income)
+               WHERE true
+               ON CONFLICT (year) DO UPDATE SET
+                   min_date = excluded.min_date, max_date = excluded.max_date,
+                   transactions = excluded.transactions, income = excluded.income,
+                   archived_at = CURRENT_TIMESTAMP""",
+            (year,)
+        )
+        cursor.connection.commit()
+        return moved
+    finally:
+        cursor.connection.rollback()
+        cursor.execute("DETACH DATABASE archive")
+
+
+def archive_ledger(before):
+    if not validate_date_format(before):
+        raise ValueError("before must be in YYYY-MM-DD format")
+
+    conn = get_db_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+
+    try:
+        years = [row[0] for row in cursor.execute(
+            """SELECT substr(date, 1, 4) FROM transactions WHERE date < ?
+               UNION SELECT substr(date, 1, 4) FROM income WHERE date < ?""",
+            (before, before)
+        ).fetchall()]
+
+        moved = {"transactions": 0, "income": 0}
+        for year in sorted(years):
+            for table, count in _archive_year(cursor, year, before).items():
+                moved[table] += count
+    finally:
+        close_db_connection(conn)
+
+    return {"before": before, "years": sorted(years), "archived": moved}
+
+
+def get_archive_partitions():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT year, min_date, max_date, transactions, income, archived_at "
+                   "FROM archive_partitions ORDER BY year")
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+    return rows_to_list(rows)
+
+
+# ==================== MAINTENANCE ====================
+
+AUTO_VACUUM_MODES = ("none", "full", "incremental")
+
+
+def checkpoint_wal(mode="TRUNCATE"):
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError("mode must be PASSIVE, FULL, RESTART or TRUNCATE")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        busy, wal_frames, checkpointed = cursor.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        close_db_connection(conn)
+    return {"busy": busy, "wal_frames": wal_frames, "checkpointed_frames": checkpointed}
+
+
+def incremental_vacuum(max_pages=None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return {"freed_pages": 0}
+        before = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() would stop after the first freed page; executescript
+        # steps the pragma to the end
+        cursor.executescript(f"PRAGMA incremental_vacuum({int(max_pages) if max_pages else 0});")
+        after = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        close_db_connection(conn)
+    return {"freed_pages": before - after}
+
+
+def analyze_database(analysis_limit=0):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        cursor.execute("ANALYZE")
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return {"analyzed": 1}
+
+
+def optimize_database():
+    # The writer is long-lived, so optimize sees the queries it has planned
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA optimize")
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return {"optimized": 1}
 
-def get_monthly_income_totals():
+
+def vacuum_database():
+    # Full rebuild of the file; also switches files created before
+    # incremental auto-vacuum over to it
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-                   SELECT strftime('%Y-%m', date) as month, SUM(amount) as total
-                   FROM income
-                   GROUP BY strftime('%Y-%m', date)
-                   ORDER BY month ASC
-                   """)
+
+    try:
+        before = cursor.execute("PRAGMA page_count").fetchone()[0]
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        after = cursor.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        close_db_connection(conn)
+    return {"freed_pages": before - after}
+
+
+def get_database_stats():
+    path = current_database_path()
+    conn = get_read_connection()
+    cursor = conn.cursor()
+
+    try:
+        stats = {
+            pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum", "journal_mode")
+        }
+        stats["auto_vacuum"] = AUTO_VACUUM_MODES[stats["auto_vacuum"]]
+
+        # Per table and index page usage, when SQLite is built with dbstat
+        try:
+            cursor.execute(
+                """SELECT name, pageno AS pages, pgsize AS bytes, unused AS unused_bytes
+                   FROM dbstat WHERE aggregate = TRUE ORDER BY pages DESC"""
+            )
+            stats["objects"] = rows_to_list(cursor.fetchall())
+        except sqlite3.OperationalError:
+            stats["objects"] = None
+    finally:
+        close_db_connection(conn)
+
+    stats["file_bytes"] = os.path.getsize(path)
+    stats["wal_bytes"] = os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0
+    return stats
+
+
+# ==================== BACKUP ====================
+
+# Copies use SQLite's online backup API a few pages per step. The source
+# connection holds one read transaction for the whole copy, so the result is
+# the database as of the first step: the writer's commits land in the WAL and
+# neither wait for the copy nor restart it.
+
+def backup_file(source_path, target_path, pages=-1, sleep=0.0, progress=None):
+    source = sqlite3.connect(read_only_uri(source_path), uri=True)
+    target = sqlite3.connect(target_path)
+
+    try:
+        source.execute("BEGIN")
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+        page_count = source.execute("PRAGMA page_count").fetchone()[0]
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        # A standalone file: opens read-only without -wal/-shm companions
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        source.close()
+        target.close()
+    return {"pages": page_count, "bytes": page_count * page_size}
+
+
+# ==================== FX RATES ====================
+
+# Rates are shared by every user, so they live in the main database next to
+# the users table. A rate is the number of units of the currency per one
+# FX_REFERENCE_CURRENCY on that day.
+
+def init_fx_rates_table():
+    conn = get_main_connection()
+    try:
+        conn.execute('''
+                     CREATE TABLE IF NOT EXISTS fx_rates
+                     (
+                         currency TEXT NOT NULL,
+                         date TEXT NOT NULL,
+                         rate REAL NOT NULL CHECK (rate > 0),
+                         PRIMARY KEY (currency, date)
+                     )
+                     ''')
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+
+
+def import_fx_rates(rows):
+    # rows of (date, currency, rate); a rate already stored for that day is replaced
+    records = []
+    for date, currency, rate in rows:
+        if not validate_date_format(str(date)):
+            raise ValueError(f"Invalid date '{date}': must be in YYYY-MM-DD format")
+        currency = str(currency).strip().upper()
+        if len(currency) != 3:
+            raise ValueError(f"Invalid currency '{currency}': must be a 3-letter code")
+        if currency == FX_REFERENCE_CURRENCY:
+            raise ValueError(f"Rates are quoted per {FX_REFERENCE_CURRENCY}; it has no rate of its own")
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid rate '{rate}' for {currency} on {date}")
+        if not math.isfinite(rate) or rate <= 0:
+            raise ValueError(f"Rate for {currency} on {date} must be positive")
+        records.append((currency, date, rate))
+
+    conn = get_main_connection()
+    try:
+        # REPLACE gives every written row a rowid above all existing ones,
+        # which is what get_fx_rates_version relies on
+        conn.executemany("INSERT OR REPLACE INTO fx_rates (currency, date, rate) VALUES (?, ?, ?)", records)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
+    return len(records)
+
+
+def get_fx_rates(currency=None, from_date=None, to_date=None):
+    query = "SELECT date, currency, rate FROM fx_rates WHERE 1=1"
+    params = []
+
+    if currency:
+        query += " AND currency = ?"
+        params.append(currency.upper())
+
+    if from_date:
+        if not validate_date_format(from_date):
+            raise ValueError("from_date must be in YYYY-MM-DD format")
+        query += " AND date >= ?"
+        params.append(from_date)
+
+    if to_date:
+        if not validate_date_format(to_date):
+            raise ValueError("to_date must be in YYYY-MM-DD format")
+        query += " AND date <= ?"
+        params.append(to_date)
+
+    conn = get_main_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(query + " ORDER BY currency, date", params)
     rows = cursor.fetchall()
     close_db_connection(conn)
-    return [{"month": row["month"], "total": row["total"]} for row in rows]
+    return rows_to_list(rows)
+
+
+def get_fx_rates_version():
+    # Changes whenever rates are imported; one index lookup
+    conn = get_main_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(rowid) FROM fx_rates")
+    version = cursor.fetchone()[0]
+    close_db_connection(conn)
+    return version or 0
+
+
+def get_monthly_fx_rates():
+    # (currency, 'YYYY-MM', average rate), in primary key order
+    conn = get_main_read_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+    cursor.execute("""SELECT currency, substr(date, 1, 7) AS month, AVG(rate)
+                      FROM fx_rates
+                      GROUP BY currency, month""")
+    rows = cursor.fetchall()
+    close_db_connection(conn)
+    return rows
 
 
-def get_transactions_for_stats(from_date=None, to_date=None):
-    return get_transactions_by_date_range(from_date=from_date, to_date=to_date)
+# ==================== AGGREGATION QUERIES ====================
 
+def _monthly_totals(table, where, by_currency):
+    # Summed per month and account, then per scale in major_units; with
+    # by_currency, one row per month and account currency
+    account_scale = ACCOUNT_SCALE.format(account="account_id")
+    account_currency = ACCOUNT_CURRENCY.format(account="account_id")
+    _, rows = fetch_ledger(table, ("month_key", "account_id", "amount"), where, [], None, None,
+                           lambda source: f"""
+                               SELECT month, {account_currency} AS currency, {account_scale} AS scale, total FROM (
+                                   SELECT month_key as month, account_id, SUM(amount) as total
+                                   FROM {source}
+                                   GROUP BY month_key, account_id)
+                               """, row_factory=None)
+    if by_currency:
+        totals = major_units(rows)
+        return [{"month": key[0], "currency": key[1], "total": totals[key]} for key in sorted(totals)]
+    totals = major_units((month, scale, total) for month, _, scale, total in rows)
+    return [{"month": key[0], "total": totals[key]} for key in sorted(totals)]
+
+
+def get_monthly_income_totals(by_currency=False):
+    return _monthly_totals("income", " WHERE 1=1", by_currency)
+
+
+def get_monthly_expense_totals(by_currency=False):
+    return _monthly_totals("transactions", " WHERE type = 'expense'", by_currency)
+
+
+# SQL expression giving the bucket key of a row for each granularity, computed
+# from the indexed bucket columns. Day and week keys are epoch days; weeks are
+# keyed by their Monday (epoch day 0 was a Thursday).
+BUCKET_EXPRESSIONS = {
+    "day": "epoch_day",
+    "week": "epoch_day - (epoch_day + 3) % 7",
+    "month": "month_key",
+    "year": "substr(month_key, 1, 4)"
+}
+GROUP_EXPRESSIONS = {
+    None: ("NULL", "NULL"),
+    "category": ("category_id", "source_id"),
+    "account": ("account_id", "account_id")
+}
+# Grouped lookup ids are turned back into names once per group
+GROUP_LABELS = {
+    "category": ("(SELECT name FROM categories WHERE id = grp)", "(SELECT name FROM sources WHERE id = grp)")
+}
+
+
+def get_bucket_totals(granularity="month", group_by=None, from_date=None, to_date=None, account_id=None,
+                      by_currency=False):
+    # Rows of (bucket, group, kind, total); with by_currency, (bucket, group,
+    # kind, month, currency, total) so each month can be converted at its own rate
+    if granularity not in BUCKET_EXPRESSIONS:
+        raise ValueError("granularity must be one of: " + ", ".join(BUCKET_EXPRESSIONS))
+    if group_by not in GROUP_EXPRESSIONS:
+        raise ValueError("group_by must be 'category' or 'account'")
+
+    bucket = BUCKET_EXPRESSIONS[granularity]
+    transaction_group, income_group = GROUP_EXPRESSIONS[group_by]
+    transaction_label, income_label = GROUP_LABELS.get(group_by, ("grp", "grp"))
+    account_scale = ACCOUNT_SCALE.format(account="account")
+    # Inner grouping and outer columns added for by_currency
+    month = ", month_key" if by_currency else ""
+    currency = f", month_key, {ACCOUNT_CURRENCY.format(account='account')}" if by_currency else ""
+    where, params = _epoch_day_filters(from_date, to_date, account_id)
+
+    conn = get_read_connection()
+    conn.row_factory = None
+    try:
+        batches = []
+        for schemas, bounds in attached_partitions(conn, from_date, to_date):
+            transactions, transaction_params = ledger_source(
+                "transactions", ("epoch_day", "month_key", "type", "category_id", "account_id", "amount"),
+                where, params, schemas, bounds
+            )
+            income, income_params = ledger_source(
+                "income", ("epoch_day", "month_key", "source_id", "account_id", "amount"),
+                where, params, schemas, bounds
+            )
+            batches.append(conn.execute(
+                f"""SELECT bucket, {transaction_label}, kind{currency}, {account_scale}, total FROM (
+                        SELECT {bucket} AS bucket, {transaction_group} AS grp, type AS kind,
+                               account_id AS account{month}, SUM(amount) AS total
+                        FROM {transactions}
+                        GROUP BY bucket, grp, kind, account{month})
+                    UNION ALL
+                    SELECT bucket, {income_label}, 'income'{currency}, {account_scale}, total FROM (
+                        SELECT {bucket} AS bucket, {income_group} AS grp, account_id AS account{month},
+                               SUM(amount) AS total
+                        FROM {income}
+                        GROUP BY 1, 2, 3{month})""",
+                transaction_params + income_params
+            ).fetchall())
+    finally:
+        close_db_connection(conn)
 
-def get_income_for_stats(from_date=None, to_date=None):
-    return get_income_by_date_range(from_date=from_date, to_date=to_date)
+    # Totals are per account until here; a week can also straddle two batches' years
+    totals = major_units(itertools.chain.from_iterable(batches))
+    return [key + (total,) for key, total in totals.items()]
+
+
+def _stats_columns(table, columns, where, params, from_date, to_date, by_currency):
+    # Minor-unit amounts, one list per column, so callers can sum them exactly
+    # as integers. Each row comes with its scale, or with by_currency with its
+    # account key (see get_account_currencies) and month as months since
+    # 1970-01: small integers are much cheaper to fetch than per-row strings
+    if by_currency:
+        selects = list(columns) + [
+            "(SELECT rowid FROM accounts WHERE id = account_id)",
+            "(CAST(substr(date, 1, 4) AS INTEGER) - 1970) * 12 + CAST(substr(date, 6, 2) AS INTEGER) - 1"
+        ]
+        names = columns + ("account", "month")
+    else:
+        selects = list(columns) + [ACCOUNT_SCALE.format(account="account_id")]
+        names = columns + ("scale",)
+    _, rows = fetch_ledger(table, ("account_id", "date") + columns, where, params, from_date, to_date,
+                           lambda source: f"SELECT {', '.join(selects)} FROM {source}",
+                           row_factory=None)
+    return rows_to_columns(names, rows)
+
+
+def get_transactions_for_stats(from_date=None, to_date=None, by_currency=False):
+    where, params = _transaction_filters(from_date, to_date)
+    return _stats_columns("transactions", ("type", "amount"), where, params, from_date, to_date, by_currency)
+
+
+def get_income_for_stats(from_date=None, to_date=None, by_currency=False):
+    where, params = _income_filters(from_date, to_date)
+    return _stats_columns("income", ("amount",), where, params, from_date, to_date, by_currency)
+
+
+def _lookup_totals(table, id_column, lookup, default, where, params, from_date, to_date, by_currency):
+    # Count and sum per lookup id and account (and month, with by_currency);
+    # names are looked up once per group, and rows without one share the
+    # default label with rows named like it
+    account_scale = ACCOUNT_SCALE.format(account="account")
+    month = ", month_key" if by_currency else ""
+    currency = f", month_key, {ACCOUNT_CURRENCY.format(account='account')}" if by_currency else ""
+    _, rows = fetch_ledger(table, (id_column, "account_id", "month_key", "amount"), where, params,
+                           from_date, to_date,
+                           lambda source: f"""
+                               SELECT (SELECT name FROM {lookup} WHERE id = grp){currency}, count,
+                                      {account_scale}, total FROM (
+                                   SELECT {id_column} AS grp, account_id AS account{month}, COUNT(*) AS count,
+                                          SUM(amount) AS total
+                                   FROM {source}
+                                   GROUP BY grp, account{month})
+                               """, row_factory=None)
+    # Each partition batch reports its own groups
+    counts = {}
+    keyed = []
+    for name, *key, count, scale, total in rows:
+        key = (name or default, *key)
+        counts[key] = counts.get(key, 0) + count
+        keyed.append(key + (scale, total))
+    totals = major_units(keyed)
+    fields = ("name", "month", "currency") if by_currency else ("name",)
+    return [dict(zip(fields, key), count=count, total=totals[key]) for key, count in counts.items()]
+
+
+def get_category_totals(from_date=None, to_date=None, default="Uncategorized", by_currency=False):
+    where, params = _transaction_filters(from_date, to_date)
+    return _lookup_totals("transactions", "category_id", "categories", default, where, params,
+                          from_date, to_date, by_currency)
+
+
+def get_source_totals(from_date=None, to_date=None, default="Unknown", by_currency=False):
+    where, params = _income_filters(from_date, to_date)
+    return _lookup_totals("income", "source_id", "sources", default, where, params,
+                          from_date, to_date, by_currency)
 
 
 # ==================== SAMPLE DATA ====================
 
-def seed_sample_data():
+def seed_sample_data(verbose=True):
     accounts = [
         ("ACC001", "Main Checking", "USD"),
         ("ACC002", "Savings", "USD"),
@@ -614,43 +3355,46 @@ def seed_sample_data():
         except ValueError:
             pass
 
-    print("Sample data seeded successfully")
+    if verbose:
+        print("Sample data seeded successfully")
 
 
 # ==================== USER OPERATIONS ====================
 
 def init_users_table():
-    conn = get_db_connection()
+    conn = get_main_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS users
-                   (
-                       id
-                       INTEGER
-                       PRIMARY
-                       KEY
-                       AUTOINCREMENT,
-                       username
-                       TEXT
-                       UNIQUE
-                       NOT
-                       NULL,
-                       password
-                       TEXT
-                       NOT
-                       NULL,
-                       token
-                       TEXT,
-                       created_at
-                       TEXT
-                       DEFAULT
-                       CURRENT_TIMESTAMP
-                   )
-                   ''')
+    try:
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS users
+                       (
+                           id
+                           INTEGER
+                           PRIMARY
+                           KEY
+                           AUTOINCREMENT,
+                           username
+                           TEXT
+                           UNIQUE
+                           NOT
+                           NULL,
+                           password
+                           TEXT
+                           NOT
+                           NULL,
+                           token
+                           TEXT,
+                           created_at
+                           TEXT
+                           DEFAULT
+                           CURRENT_TIMESTAMP
+                       )
+                       ''')
 
-    conn.commit()
-    close_db_connection(conn)
+        conn.commit()
+    finally:
+        close_db_connection(conn)
 
 
 def create_user(username, password):
@@ -664,7 +3408,7 @@ def create_user(username, password):
 
     hashed = hashlib.sha256(password.encode()).hexdigest()
 
-    conn = get_db_connection()
+    conn = get_main_connection()
     cursor = conn.cursor()
 
     try:
@@ -686,53 +3430,77 @@ def authenticate_user(username, password):
 
     hashed = hashlib.sha256(password.encode()).hexdigest()
 
-    conn = get_db_connection()
+    conn = get_main_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "SELECT id FROM users WHERE username = ? AND password = ?",
-        (username, hashed)
-    )
-    user = cursor.fetchone()
+    try:
+        cursor.execute(
+            "SELECT id FROM users WHERE username = ? AND password = ?",
+            (username, hashed)
+        )
+        user = cursor.fetchone()
 
-    if not user:
-        close_db_connection(conn)
-        return None
+        if not user:
+            return None
 
-    token = secrets.token_hex(32)
+        token = secrets.token_hex(32)
 
-    cursor.execute(
-        "UPDATE users SET token = ? WHERE username = ?",
-        (token, username)
-    )
-    conn.commit()
-    close_db_connection(conn)
+        cursor.execute(
+            "UPDATE users SET token = ? WHERE username = ?",
+            (token, username)
+        )
+        conn.commit()
+    finally:
+        close_db_connection(conn)
 
     return token
 
 
-def validate_token(token):
+def get_token_user(token):
     if not token:
-        return False
+        return None
 
-    conn = get_db_connection()
+    conn = get_main_read_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT username FROM users WHERE token = ?", (token,))
+    cursor.execute("SELECT id, username FROM users WHERE token = ?", (token,))
+    user = cursor.fetchone()
+    close_db_connection(conn)
+
+    return row_to_dict(user)
+
+
+def get_user_by_username(username):
+    conn = get_main_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, username FROM users WHERE username = ?", (username,))
     user = cursor.fetchone()
     close_db_connection(conn)
+    return row_to_dict(user)
+
+
+def get_all_users():
+    conn = get_main_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, username FROM users ORDER BY id")
+    users = cursor.fetchall()
+    close_db_connection(conn)
+    return rows_to_list(users)
 
-    return user is not None
 
+def validate_token(token):
+    return get_token_user(token) is not None
 
 
 def logout_user(token):
-    conn = get_db_connection()
+    conn = get_main_connection()
     cursor = conn.cursor()
 
-    cursor.execute("UPDATE users SET token = NULL WHERE token = ?", (token,))
-    conn.commit()
-    affected = cursor.rowcount
-    close_db_connection(conn)
+    try:
+        cursor.execute("UPDATE users SET token = NULL WHERE token = ?", (token,))
+        conn.commit()
+        affected = cursor.rowcount
+    finally:
+        close_db_connection(conn)
 
     return affected > 0
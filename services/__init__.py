@@ -1,2 +1,11 @@
 from .stats_service import StatsService
-from .forecast_service import ForecastService
\ No newline at end of file
+from .forecast_service import ForecastService
+from .export_service import ExportService
+from .import_service import ImportService
+from .reconciliation_service import ReconciliationService
+from .simulation_service import SimulationService
+from .anomaly_service import AnomalyService
+from .recurring_service import RecurringService
+from .maintenance_service import MaintenanceService
+from .backup_service import BackupService
+from .fx_service import FxService
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import ANOMALY_EWMA_ALPHA, ANOMALY_THRESHOLD, ANOMALY_MIN_STD_RATIO
+from database import get_expense_series, replace_anomaly_scores, get_anomalies
+
+
+class AnomalyService:
+
+    @staticmethod
+    def scores(amounts, means, variances):
+        # Vectorized database.anomaly_score
+        std = np.maximum.reduce([
+            np.sqrt(variances), ANOMALY_MIN_STD_RATIO * np.abs(means), np.full(len(means), 0.01)
+        ])
+        return (amounts - means) / std
+
+    @staticmethod
+    def backfill():
+        rows = get_expense_series()
+        if not rows:
+            return replace_anomaly_scores([], [])
+
+        df = pd.DataFrame(rows, columns=["id", "category", "currency", "amount"])
+        by_category = df.groupby(["category", "currency"], sort=False)
+
+        # Same recurrence as the incremental update (adjust=False, bias=True),
+        # run over every (category, currency) series at once
+        ewm = by_category["amount"].ewm(alpha=ANOMALY_EWMA_ALPHA, adjust=False)
+        df["mean"] = ewm.mean().reset_index(level=[0, 1], drop=True)
+        df["var"] = ewm.var(bias=True).reset_index(level=[0, 1], drop=True)
+
+        # Each row is scored against the statistics before it
+        expected = by_category["mean"].shift(1)
+        prior_var = by_category["var"].shift(1)
+        score = AnomalyService.scores(df["amount"].to_numpy(), expected.to_numpy(), prior_var.to_numpy())
+        baseline_count = by_category.cumcount()
+
+        scores = pd.DataFrame({
+            "id": df["id"],
+            "score": score,
+            "expected": expected,
+            "baseline_count": baseline_count
+        })
+        scores = scores.astype(object).where(scores.notna(), None)
+
+        last = by_category.agg(count=("amount", "size"), mean=("mean", "last"), var=("var", "last"))
+        stats = list(last.reset_index().itertuples(index=False, name=None))
+
+        return replace_anomaly_scores(stats, list(scores.itertuples(index=False, name=None)))
+
+    @staticmethod
+    def get_anomalies(from_date=None, to_date=None, category=None,
+                      min_score=ANOMALY_THRESHOLD, limit=100):
+        rows = get_anomalies(from_date, to_date, category, min_score, limit)
+        for row in rows:
+            row["score"] = round(row["score"], 2)
+            row["expected"] = round(row["expected"], 2)
+        return {
+            "threshold": min_score,
+            "count": len(rows),
+            "anomalies": rows
+        }
@@ -0,0 +1,197 @@
+import gzip
+import json
+import re
+import shutil
+import time
+from datetime import datetime
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import BACKUP_DIR, BACKUP_STEP_PAGES, BACKUP_STEP_SLEEP
+from database import (
+    backup_file, current_database_path, archive_database_path, get_archive_partitions,
+    get_all_users, get_user_by_username, tenant, tenant_database_path, main_database
+)
+
+
+class BackupService:
+
+    ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+    MANIFEST = "manifest.json"
+
+    @staticmethod
+    def database_name():
+        return os.path.splitext(os.path.basename(current_database_path()))[0]
+
+    @staticmethod
+    def backup_root():
+        return os.path.join(BACKUP_DIR, BackupService.database_name())
+
+    @staticmethod
+    def _validate_id(backup_id):
+        if not isinstance(backup_id, str) or not BackupService.ID_PATTERN.match(backup_id):
+            raise ValueError("backup id must be 1-64 letters, digits, '-' or '_'")
+        return backup_id
+
+    @staticmethod
+    def _gzip_file(path):
+        with open(path, "rb") as source, gzip.open(path + ".gz", "wb", compresslevel=6) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.remove(path)
+        return path + ".gz"
+
+    @staticmethod
+    def create_backup(backup_id=None, compress=False, pages=BACKUP_STEP_PAGES,
+                      sleep=BACKUP_STEP_SLEEP, progress=None):
+        # Copies the current database and its archive partitions. Uncompressed
+        # backups double as snapshots the stats and forecast routes can read
+        backup_id = BackupService._validate_id(backup_id or datetime.now().strftime("%Y%m%dT%H%M%S"))
+        if int(pages) < 1:
+            raise ValueError("pages must be at least 1")
+        if float(sleep) < 0:
+            raise ValueError("sleep must not be negative")
+
+        root = BackupService.backup_root()
+        directory = os.path.join(root, backup_id)
+        if os.path.exists(directory):
+            raise ValueError(f"Backup {backup_id} already exists")
+
+        database = current_database_path()
+        files = [(database, os.path.basename(database))] + [
+            (archive_database_path(partition["year"]),
+             os.path.join("archive", os.path.basename(archive_database_path(partition["year"]))))
+            for partition in get_archive_partitions()
+        ]
+
+        # Built under a hidden name and renamed when complete, so a failed or
+        # running backup is never listed or read as a snapshot
+        partial = os.path.join(root, f".{backup_id}.partial")
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(os.path.join(partial, "archive"))
+
+        started = datetime.now()
+        clock = time.perf_counter()
+        steps = 0
+        copied = []
+
+        try:
+            for source, name in files:
+                def on_step(status, remaining, total, name=name):
+                    nonlocal steps
+                    steps += 1
+                    if progress:
+                        progress({
+                            "file": name, "copied_pages": total - remaining, "total_pages": total,
+                            "elapsed_seconds": round(time.perf_counter() - clock, 3)
+                        })
+
+                target = os.path.join(partial, name)
+                result = backup_file(source, target, pages=int(pages), sleep=float(sleep), progress=on_step)
+                if compress:
+                    target = BackupService._gzip_file(target)
+                    name += ".gz"
+                copied.append({"file": name, **result, "size_bytes": os.path.getsize(target)})
+
+            seconds = time.perf_counter() - clock
+            manifest = {
+                "id": backup_id,
+                "database": BackupService.database_name(),
+                "created_at": started.isoformat(timespec="seconds"),
+                "compressed": bool(compress),
+                "snapshot": not compress,
+                "files": copied,
+                "pages": sum(f["pages"] for f in copied),
+                "bytes": sum(f["bytes"] for f in copied),
+                "size_bytes": sum(f["size_bytes"] for f in copied),
+                "steps": steps,
+                "seconds": round(seconds, 3)
+            }
+            with open(os.path.join(partial, BackupService.MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(partial, directory)
+        except BaseException:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+
+        return {
+            **manifest,
+            "path": directory,
+            "pages_per_second": round(manifest["pages"] / seconds, 1) if seconds else None,
+            "mb_per_second": round(manifest["bytes"] / seconds / 1e6, 2) if seconds else None
+        }
+
+    @staticmethod
+    def backup_all(backup_id=None, username=None, compress=False, pages=BACKUP_STEP_PAGES,
+                   sleep=BACKUP_STEP_SLEEP, progress=None):
+        # The main database (users, tokens, FX rates) and every user's database
+        # under one id, so each user can read the same point in time as a
+        # snapshot; with username, only that user's database
+        backup_id = BackupService._validate_id(backup_id or datetime.now().strftime("%Y%m%dT%H%M%S"))
+        if username is not None:
+            user = get_user_by_username(username)
+            if not user:
+                raise ValueError(f"User '{username}' not found")
+            targets = [user["id"]]
+        else:
+            # Users whose database was never opened have nothing to copy
+            targets = [None] + [
+                user["id"] for user in get_all_users()
+                if os.path.exists(tenant_database_path(user["id"]))
+            ]
+
+        def database(user_id):
+            return main_database() if user_id is None else tenant(user_id)
+
+        # Checked up front so an id clash leaves no half-made set behind
+        for user_id in targets:
+            with database(user_id):
+                if os.path.exists(os.path.join(BackupService.backup_root(), backup_id)):
+                    raise ValueError(f"Backup {backup_id} already exists")
+
+        reports = []
+        for user_id in targets:
+            with database(user_id):
+                report = BackupService.create_backup(backup_id, compress, pages, sleep, progress)
+            reports.append({field: report[field] for field in
+                            ("database", "files", "pages", "bytes", "size_bytes", "steps", "seconds", "path")})
+
+        return {
+            "id": backup_id,
+            "compressed": bool(compress),
+            "snapshot": not compress,
+            "databases": reports,
+            "pages": sum(r["pages"] for r in reports),
+            "bytes": sum(r["bytes"] for r in reports),
+            "size_bytes": sum(r["size_bytes"] for r in reports),
+            "seconds": round(sum(r["seconds"] for r in reports), 3)
+        }
+
+    @staticmethod
+    def list_backups():
+        root = BackupService.backup_root()
+        if not os.path.isdir(root):
+            return []
+
+        backups = []
+        for backup_id in sorted(os.listdir(root)):
+            manifest = os.path.join(root, backup_id, BackupService.MANIFEST)
+            if backup_id.startswith(".") or not os.path.exists(manifest):
+                continue
+            with open(manifest) as f:
+                entry = json.load(f)
+            entry.pop("files", None)
+            backups.append(entry)
+        return backups
+
+    @staticmethod
+    def snapshot_path(backup_id):
+        # The copy keeps the live layout (<name>.db plus archive/<name>_<year>.db),
+        # so partition lookups inside a snapshot find the copied partitions
+        directory = os.path.join(BackupService.backup_root(), BackupService._validate_id(backup_id))
+        path = os.path.join(directory, os.path.basename(current_database_path()))
+        if not os.path.exists(path):
+            if os.path.exists(path + ".gz"):
+                raise ValueError(f"Backup {backup_id} is compressed and cannot be used as a snapshot")
+            raise ValueError(f"Snapshot {backup_id} not found")
+        return path
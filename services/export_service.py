@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+import zlib
+
+
+class ExportService:
+
+    FORMATS = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson"
+    }
+
+    @staticmethod
+    def encode_csv(columns, chunks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(columns)
+        yield buffer.getvalue().encode("utf-8")
+
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def encode_ndjson(columns, chunks):
+        for rows in chunks:
+            lines = [json.dumps(dict(zip(columns, row))) for row in rows]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    @staticmethod
+    def encode(fmt, columns, chunks):
+        if fmt == "csv":
+            return ExportService.encode_csv(columns, chunks)
+        if fmt == "ndjson":
+            return ExportService.encode_ndjson(columns, chunks)
+        raise ValueError(f"Unsupported export format '{fmt}'")
+
+    @staticmethod
+    def gzip_stream(pieces, level=6):
+        # wbits=31 writes a gzip header/trailer, so the output is a regular .gz file
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        for piece in pieces:
+            compressed = compressor.compress(piece)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
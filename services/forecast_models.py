@@ -0,0 +1,112 @@
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FORECAST_SEASON_LENGTH
+
+
+# Every model takes the history y (one value per consecutive month), the forecast
+# horizon and the month of year (0-11) of y[0], and returns (fitted, forecast).
+# fitted is NaN where the model has no in-sample prediction.
+class ForecastModels:
+
+    SEASON = FORECAST_SEASON_LENGTH
+
+    @staticmethod
+    def linear_design(n, horizon, start_month=0):
+        t = np.arange(n + horizon)
+        return np.column_stack([np.ones(n + horizon), t])
+
+    @staticmethod
+    def linear(y, horizon, start_month=0):
+        n = len(y)
+        X = ForecastModels.linear_design(n, horizon, start_month)
+        coef, _, _, _ = np.linalg.lstsq(X[:n], y, rcond=None)
+        predictions = X @ coef
+        return predictions[:n], predictions[n:]
+
+    @staticmethod
+    def seasonal_naive(y, horizon, start_month=0):
+        season = ForecastModels.SEASON
+        n = len(y)
+        fitted = np.full(n, np.nan)
+        fitted[season:] = y[:n - season]
+        # Repeat the last observed season forward
+        forecast = y[n - season + np.arange(horizon) % season]
+        return fitted, forecast
+
+    @staticmethod
+    def linear_seasonal_design(n, horizon, start_month=0):
+        season = ForecastModels.SEASON
+        t = np.arange(n + horizon)
+        month_of_year = (start_month + t) % season
+        # Trend plus one dummy per month of year (the first month is the baseline)
+        dummies = (month_of_year[:, None] == np.arange(1, season)[None, :]).astype(float)
+        return np.column_stack([np.ones(n + horizon), t, dummies])
+
+    @staticmethod
+    def linear_seasonal(y, horizon, start_month=0):
+        n = len(y)
+        X = ForecastModels.linear_seasonal_design(n, horizon, start_month)
+        coef, _, _, _ = np.linalg.lstsq(X[:n], y, rcond=None)
+        predictions = X @ coef
+        return predictions[:n], predictions[n:]
+
+    @staticmethod
+    def _holt_winters_pass(y, alpha, beta, gamma, season):
+        level = y[:season].mean()
+        trend = (y[season:2 * season].mean() - level) / season
+        seasonal = y[:season] - level
+        fitted = np.empty(len(y))
+
+        for t, value in enumerate(y):
+            s = seasonal[t % season]
+            fitted[t] = level + trend + s
+            new_level = alpha * (value - s) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            seasonal[t % season] = gamma * (value - new_level) + (1 - gamma) * s
+            level = new_level
+
+        return fitted, level, trend, seasonal
+
+    @staticmethod
+    def holt_winters(y, horizon, start_month=0):
+        season = ForecastModels.SEASON
+        grid = (0.2, 0.5, 0.8)
+        best = None
+
+        # Smoothing parameters are picked by in-sample one-step error
+        for alpha in grid:
+            for beta in (0.05, 0.2):
+                for gamma in grid:
+                    fitted, level, trend, seasonal = ForecastModels._holt_winters_pass(
+                        y.astype(float), alpha, beta, gamma, season
+                    )
+                    sse = np.sum((y[season:] - fitted[season:]) ** 2)
+                    if best is None or sse < best[0]:
+                        best = (sse, fitted, level, trend, seasonal)
+
+        _, fitted, level, trend, seasonal = best
+        fitted = fitted.copy()
+        fitted[:season] = np.nan
+        steps = np.arange(1, horizon + 1)
+        forecast = level + steps * trend + seasonal[(len(y) + steps - 1) % season]
+        return fitted, forecast
+
+
+# name -> (model function, minimum history length)
+MODELS = {
+    "linear": (ForecastModels.linear, 2),
+    "seasonal_naive": (ForecastModels.seasonal_naive, ForecastModels.SEASON),
+    "linear_seasonal": (ForecastModels.linear_seasonal, ForecastModels.SEASON + 2),
+    "holt_winters": (ForecastModels.holt_winters, 2 * ForecastModels.SEASON)
+}
+
+# Models that are least-squares fits on a design matrix; their bootstrap
+# replicates can be refit in a single solve
+DESIGNS = {
+    "linear": ForecastModels.linear_design,
+    "linear_seasonal": ForecastModels.linear_seasonal_design
+}
+
@@ -1,19 +1,209 @@
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from collections import OrderedDict
+from joblib import Parallel, delayed
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_monthly_income_totals
+from config import (
+    FORECAST_N_JOBS, FORECAST_PARALLEL_MIN_FITS, FORECAST_CACHE_SIZE,
+    FORECAST_BOOTSTRAP_REPLICATES
+)
+from datetime import datetime
+from database import (
+    get_monthly_income_totals, get_monthly_expense_totals, get_bucket_totals,
+    validate_month_format
+)
+from .forecast_models import MODELS, DESIGNS
+from .recurring_service import RecurringService
+from .fx_service import FxService
 
 
 class ForecastService:
 
+    INTERVAL_LEVELS = (80, 95)
+
+    # Fitted models keyed by (model, horizon, start month, history bytes), so
+    # repeated and interval requests skip the backtest while the data is unchanged
+    _fit_cache = OrderedDict()
+
+    @staticmethod
+    def fill_months(monthly_data):
+        # Months without records count as zero so seasonal lags line up
+        totals = {m["month"]: m["total"] for m in monthly_data}
+        months = np.arange(np.datetime64(monthly_data[0]["month"], "M"),
+                           np.datetime64(monthly_data[-1]["month"], "M") + 1)
+        y = np.array([totals.get(str(month), 0.0) for month in months], dtype=float)
+        return months, y
+
     @staticmethod
-    def get_income_forecast(months_ahead=3):
-        monthly_data = get_monthly_income_totals()
+    def monthly_totals(fetch, base_currency=None):
+        # fetch is get_monthly_income_totals or get_monthly_expense_totals; with
+        # a base currency its per-currency rows are converted and added per month
+        if base_currency is None:
+            return fetch()
+        rows = fetch(by_currency=True)
+        if not rows:
+            return []
+
+        months, month_index = np.unique([row["month"] for row in rows], return_inverse=True)
+        factors = FxService.factors([row["currency"] for row in rows], months[month_index], base_currency)
+        totals = np.bincount(month_index, weights=np.array([row["total"] for row in rows]) * factors,
+                             minlength=len(months))
+        return [{"month": str(month), "total": float(total)} for month, total in zip(months, totals)]
+
+    @staticmethod
+    def backtest_fit(name, y, origin, horizon, start_month):
+        model, _ = MODELS[name]
+        steps = min(horizon, len(y) - origin)
+        _, forecast = model(y[:origin], steps, start_month)
+        return name, np.abs(y[origin:origin + steps] - forecast)
+
+    @staticmethod
+    def select_model(y, horizon, start_month, candidates=None):
+        candidates = candidates or list(MODELS)
+
+        # Rolling origin: refit on every prefix from the first origin all
+        # candidates can fit and score the following `horizon` months, so every
+        # model is scored on the same months. Models that need the whole
+        # history leave no month to score and are left out of the comparison
+        scored = [name for name in candidates if MODELS[name][1] < len(y)]
+        if not scored:
+            return candidates[0], None, {}
+        first_origin = max(MODELS[name][1] for name in scored)
+        tasks = [
+            (name, origin)
+            for name in scored
+            for origin in range(first_origin, len(y))
+        ]
+
+        n_jobs = FORECAST_N_JOBS if len(tasks) >= FORECAST_PARALLEL_MIN_FITS else 1
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(ForecastService.backtest_fit)(name, y, origin, horizon, start_month)
+            for name, origin in tasks
+        )
+
+        errors = {}
+        for name, abs_errors in results:
+            errors.setdefault(name, []).append(abs_errors)
+        scores = {name: round(float(np.concatenate(e).mean()), 2) for name, e in errors.items()}
+
+        best = min(scores, key=scores.get)
+        return best, scores[best], scores
+
+    @staticmethod
+    def fit_series(y, months, months_ahead, model="auto"):
+        if model != "auto" and model not in MODELS:
+            raise ValueError("model must be one of: auto, " + ", ".join(MODELS))
+
+        # datetime64[M] counts months from 1970-01, so this is the month of year (0 = January)
+        start_month = int(months[0].astype(np.int64) % 12)
+        key = (model, months_ahead, start_month, y.tobytes())
+        cache = ForecastService._fit_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        if model == "auto":
+            candidates = [name for name, (_, min_length) in MODELS.items() if len(y) >= min_length]
+        else:
+            if len(y) < MODELS[model][1]:
+                raise ValueError(f"Model '{model}' needs at least {MODELS[model][1]} months of data")
+            candidates = [model]
+
+        chosen, backtest_mae, scores = ForecastService.select_model(y, months_ahead, start_month, candidates)
+        fitted, forecast = MODELS[chosen][0](y, months_ahead, start_month)
+
+        # Least-squares models also keep their coefficients (intercept and
+        # slope first), which describe the trend behind the forecast
+        coef = None
+        if chosen in DESIGNS:
+            coef, _, _, _ = np.linalg.lstsq(DESIGNS[chosen](len(y), 0, start_month), y, rcond=None)
+
+        fit = {
+            "model": chosen,
+            "backtest_mae": backtest_mae,
+            "candidates": scores,
+            "start_month": start_month,
+            "fitted": fitted,
+            "forecast": forecast,
+            "coef": coef
+        }
+        cache[key] = fit
+        if len(cache) > FORECAST_CACHE_SIZE:
+            cache.popitem(last=False)
+        return fit
+
+    @staticmethod
+    def bootstrap_intervals(y, fit, replicates=FORECAST_BOOTSTRAP_REPLICATES, rng=None):
+        rng = rng or np.random.default_rng()
+        fitted = fit["fitted"]
+        forecast = fit["forecast"]
+        horizon = len(forecast)
+
+        in_sample = ~np.isnan(fitted)
+        residuals = (y - fitted)[in_sample]
+        residuals = residuals - residuals.mean()
+        if len(residuals) < 2 or not residuals.any():
+            return {level: (forecast, forecast) for level in ForecastService.INTERVAL_LEVELS}
+
+        design = DESIGNS.get(fit["model"])
+        if design is not None:
+            # Least-squares models: build every resampled history at once
+            # (replicates x n) and refit them all with one multi-column solve
+            X = design(len(y), horizon, fit["start_month"])
+            X_fit = X[:len(y)][in_sample]
+            Y_star = fitted[in_sample] + residuals[rng.integers(0, len(residuals), (replicates, len(residuals)))]
+            coef, _, _, _ = np.linalg.lstsq(X_fit, Y_star.T, rcond=None)
+            paths = (X[len(y):] @ coef).T
+        else:
+            paths = np.broadcast_to(forecast, (replicates, horizon))
+
+        # Future noise: one resampled residual per replicate and month
+        paths = paths + residuals[rng.integers(0, len(residuals), (replicates, horizon))]
+
+        tails = [(100 - level) / 2 for level in ForecastService.INTERVAL_LEVELS]
+        bounds = np.percentile(paths, tails + [100 - t for t in tails], axis=0)
+        count = len(tails)
+        return {
+            level: (bounds[i], bounds[count + i])
+            for i, level in enumerate(ForecastService.INTERVAL_LEVELS)
+        }
+
+    @staticmethod
+    def forecast_series(y, months, months_ahead, model="auto", replicates=None):
+        fit = ForecastService.fit_series(y, months, months_ahead, model)
+
+        future_months = np.arange(months[-1] + 1, months[-1] + 1 + months_ahead)
+        result = {
+            "model": fit["model"],
+            "backtest_mae": fit["backtest_mae"],
+            "candidates": fit["candidates"],
+            "fitted": fit["fitted"],
+            "coef": fit["coef"],
+            "months": [str(m) for m in future_months],
+            "values": np.maximum(fit["forecast"], 0)  # No negative predictions
+        }
+
+        if replicates:
+            intervals = ForecastService.bootstrap_intervals(y, fit, replicates)
+            result["intervals"] = {
+                level: (np.maximum(lower, 0), np.maximum(upper, 0))
+                for level, (lower, upper) in intervals.items()
+            }
+        return result
+
+    @staticmethod
+    def interval_fields(result, index):
+        fields = {}
+        for level, (lower, upper) in result.get("intervals", {}).items():
+            fields[f"lower_{level}"] = round(float(lower[index]), 2)
+            fields[f"upper_{level}"] = round(float(upper[index]), 2)
+        return fields
+
+    @staticmethod
+    def get_income_forecast(months_ahead=3, model="auto", replicates=None, base_currency=None):
+        monthly_data = ForecastService.monthly_totals(get_monthly_income_totals, base_currency)
 
         if len(monthly_data) < 2:
             return {
@@ -22,110 +212,168 @@ class ForecastService:
                 "forecast": []
             }
 
-        # Prepare data for linear regression
-        # X = month index (0, 1, 2, ...)
-        # y = income amount
-        X = np.array(range(len(monthly_data))).reshape(-1, 1)
-        y = np.array([m["total"] for m in monthly_data])
+        months, y = ForecastService.fill_months(monthly_data)
+        monthly_data = [{"month": str(m), "total": total} for m, total in zip(months, y.tolist())]
 
-        # Train the model
-        model = LinearRegression()
-        model.fit(X, y)
+        # Generate predictions with the model that backtested best
+        result = ForecastService.forecast_series(y, months, months_ahead, model, replicates)
+        forecast = [
+            {"month": month, "predicted_income": round(float(value), 2),
+             **ForecastService.interval_fields(result, i)}
+            for i, (month, value) in enumerate(zip(result["months"], result["values"]))
+        ]
 
-        # Get the last month in the data
-        last_month_str = monthly_data[-1]["month"]
-        last_month_date = datetime.strptime(last_month_str + "-01", "%Y-%m-%d")
+        # R-squared of the chosen model's in-sample fit
+        in_sample = ~np.isnan(result["fitted"])
+        actual = y[in_sample]
+        ss_res = np.sum((actual - result["fitted"][in_sample]) ** 2)
+        ss_tot = np.sum((actual - actual.mean()) ** 2) if len(actual) else 0
+        r_squared = round(float(1 - ss_res / ss_tot), 4) if ss_tot != 0 else 0
 
-        # Generate predictions
-        forecast = []
-        for i in range(1, months_ahead + 1):
-            future_index = len(monthly_data) - 1 + i
-            predicted_value = model.predict([[future_index]])[0]
-
-            future_date = last_month_date + relativedelta(months=i)
-            future_month = future_date.strftime("%Y-%m")
+        model_info = {
+            "model": result["model"],
+            "backtest_mae": result["backtest_mae"],
+            "candidates": result["candidates"],
+            "r_squared": r_squared,
+            "interpretation": f"Forecast by the {result['model']} model, which has no single linear trend"
+        }
 
-            forecast.append({
-                "month": future_month,
-                "predicted_income": round(max(0, predicted_value), 2)  # No negative predictions
+        # Slope and intercept only exist for the trend models
+        if result["coef"] is not None:
+            slope = round(float(result["coef"][1]), 2)
+            change = f"{slope} {base_currency}" if base_currency else f"${slope}"
+            model_info.update({
+                "slope": slope,
+                "intercept": round(float(result["coef"][0]), 2),
+                "interpretation": f"Income changes by {change} per month on average"
             })
 
-        # Model info
-        slope = round(model.coef_[0], 2)
-        intercept = round(model.intercept_, 2)
+        return {
+            "base_currency": base_currency,
+            "history": monthly_data,
+            "forecast": forecast,
+            "model_info": model_info
+        }
+
+    @staticmethod
+    def get_expense_trend(months_ahead=3, model="auto", replicates=None, base_currency=None):
+        monthly_data = ForecastService.monthly_totals(get_monthly_expense_totals, base_currency)
+
+        if len(monthly_data) < 2:
+            return {
+                "error": "Not enough data for prediction. Need at least 2 months of expense data.",
+                "history": [],
+                "forecast": []
+            }
+
+        months, y = ForecastService.fill_months(monthly_data)
+        monthly_data = [{"month": str(m), "total": total} for m, total in zip(months, y.tolist())]
 
-        # Calculate R-squared score
-        y_pred = model.predict(X)
-        ss_res = np.sum((y - y_pred) ** 2)
-        ss_tot = np.sum((y - np.mean(y)) ** 2)
-        r_squared = round(1 - (ss_res / ss_tot), 4) if ss_tot != 0 else 0
+        # Generate predictions with the model that backtested best
+        result = ForecastService.forecast_series(y, months, months_ahead, model, replicates)
+        forecast = [
+            {"month": month, "predicted_expense": round(float(value), 2),
+             **ForecastService.interval_fields(result, i)}
+            for i, (month, value) in enumerate(zip(result["months"], result["values"]))
+        ]
 
         return {
+            "base_currency": base_currency,
             "history": monthly_data,
             "forecast": forecast,
             "model_info": {
-                "slope": slope,
-                "intercept": intercept,
-                "r_squared": r_squared,
-                "interpretation": f"Income changes by ${slope} per month on average"
+                "model": result["model"],
+                "backtest_mae": result["backtest_mae"],
+                "candidates": result["candidates"]
             }
         }
 
     @staticmethod
-    def get_expense_trend(months_ahead=3):
-        from database import get_all_transactions
+    def build_monthly_matrix(metric="expense", group_by="category", base_currency=None):
+        rows = get_bucket_totals("month", group_by, by_currency=base_currency is not None)
+        rows = [r for r in rows if r[2] == metric]
+        if not rows:
+            return np.array([], dtype="datetime64[M]"), np.array([]), np.zeros((0, 0))
 
-        transactions = get_all_transactions()
+        month_values = np.array([r[0] for r in rows]).astype("datetime64[M]")
+        labels = np.array(["Uncategorized" if r[1] is None else str(r[1]) for r in rows])
+        keys, series_index = np.unique(labels, return_inverse=True)
 
-        # Aggregate expenses by month
-        monthly_expenses = {}
-        for t in transactions:
-            if t["type"] == "expense":
-                month = t["date"][:7]  # Get YYYY-MM
-                if month not in monthly_expenses:
-                    monthly_expenses[month] = 0
-                monthly_expenses[month] += t["amount"]
+        months = np.arange(month_values.min(), month_values.max() + 1)
+        matrix = np.zeros((len(months), len(keys)))
+        totals = np.array([r[-1] for r in rows], dtype=float)
+        if base_currency is not None:
+            # One row per month and currency; np.add.at adds them up
+            totals *= FxService.factors([r[4] for r in rows], month_values, base_currency)
+        np.add.at(matrix, (np.searchsorted(months, month_values), series_index), totals)
+        return months, keys, matrix
 
-        if len(monthly_expenses) < 2:
-            return {
-                "error": "Not enough data for prediction. Need at least 2 months of expense data.",
-                "history": [],
-                "forecast": []
-            }
+    @staticmethod
+    def get_category_forecast(months_ahead=3, metric="expense", group_by="category", base_currency=None):
+        if metric not in ("expense", "income"):
+            raise ValueError("metric must be 'expense' or 'income'")
+        if group_by not in ("category", "account"):
+            raise ValueError("group_by must be 'category' or 'account'")
 
-        # Sort by month
-        sorted_months = sorted(monthly_expenses.keys())
-        monthly_data = [{"month": m, "total": monthly_expenses[m]} for m in sorted_months]
+        months, keys, Y = ForecastService.build_monthly_matrix(metric, group_by, base_currency)
 
-        # Prepare data for linear regression
-        X = np.array(range(len(monthly_data))).reshape(-1, 1)
-        y = np.array([m["total"] for m in monthly_data])
+        if len(months) < 2:
+            return {
+                "error": f"Not enough data for prediction. Need at least 2 months of {metric} data.",
+                "series": []
+            }
 
-        # Train the model
-        model = LinearRegression()
-        model.fit(X, y)
+        # One least-squares solve fits intercept and slope for every column of Y
+        n = len(months)
+        X = np.column_stack([np.ones(n), np.arange(n)])
+        coef, _, _, _ = np.linalg.lstsq(X, Y, rcond=None)
+        intercepts, slopes = coef
 
-        # Get the last month
-        last_month_str = monthly_data[-1]["month"]
-        last_month_date = datetime.strptime(last_month_str + "-01", "%Y-%m-%d")
+        X_future = np.column_stack([np.ones(months_ahead), np.arange(n, n + months_ahead)])
+        predictions = np.maximum(X_future @ coef, 0)  # No negative predictions
 
-        # Generate predictions
-        forecast = []
-        for i in range(1, months_ahead + 1):
-            future_index = len(monthly_data) - 1 + i
-            predicted_value = model.predict([[future_index]])[0]
+        # R-squared per series
+        ss_res = ((Y - X @ coef) ** 2).sum(axis=0)
+        ss_tot = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+        r_squared = np.where(ss_tot != 0, 1 - ss_res / np.where(ss_tot != 0, ss_tot, 1), 0)
 
-            future_date = last_month_date + relativedelta(months=i)
-            future_month = future_date.strftime("%Y-%m")
+        future_months = np.arange(months[-1] + 1, months[-1] + 1 + months_ahead)
 
-            forecast.append({
-                "month": future_month,
-                "predicted_expense": round(max(0, predicted_value), 2)
+        series = []
+        for i, key in enumerate(keys):
+            series.append({
+                "key": str(key),
+                "slope": round(float(slopes[i]), 2),
+                "intercept": round(float(intercepts[i]), 2),
+                "r_squared": round(float(r_squared[i]), 4),
+                "history": np.round(Y[:, i], 2).tolist(),
+                "forecast": np.round(predictions[:, i], 2).tolist()
             })
 
         return {
-            "history": monthly_data,
-            "forecast": forecast
+            "metric": metric,
+            "group_by": group_by,
+            "base_currency": base_currency,
+            "history_months": [str(m) for m in months],
+            "forecast_months": [str(m) for m in future_months],
+            "series": series
         }
 
+    @staticmethod
+    def get_recurring_projection(months_ahead=12, from_month=None, base_currency=None):
+        from_month = from_month or datetime.now().strftime("%Y-%m")
+        if not validate_month_format(from_month):
+            raise ValueError("from must be in YYYY-MM format")
+
+        months, income, expense, schedules = RecurringService.project(from_month, months_ahead, base_currency)
+        net = income - expense
 
+        return {
+            "base_currency": base_currency,
+            "months": [str(m) for m in months],
+            "income": np.round(income, 2).tolist(),
+            "expense": np.round(expense, 2).tolist(),
+            "net": np.round(net, 2).tolist(),
+            "cumulative_net": np.round(np.cumsum(net), 2).tolist(),
+            "schedules": schedules
+        }
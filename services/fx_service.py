@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FX_REFERENCE_CURRENCY
+from database import (
+    import_fx_rates, get_fx_rates_version, get_monthly_fx_rates, get_account_currencies, currency_scale
+)
+
+
+class FxService:
+
+    # (version, currency -> row, first month, rates) built from the monthly
+    # averages; kept until an import changes the version
+    _rate_table = None
+
+    @staticmethod
+    def validate_currency(code):
+        if not isinstance(code, str) or len(code.strip()) != 3 or not code.strip().isalpha():
+            raise ValueError("base_currency must be a 3-letter code")
+        return code.strip().upper()
+
+    @staticmethod
+    def rate_table():
+        version = get_fx_rates_version()
+        table = FxService._rate_table
+        if table is not None and table[0] == version:
+            return table
+
+        rows = get_monthly_fx_rates()
+        currencies = sorted({row[0] for row in rows} | {FX_REFERENCE_CURRENCY})
+        index = {currency: i for i, currency in enumerate(currencies)}
+        months = np.array([row[1] for row in rows], dtype="datetime64[M]")
+        first = months.min() if len(rows) else np.datetime64("1970-01", "M")
+        count = int((months.max() - first).astype(np.int64)) + 1 if len(rows) else 1
+
+        # One row per currency, one column per month from the first rate on
+        rates = np.full((len(currencies), count), np.nan)
+        rates[index[FX_REFERENCE_CURRENCY]] = 1.0
+        if rows:
+            rates[[index[row[0]] for row in rows], (months - first).astype(np.int64)] = [row[2] for row in rows]
+
+        # Months without rates take the previous month's; months before a
+        # currency's first rate take that first rate
+        known = ~np.isnan(rates)
+        previous = np.maximum.accumulate(np.where(known, np.arange(count), 0), axis=1)
+        rates = rates[np.arange(len(currencies))[:, None], previous]
+        first_known = rates[np.arange(len(currencies)), known.argmax(axis=1)]
+        rates = np.where(np.isnan(rates), first_known[:, None], rates)
+
+        table = (version, index, first, rates)
+        FxService._rate_table = table
+        return table
+
+    @staticmethod
+    def factors(currencies, months, base_currency):
+        # Multipliers taking amounts in each row's currency to the base
+        # currency at the average rate of the row's month
+        codes, code_index = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        return FxService.code_factors(codes, code_index, months, base_currency)
+
+    @staticmethod
+    def code_factors(codes, code_index, months, base_currency):
+        # As factors, with each row's currency given as its position in the
+        # distinct codes; months are 'YYYY-MM' strings, datetime64[M] values
+        # or months since 1970-01
+        needs = np.array([code != base_currency for code in codes], dtype=bool)
+        convert = needs[code_index] if len(codes) else np.zeros(len(code_index), dtype=bool)
+        factors = np.ones(len(code_index))
+        if not convert.any():
+            return factors
+
+        _, index, first, rates = FxService.rate_table()
+        missing = sorted({code for code in codes[needs].tolist() + [base_currency] if code not in index})
+        if missing:
+            raise ValueError(f"No FX rates for {', '.join(missing)}")
+
+        rows = np.array([index.get(code, 0) for code in codes])[code_index[convert]]
+        columns = (np.asarray(months)[convert].astype("datetime64[M]") - first).astype(np.int64)
+        columns = np.clip(columns, 0, rates.shape[1] - 1)
+        factors[convert] = rates[index[base_currency], columns] / rates[rows, columns]
+        return factors
+
+    @staticmethod
+    def ledger_to_base(amounts, accounts, months, base_currency):
+        # Columns from get_*_for_stats(by_currency=True) to int64 minor units
+        # of the base currency, rounded per row; returned with its scale.
+        # Currencies and scales are looked up per account, then gathered per row
+        currencies = get_account_currencies()
+        keys = np.array(sorted(currencies), dtype=np.int64)
+        codes, account_code = np.unique([currencies[key][0] for key in keys.tolist()], return_inverse=True)
+        account_scale = np.array([currencies[key][1] for key in keys.tolist()], dtype=np.int64)
+
+        position = np.searchsorted(keys, np.asarray(accounts, dtype=np.int64))
+        factors = FxService.code_factors(codes, account_code[position], months, base_currency)
+        scale = currency_scale(base_currency)
+        converted = np.asarray(amounts, dtype=np.int64) / account_scale[position] * factors * scale
+        return np.rint(converted).astype(np.int64), scale
+
+    @staticmethod
+    def import_csv(source):
+        # Files with date, currency and rate columns are read as they are;
+        # otherwise the ECB layout: a Date column and one column per currency
+        df = pd.read_csv(source, dtype=str, keep_default_na=False, na_values=["", "N/A"])
+        columns = {column.strip().lower(): column for column in df.columns}
+
+        if {"date", "currency", "rate"} <= set(columns):
+            df = pd.DataFrame({field: df[columns[field]] for field in ("date", "currency", "rate")})
+        elif "date" in columns:
+            df = df.rename(columns={columns["date"]: "date"}).melt(
+                id_vars="date", var_name="currency", value_name="rate"
+            )
+        else:
+            raise ValueError("CSV needs date, currency and rate columns, or a Date column "
+                             "and one column per currency")
+
+        # Blank cells (and the empty column after ECB's trailing commas) have no rate
+        df = df.dropna(subset=["rate"])
+        df["date"] = df["date"].str.strip()
+        df["currency"] = df["currency"].str.strip().str.upper()
+
+        imported = import_fx_rates(list(df[["date", "currency", "rate"]].itertuples(index=False, name=None)))
+        return {
+            "imported": imported,
+            "currencies": sorted(df["currency"].unique().tolist()),
+            "from": df["date"].min() if imported else None,
+            "to": df["date"].max() if imported else None
+        }
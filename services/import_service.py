@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import IMPORT_PROFILES, IMPORT_CHUNK_SIZE, RECONCILE_WINDOW_DAYS
+from database import (
+    get_account_scales, get_existing_ids, get_max_rowid,
+    bulk_insert_transactions, bulk_insert_income
+)
+from .reconciliation_service import ReconciliationService
+from .anomaly_service import AnomalyService
+
+
+class ImportService:
+
+    FIELDS = {
+        "transactions": ["id", "account_id", "date", "amount", "type", "category", "note"],
+        "income": ["id", "account_id", "date", "amount", "source"]
+    }
+
+    @staticmethod
+    def get_profile(name):
+        profile = IMPORT_PROFILES.get(name)
+        if profile is None:
+            raise ValueError(f"Unknown import profile '{name}'")
+        return profile
+
+    @staticmethod
+    def prepare_chunk(chunk, profile, default_account_id=None):
+        target = profile["target"]
+        mapping = profile["columns"]
+
+        missing = [csv_col for csv_col in mapping.values() if csv_col not in chunk.columns]
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+        df = pd.DataFrame(index=chunk.index)
+        for field in ImportService.FIELDS[target]:
+            if field in mapping:
+                df[field] = chunk[mapping[field]]
+            else:
+                df[field] = None
+
+        df["id"] = df["id"].str.strip()
+        if "account_id" not in mapping:
+            df["account_id"] = default_account_id
+        else:
+            df["account_id"] = df["account_id"].str.strip()
+
+        dates = pd.to_datetime(df["date"], format=profile.get("date_format", "%Y-%m-%d"), errors="coerce")
+        df["date"] = dates.dt.strftime("%Y-%m-%d")
+
+        amounts = pd.to_numeric(df["amount"], errors="coerce")
+        if profile.get("signed_amounts"):
+            if target == "transactions":
+                df["type"] = np.where(amounts < 0, "expense", "income")
+            amounts = amounts.abs()
+        df["amount"] = amounts
+
+        if target == "transactions":
+            df["type"] = df["type"].str.strip().str.lower()
+
+        return df
+
+    @staticmethod
+    def validate_chunk(df, target, scales):
+        ids = df["id"]
+        # Amounts in the minor unit of each row's account; NaN for unknown accounts
+        scale = df["account_id"].map(scales)
+        minor = df["amount"] * scale
+        # database.to_minor_units is exact: the shortest decimal form of the
+        # amount must fit the currency's decimal places. For amounts below 2**53
+        # minor units that holds exactly when a whole number of minor units
+        # converts back to the same float, so no tolerance is needed
+        inexact = (np.rint(minor) / scale) != df["amount"]
+
+        # Checked in order; each row is reported with its first failing rule.
+        # Ids repeated across chunks are caught by the database lookup below,
+        # since earlier chunks are already committed.
+        checks = [
+            (ids.isna() | (ids == ""), "Missing id"),
+            (ids.duplicated(), "Duplicate id in file"),
+            (~df["account_id"].isin(list(scales)), "Unknown account"),
+            (df["date"].isna(), "Invalid date"),
+            (df["amount"].isna() | ~(df["amount"] > 0), "Amount must be positive"),
+            (inexact, "Amount has too many decimal places for the account's currency"),
+        ]
+        if target == "transactions":
+            checks.append((~df["type"].isin(["expense", "income"]), "Type must be 'expense' or 'income'"))
+
+        conditions = [mask.fillna(False).to_numpy(dtype=bool) for mask, _ in checks]
+        reasons = np.select(conditions, [reason for _, reason in checks], default="")
+
+        candidate_ids = ids[reasons == ""]
+        existing = get_existing_ids(target, candidate_ids.tolist()) if len(candidate_ids) else set()
+        if existing:
+            reasons = np.where((reasons == "") & ids.isin(existing).to_numpy(dtype=bool),
+                               "ID already exists", reasons)
+
+        return pd.Series(reasons, index=df.index)
+
+    @staticmethod
+    def import_csv(source, profile_name="default", account_id=None,
+                   chunk_size=IMPORT_CHUNK_SIZE, error_limit=None,
+                   skip_duplicates=True, window_days=RECONCILE_WINDOW_DAYS):
+        profile = ImportService.get_profile(profile_name)
+        target = profile["target"]
+        insert = bulk_insert_transactions if target == "transactions" else bulk_insert_income
+
+        if "account_id" not in profile["columns"] and not account_id:
+            raise ValueError(f"Profile '{profile_name}' has no account column; account_id is required")
+
+        scales = get_account_scales()
+        # Rows inserted by this import are not matched against each other
+        ledger_rowid = get_max_rowid(target)
+        rows_read = 0
+        imported = 0
+        rejected = 0
+        errors = []
+        exact_duplicates = 0
+        possible_duplicates = []
+
+        reader = pd.read_csv(
+            source,
+            chunksize=chunk_size,
+            dtype=str,
+            keep_default_na=False,
+            na_values=[""],
+            sep=profile.get("delimiter", ",")
+        )
+
+        for chunk in reader:
+            df = ImportService.prepare_chunk(chunk, profile, account_id)
+            reasons = ImportService.validate_chunk(df, target, scales)
+            valid = reasons == ""
+
+            exact, fuzzy = ReconciliationService.find_duplicates(df[valid], target, window_days, ledger_rowid)
+            exact_duplicates += len(exact)
+            if skip_duplicates and len(exact):
+                reasons[exact.index] = "Duplicate of '" + exact["existing_id"] + "'"
+                valid = reasons == ""
+
+            for index, match in fuzzy.iterrows():
+                if error_limit is not None and len(possible_duplicates) >= error_limit:
+                    break
+                possible_duplicates.append({
+                    "line": int(index) + 2,
+                    "id": match["id"],
+                    "existing_id": match["existing_id"],
+                    "days_apart": int(match["days_apart"])
+                })
+
+            good = df[valid]
+            if len(good):
+                good = good.astype(object).where(good.notna(), None)
+                imported += insert(list(good.itertuples(index=False, name=None)))
+
+            bad = reasons[~valid]
+            rejected += len(bad)
+            if error_limit is not None:
+                bad = bad.iloc[:max(0, error_limit - len(errors))]
+            bad_ids = df.loc[bad.index, "id"]
+            bad_ids = bad_ids.astype(object).where(bad_ids.notna(), None)
+            # +2: one for the header line, one because CSV lines are 1-based
+            errors.extend(
+                {"line": int(index) + 2, "id": row_id, "error": reason}
+                for index, row_id, reason in zip(bad.index, bad_ids, bad)
+            )
+
+            rows_read += len(chunk)
+
+        # Bulk inserts skip the per-row anomaly updates; recompute them in one pass
+        if target == "transactions" and imported:
+            AnomalyService.backfill()
+
+        return {
+            "profile": profile_name,
+            "target": target,
+            "rows_read": rows_read,
+            "imported": imported,
+            "rejected": rejected,
+            "errors": errors,
+            "exact_duplicates": exact_duplicates,
+            "possible_duplicates": possible_duplicates
+        }
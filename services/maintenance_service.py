@@ -0,0 +1,163 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    MAINTENANCE_POLL_SECONDS, MAINTENANCE_IDLE_SECONDS, MAINTENANCE_INTERVALS,
+    MAINTENANCE_VACUUM_PAGES, MAINTENANCE_ANALYSIS_LIMIT, MAINTENANCE_FORECAST_HORIZONS
+)
+from database import (
+    checkpoint_wal, incremental_vacuum, analyze_database, optimize_database,
+    get_all_users, tenant, tenant_database_path
+)
+from .forecast_service import ForecastService
+
+
+class MaintenanceService:
+
+    TASKS = {
+        "checkpoint": lambda: checkpoint_wal("TRUNCATE"),
+        "vacuum": lambda: incremental_vacuum(MAINTENANCE_VACUUM_PAGES),
+        "optimize": optimize_database,
+        "analyze": lambda: analyze_database(MAINTENANCE_ANALYSIS_LIMIT),
+        "refresh": lambda: MaintenanceService.refresh_forecasts()
+    }
+
+    _state = {}
+    _lock = threading.Lock()
+    _stop = threading.Event()
+    _thread = None
+    last_activity = time.monotonic()
+
+    @staticmethod
+    def refresh_forecasts():
+        # Fits land in ForecastService's cache, so the next request for the
+        # same data and horizon skips model selection
+        for months_ahead in MAINTENANCE_FORECAST_HORIZONS:
+            ForecastService.get_income_forecast(months_ahead)
+            ForecastService.get_expense_trend(months_ahead)
+        return {"horizons": len(MAINTENANCE_FORECAST_HORIZONS)}
+
+    @staticmethod
+    def touch():
+        MaintenanceService.last_activity = time.monotonic()
+
+    @staticmethod
+    def idle_seconds():
+        return time.monotonic() - MaintenanceService.last_activity
+
+    @staticmethod
+    def databases():
+        # None is the main database; users whose database was never opened are skipped
+        return [None] + [
+            user["id"] for user in get_all_users()
+            if os.path.exists(tenant_database_path(user["id"]))
+        ]
+
+    @staticmethod
+    def run_task(name):
+        if name not in MaintenanceService.TASKS:
+            raise ValueError("task must be one of: " + ", ".join(MaintenanceService.TASKS))
+
+        task = MaintenanceService.TASKS[name]
+        started = datetime.now()
+        clock = time.perf_counter()
+        totals = {}
+        errors = []
+        databases = MaintenanceService.databases()
+        for user_id in databases:
+            try:
+                if user_id is None:
+                    result = task()
+                else:
+                    with tenant(user_id):
+                        result = task()
+            except Exception as e:
+                # One broken database must not hold up the others
+                errors.append({"user_id": user_id, "error": str(e)})
+                continue
+            for key, value in result.items():
+                totals[key] = totals.get(key, 0) + value
+
+        run = {
+            "last_run": started.isoformat(timespec="seconds"),
+            "duration_ms": round((time.perf_counter() - clock) * 1000, 1),
+            "databases": len(databases),
+            "result": totals,
+            "errors": errors
+        }
+        with MaintenanceService._lock:
+            MaintenanceService._state[name] = run
+        return run
+
+    @staticmethod
+    def due_tasks(now=None):
+        now = now or datetime.now()
+        due = []
+        with MaintenanceService._lock:
+            for name in MaintenanceService.TASKS:
+                run = MaintenanceService._state.get(name)
+                interval = timedelta(seconds=MAINTENANCE_INTERVALS[name])
+                if run is None or datetime.fromisoformat(run["last_run"]) + interval <= now:
+                    due.append(name)
+        return due
+
+    @staticmethod
+    def run_due():
+        # Stops between tasks as soon as requests come back
+        ran = []
+        for name in MaintenanceService.due_tasks():
+            if MaintenanceService._stop.is_set() or MaintenanceService.idle_seconds() < MAINTENANCE_IDLE_SECONDS:
+                break
+            MaintenanceService.run_task(name)
+            ran.append(name)
+        return ran
+
+    @staticmethod
+    def loop():
+        while not MaintenanceService._stop.wait(MAINTENANCE_POLL_SECONDS):
+            if MaintenanceService.idle_seconds() >= MAINTENANCE_IDLE_SECONDS:
+                MaintenanceService.run_due()
+
+    @staticmethod
+    def start():
+        if MaintenanceService._thread and MaintenanceService._thread.is_alive():
+            return MaintenanceService._thread
+        MaintenanceService._stop.clear()
+        MaintenanceService._thread = threading.Thread(
+            target=MaintenanceService.loop, name="maintenance", daemon=True
+        )
+        MaintenanceService._thread.start()
+        return MaintenanceService._thread
+
+    @staticmethod
+    def stop():
+        MaintenanceService._stop.set()
+        if MaintenanceService._thread:
+            MaintenanceService._thread.join()
+            MaintenanceService._thread = None
+
+    @staticmethod
+    def status():
+        now = datetime.now()
+        with MaintenanceService._lock:
+            tasks = {}
+            for name in MaintenanceService.TASKS:
+                run = MaintenanceService._state.get(name)
+                interval = MAINTENANCE_INTERVALS[name]
+                next_due = None
+                if run:
+                    next_due = (datetime.fromisoformat(run["last_run"])
+                                + timedelta(seconds=interval)).isoformat(timespec="seconds")
+                tasks[name] = {"interval_seconds": interval, "next_due": next_due, **(run or {"last_run": None})}
+
+        return {
+            "running": bool(MaintenanceService._thread and MaintenanceService._thread.is_alive()),
+            "idle_seconds": round(MaintenanceService.idle_seconds(), 1),
+            "idle_threshold_seconds": MAINTENANCE_IDLE_SECONDS,
+            "checked_at": now.isoformat(timespec="seconds"),
+            "tasks": tasks
+        }
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import RECONCILE_WINDOW_DAYS
+from database import get_rows_in_window, get_account_scales
+
+
+class ReconciliationService:
+
+    NOTE_FIELDS = {"transactions": "note", "income": "source"}
+    KEY_COLUMNS = ["account_id", "day", "minor", "note_key"]
+
+    @staticmethod
+    def normalize_notes(notes):
+        return (notes.fillna("").astype(str).str.lower()
+                .str.replace(r"[^a-z0-9]+", " ", regex=True)
+                .str.strip())
+
+    @staticmethod
+    def build_keys(df, note_field, minor):
+        # minor: the amounts in integer minor units of each row's account
+        keyed = pd.DataFrame({
+            "id": df["id"].to_numpy(),
+            "account_id": df["account_id"].to_numpy(),
+            "day": pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype(np.int64),
+            "minor": minor,
+            "note_key": ReconciliationService.normalize_notes(df[note_field]).to_numpy()
+        }, index=df.index)
+
+        # 64-bit hash of (account, day, minor amount, normalized note); equal rows share a fingerprint
+        keyed["fingerprint"] = pd.util.hash_pandas_object(
+            keyed[ReconciliationService.KEY_COLUMNS], index=False
+        ).to_numpy()
+        return keyed
+
+    @staticmethod
+    def find_duplicates(df, target="transactions", window_days=RECONCILE_WINDOW_DAYS, max_rowid=None):
+        empty = pd.DataFrame(columns=["id", "existing_id", "days_apart"])
+        if df.empty:
+            return empty, empty.copy()
+
+        note_field = ReconciliationService.NOTE_FIELDS[target]
+        # Incoming amounts are in major units, the ledger's already in minor units
+        scales = df["account_id"].map(get_account_scales()).to_numpy(dtype=float)
+        incoming = ReconciliationService.build_keys(
+            df, note_field, np.rint(df["amount"].to_numpy(dtype=float) * scales).astype(np.int64)
+        )
+
+        # Only ledger rows inside the batch's date window (plus margin) are candidates
+        dates = pd.to_datetime(df["date"])
+        from_date = (dates.min() - pd.Timedelta(days=window_days)).strftime("%Y-%m-%d")
+        to_date = (dates.max() + pd.Timedelta(days=window_days)).strftime("%Y-%m-%d")
+        rows = get_rows_in_window(target, incoming["account_id"].unique().tolist(),
+                                  from_date, to_date, max_rowid)
+        if not rows:
+            return empty, empty.copy()
+
+        ledger = pd.DataFrame(rows, columns=["id", "account_id", "date", "amount", note_field])
+        ledger = ReconciliationService.build_keys(ledger, note_field, ledger["amount"].to_numpy(dtype=np.int64))
+
+        # Exact: hash join on the fingerprint, confirmed on the key columns
+        exact = incoming.reset_index().merge(
+            ledger[["fingerprint", "id"] + ReconciliationService.KEY_COLUMNS],
+            on=["fingerprint"] + ReconciliationService.KEY_COLUMNS,
+            suffixes=("", "_existing")
+        ).drop_duplicates("index").set_index("index")
+        exact = pd.DataFrame({
+            "id": exact["id"],
+            "existing_id": exact["id_existing"],
+            "days_apart": 0
+        })
+
+        # Fuzzy: nearest ledger row with the same account and amount within
+        # +/- window_days, found with a sorted as-of join per (account, amount)
+        remaining = incoming.drop(index=exact.index)
+        if remaining.empty:
+            return exact, empty.copy()
+
+        nearest = pd.merge_asof(
+            remaining.reset_index().sort_values("day"),
+            ledger[["day", "account_id", "minor", "id"]].rename(columns={"id": "existing_id"})
+            .assign(existing_day=lambda x: x["day"]).sort_values("day"),
+            on="day",
+            by=["account_id", "minor"],
+            direction="nearest",
+            tolerance=window_days
+        ).dropna(subset=["existing_id"]).set_index("index")
+
+        fuzzy = pd.DataFrame({
+            "id": nearest["id"],
+            "existing_id": nearest["existing_id"],
+            "days_apart": (nearest["day"] - nearest["existing_day"]).abs().astype(int)
+        })
+        return exact, fuzzy.sort_index()
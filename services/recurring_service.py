@@ -0,0 +1,155 @@
+import numpy as np
+from datetime import datetime
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import (
+    get_recurring_schedule, get_all_recurring_schedules, materialize_occurrences,
+    validate_date_format, get_all_accounts
+)
+from .anomaly_service import AnomalyService
+from .fx_service import FxService
+
+
+class RecurringService:
+
+    EMPTY = np.array([], dtype="datetime64[D]")
+
+    @staticmethod
+    def weekday(dates):
+        # 0 = Monday; day 0 of datetime64 (1970-01-01) was a Thursday
+        return (dates.astype(np.int64) + 3) % 7
+
+    @staticmethod
+    def occurrences(schedule, from_date, to_date):
+        # Every occurrence of the schedule in [from_date, to_date] as datetime64[D]
+        anchor = np.datetime64(schedule["start_date"], "D")
+        start = max(anchor, np.datetime64(from_date, "D"))
+        end = np.datetime64(to_date, "D")
+        if schedule["end_date"]:
+            end = min(end, np.datetime64(schedule["end_date"], "D"))
+        if end < start:
+            return RecurringService.EMPTY
+
+        interval = schedule["interval"]
+        if schedule["frequency"] == "weekly":
+            first = anchor + (schedule["weekday"] - RecurringService.weekday(anchor)) % 7
+            dates = np.arange(first, end + 1, 7 * interval)
+        else:
+            # Months are stepped from the schedule start so intervals stay aligned
+            months = np.arange(anchor.astype("datetime64[M]"), end.astype("datetime64[M]") + 1, interval)
+            first_days = months.astype("datetime64[D]")
+            lengths = ((months + 1).astype("datetime64[D]") - first_days).astype(np.int64)
+
+            if schedule["frequency"] == "monthly":
+                day = schedule["day_of_month"]
+                # Days past the end of a short month fall on its last day
+                days = lengths if day == -1 else np.minimum(day, lengths)
+                dates = first_days + (days - 1)
+            elif schedule["week_of_month"] == -1:
+                last_days = first_days + (lengths - 1)
+                dates = last_days - (RecurringService.weekday(last_days) - schedule["weekday"]) % 7
+            else:
+                offsets = ((schedule["weekday"] - RecurringService.weekday(first_days)) % 7
+                           + 7 * (schedule["week_of_month"] - 1))
+                # A fifth weekday only exists in some months
+                dates = (first_days + offsets)[offsets < lengths]
+
+        return dates[(dates >= start) & (dates <= end)]
+
+    @staticmethod
+    def materialize(through=None, schedule_id=None):
+        through = through or datetime.now().strftime("%Y-%m-%d")
+        if not validate_date_format(through):
+            raise ValueError("through must be in YYYY-MM-DD format")
+
+        if schedule_id:
+            schedule = get_recurring_schedule(schedule_id)
+            if not schedule:
+                raise ValueError(f"Schedule with ID '{schedule_id}' not found")
+            schedules = [schedule]
+        else:
+            schedules = get_all_recurring_schedules(active_on=None)
+
+        transaction_rows = []
+        income_rows = []
+        marks = []
+        for schedule in schedules:
+            # Resume after the last materialized date; occurrences deleted by hand stay deleted
+            from_date = schedule["start_date"]
+            if schedule["materialized_through"]:
+                from_date = str(np.datetime64(schedule["materialized_through"], "D") + 1)
+            if from_date > through:
+                continue
+
+            dates = np.datetime_as_string(RecurringService.occurrences(schedule, from_date, through))
+            ids = [f"{schedule['id']}-{date.replace('-', '')}" for date in dates]
+            if schedule["target"] == "transactions":
+                note = schedule["note"] or schedule["name"]
+                transaction_rows.extend(
+                    (row_id, schedule["account_id"], date, schedule["amount"],
+                     schedule["type"], schedule["category"], note)
+                    for row_id, date in zip(ids, dates)
+                )
+            else:
+                source = schedule["category"] or schedule["name"]
+                income_rows.extend(
+                    (row_id, schedule["account_id"], date, schedule["amount"], source)
+                    for row_id, date in zip(ids, dates)
+                )
+            marks.append((min(through, schedule["end_date"] or through), schedule["id"]))
+
+        created = materialize_occurrences(transaction_rows, income_rows, marks)
+
+        # Bulk inserts skip the per-row anomaly updates
+        if created["transactions"] and any(row[4] == "expense" for row in transaction_rows):
+            AnomalyService.backfill()
+
+        return {
+            "through": through,
+            "schedules": len(marks),
+            "created": created
+        }
+
+    @staticmethod
+    def project(from_month, months_ahead, base_currency=None):
+        # Scheduled monthly income and expense totals without touching the
+        # ledger; with a base currency each occurrence is converted at its month's rate
+        start = np.datetime64(from_month, "M")
+        months = np.arange(start, start + months_ahead)
+        from_date = str(start.astype("datetime64[D]"))
+        to_date = str((start + months_ahead).astype("datetime64[D]") - 1)
+
+        schedules = get_all_recurring_schedules()
+        if base_currency is not None:
+            currencies = {a["id"]: a["currency"] for a in get_all_accounts(fields=["id", "currency"])}
+        month_index = []
+        kinds = []
+        amounts = []
+        summary = []
+        for schedule in schedules:
+            dates = RecurringService.occurrences(schedule, from_date, to_date)
+            kind = 0 if schedule["target"] == "income" or schedule["type"] == "income" else 1
+            occurrence_months = dates.astype("datetime64[M]")
+            values = np.full(len(dates), schedule["amount"])
+            if base_currency is not None:
+                values *= FxService.factors([currencies[schedule["account_id"]]] * len(dates),
+                                            occurrence_months, base_currency)
+            month_index.append((occurrence_months - start).astype(np.int64))
+            kinds.append(np.full(len(dates), kind))
+            amounts.append(values)
+            summary.append({
+                "id": schedule["id"],
+                "name": schedule["name"],
+                "kind": "income" if kind == 0 else "expense",
+                "occurrences": len(dates),
+                "total": round(float(values.sum()), 2)
+            })
+
+        # Every occurrence of every schedule lands in one scatter-add
+        totals = np.zeros((2, months_ahead))
+        if schedules:
+            np.add.at(totals, (np.concatenate(kinds), np.concatenate(month_index)), np.concatenate(amounts))
+
+        return months, totals[0], totals[1], summary
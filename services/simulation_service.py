@@ -0,0 +1,183 @@
+import numpy as np
+from joblib import Parallel, delayed
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    SIMULATION_PATHS, SIMULATION_MAX_PATHS, SIMULATION_MAX_MONTHS,
+    SIMULATION_N_JOBS, SIMULATION_PARALLEL_MIN_PATHS, SIMULATION_CHUNK_PATHS
+)
+from database import get_bucket_totals, get_account_ids, get_account_balance, get_all_accounts
+from .fx_service import FxService
+
+
+class SimulationService:
+
+    METHODS = ("bootstrap", "normal")
+    PERCENTILES = (5, 25, 50, 75, 95)
+
+    @staticmethod
+    def build_history(from_date=None, to_date=None, account_id=None, base_currency=None):
+        # Monthly totals per (kind, category/source) as a months x series matrix
+        rows = get_bucket_totals("month", "category", from_date, to_date, account_id,
+                                 by_currency=base_currency is not None)
+        if not rows:
+            return np.array([], dtype="datetime64[M]"), [], np.zeros((0, 0))
+
+        month_values = np.array([r[0] for r in rows]).astype("datetime64[M]")
+        labels = np.array([
+            f"{r[2]}:{'Uncategorized' if r[1] is None else r[1]}" for r in rows
+        ])
+        keys, series_index = np.unique(labels, return_inverse=True)
+
+        months = np.arange(month_values.min(), month_values.max() + 1)
+        history = np.zeros((len(months), len(keys)))
+        totals = np.array([r[-1] for r in rows], dtype=float)
+        if base_currency is not None:
+            # One row per month and currency, converted at that month's rate
+            totals *= FxService.factors([r[4] for r in rows], month_values, base_currency)
+        np.add.at(history, (np.searchsorted(months, month_values), series_index), totals)
+        series = [{"kind": key.split(":", 1)[0], "key": key.split(":", 1)[1]} for key in keys]
+        return months, series, history
+
+    @staticmethod
+    def current_balance(account_id=None, base_currency=None):
+        # Sum of today's account balances; with a base currency each is
+        # converted at the latest rate first
+        accounts = get_all_accounts(fields=["id", "currency"])
+        if account_id is not None:
+            accounts = [a for a in accounts if a["id"] == account_id]
+        balances = np.array([get_account_balance(a["id"])["balance"] for a in accounts], dtype=float)
+        if base_currency is not None and len(accounts):
+            balances *= FxService.factors([a["currency"] for a in accounts],
+                                          np.full(len(accounts), np.datetime64("today", "M")), base_currency)
+        return float(balances.sum())
+
+    @staticmethod
+    def shock_tables(series, shocks, months_ahead):
+        # factors[m, s] scales series s in simulated month m; amounts[m] adds one-off flows
+        factors = np.ones((months_ahead, len(series)))
+        amounts = np.zeros(months_ahead)
+
+        for shock in shocks or []:
+            if not isinstance(shock, dict):
+                raise ValueError("Each shock must be an object")
+            kind = shock.get("kind")
+            if kind not in ("expense", "income"):
+                raise ValueError("shock 'kind' must be 'expense' or 'income'")
+
+            months = shock.get("months")
+            if months is None:
+                rows = np.arange(months_ahead)
+            else:
+                rows = np.array(months, dtype=int) - 1
+                if rows.size and (rows.min() < 0 or rows.max() >= months_ahead):
+                    raise ValueError(f"shock 'months' must be between 1 and {months_ahead}")
+
+            if "amount" in shock:
+                amount = float(shock["amount"])
+                amounts[rows] += amount if kind == "income" else -amount
+                continue
+
+            factor = float(shock.get("factor", 1))
+            if factor < 0:
+                raise ValueError("shock 'factor' must not be negative")
+            key = shock.get("category")
+            columns = [
+                i for i, s in enumerate(series)
+                if s["kind"] == kind and (key is None or s["key"] == key)
+            ]
+            if key is not None and not columns:
+                raise ValueError(f"No {kind} history for '{key}'")
+            factors[np.ix_(rows, columns)] *= factor
+
+        return factors, amounts
+
+    @staticmethod
+    def simulate_paths(net_table, mean_table, sd_table, method, paths, seed):
+        rng = np.random.default_rng(seed)
+        months_ahead = len(mean_table)
+        if method == "bootstrap":
+            # Each simulated month replays a randomly chosen historical month,
+            # which keeps the co-movement between categories
+            picks = rng.integers(0, net_table.shape[1], (paths, months_ahead))
+            flows = net_table[np.arange(months_ahead), picks]
+        else:
+            flows = mean_table + sd_table * rng.standard_normal((paths, months_ahead))
+        return np.cumsum(flows, axis=1)
+
+    @staticmethod
+    def run(net_table, mean_table, sd_table, method, paths, seed=None):
+        if paths < SIMULATION_PARALLEL_MIN_PATHS:
+            return SimulationService.simulate_paths(net_table, mean_table, sd_table, method, paths, seed)
+
+        # Large runs fan out over worker processes, each with an independent stream
+        chunks = [SIMULATION_CHUNK_PATHS] * (paths // SIMULATION_CHUNK_PATHS)
+        if paths % SIMULATION_CHUNK_PATHS:
+            chunks.append(paths % SIMULATION_CHUNK_PATHS)
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        results = Parallel(n_jobs=SIMULATION_N_JOBS)(
+            delayed(SimulationService.simulate_paths)(net_table, mean_table, sd_table, method, size, child)
+            for size, child in zip(chunks, seeds)
+        )
+        return np.concatenate(results)
+
+    @staticmethod
+    def simulate(months_ahead=12, paths=SIMULATION_PATHS, shocks=None, method="bootstrap",
+                 account_id=None, starting_balance=None, from_date=None, to_date=None,
+                 percentiles=PERCENTILES, seed=None, base_currency=None):
+        if months_ahead < 1 or months_ahead > SIMULATION_MAX_MONTHS:
+            raise ValueError(f"months must be between 1 and {SIMULATION_MAX_MONTHS}")
+        if paths < 1 or paths > SIMULATION_MAX_PATHS:
+            raise ValueError(f"paths must be between 1 and {SIMULATION_MAX_PATHS}")
+        if method not in SimulationService.METHODS:
+            raise ValueError("method must be 'bootstrap' or 'normal'")
+        percentiles = [float(p) for p in percentiles]
+        if any(p < 0 or p > 100 for p in percentiles):
+            raise ValueError("percentiles must be between 0 and 100")
+        if account_id is not None and account_id not in get_account_ids():
+            raise ValueError(f"Account '{account_id}' not found")
+
+        history_months, series, history = SimulationService.build_history(
+            from_date, to_date, account_id, base_currency
+        )
+        if len(history_months) < 2:
+            raise ValueError("Not enough data for simulation. Need at least 2 months of history.")
+
+        if starting_balance is None:
+            starting_balance = SimulationService.current_balance(account_id, base_currency)
+        starting_balance = float(starting_balance)
+
+        factors, amounts = SimulationService.shock_tables(series, shocks, months_ahead)
+        signs = np.array([1.0 if s["kind"] == "income" else -1.0 for s in series])
+
+        # net_table[m, h]: net flow if simulated month m replays historical month h
+        net_table = (factors * signs) @ history.T + amounts[:, None]
+        # Normal method: per-category means and variances, summed per month
+        mean_table = (factors * signs) @ history.mean(axis=0) + amounts
+        sd_table = np.sqrt((factors ** 2) @ history.var(axis=0, ddof=1))
+
+        balances = starting_balance + SimulationService.run(
+            net_table, mean_table, sd_table, method, paths, seed
+        )
+        bands = np.percentile(balances, percentiles, axis=0)
+
+        future_months = np.arange(history_months[-1] + 1, history_months[-1] + 1 + months_ahead)
+        return {
+            "method": method,
+            "paths": paths,
+            "base_currency": base_currency,
+            "starting_balance": round(starting_balance, 2),
+            "history_months": [str(history_months[0]), str(history_months[-1])],
+            "months": [str(m) for m in future_months],
+            "mean": np.round(balances.mean(axis=0), 2).tolist(),
+            "percentiles": {
+                f"p{p:g}": np.round(band, 2).tolist() for p, band in zip(percentiles, bands)
+            },
+            "probability_negative": np.round((balances < 0).mean(axis=0), 4).tolist(),
+            "series": [
+                {**s, "monthly_mean": round(float(mean), 2)}
+                for s, mean in zip(series, history.mean(axis=0))
+            ]
+        }
@@ -1,16 +1,62 @@
-import statistics
+import numpy as np
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_transactions_for_stats, get_income_for_stats
+from database import (
+    get_transactions_for_stats, get_income_for_stats, get_category_totals, get_source_totals,
+    get_bucket_totals, currency_scale
+)
+from .fx_service import FxService
 
 
 class StatsService:
 
     @staticmethod
-    def calculate_basic_stats(values):
-        if not values:
+    def common_minor_units(amounts, scales):
+        # Scales are powers of ten: rescaling every amount to the finest one
+        # present keeps them integers, so sums stay exact int64 sums
+        amounts = np.asarray(amounts, dtype=np.int64)
+        scales = np.asarray(scales, dtype=np.int64)
+        if not len(amounts):
+            return amounts, 1
+        common = int(scales.max())
+        return amounts * (common // scales), common
+
+    @staticmethod
+    def ledger_minor_units(columns, base_currency=None):
+        # Amounts from get_*_for_stats as int64 minor units of one scale: the
+        # finest scale present, or the base currency's after conversion
+        if base_currency is None:
+            return StatsService.common_minor_units(columns["amount"], columns["scale"])
+        return FxService.ledger_to_base(columns["amount"], columns["account"], columns["month"], base_currency)
+
+    @staticmethod
+    def group_totals(groups, base_currency=None):
+        # name -> {"count", "total"} from get_category_totals/get_source_totals;
+        # with a base currency, the per-month currency groups are converted and
+        # added up with NumPy
+        if base_currency is None:
+            return {group["name"]: {"count": group["count"], "total": group["total"]} for group in groups}
+        if not groups:
+            return {}
+
+        names, name_index = np.unique([group["name"] for group in groups], return_inverse=True)
+        factors = FxService.factors([group["currency"] for group in groups],
+                                    [group["month"] for group in groups], base_currency)
+        totals = np.bincount(name_index, weights=np.array([group["total"] for group in groups]) * factors,
+                             minlength=len(names))
+        counts = np.bincount(name_index, weights=[group["count"] for group in groups], minlength=len(names))
+        digits = len(str(currency_scale(base_currency))) - 1
+        return {
+            str(name): {"count": int(count), "total": round(float(total), digits)}
+            for name, count, total in zip(names, counts, totals)
+        }
+
+    @staticmethod
+    def calculate_basic_stats(values, scale=1):
+        # values: int64 minor units, divided by scale only for the results
+        if not len(values):
             return {
                 "count": 0,
                 "sum": 0,
@@ -23,107 +69,101 @@ class StatsService:
 
         return {
             "count": len(values),
-            "sum": round(sum(values), 2),
-            "mean": round(statistics.mean(values), 2),
-            "median": round(statistics.median(values), 2),
-            "min": round(min(values), 2),
-            "max": round(max(values), 2),
-            "std_dev": round(statistics.stdev(values), 2) if len(values) > 1 else 0
+            "sum": int(values.sum()) / scale,
+            "mean": round(float(values.mean()) / scale, 2),
+            "median": round(float(np.median(values)) / scale, 2),
+            "min": int(values.min()) / scale,
+            "max": int(values.max()) / scale,
+            "std_dev": round(float(values.std(ddof=1)) / scale, 2) if len(values) > 1 else 0
         }
 
     @staticmethod
-    def get_transaction_stats(from_date=None, to_date=None):
-        transactions = get_transactions_for_stats(from_date, to_date)
+    def get_transaction_stats(from_date=None, to_date=None, base_currency=None):
+        by_currency = base_currency is not None
+        transactions = get_transactions_for_stats(from_date, to_date, by_currency=by_currency)
+        empty = np.array([], dtype=np.int64)
 
-        if not transactions:
+        if not transactions["amount"]:
             return {
                 "period": {"from": from_date, "to": to_date},
+                "base_currency": base_currency,
                 "total_transactions": 0,
-                "expenses": StatsService.calculate_basic_stats([]),
-                "income": StatsService.calculate_basic_stats([]),
+                "expenses": StatsService.calculate_basic_stats(empty),
+                "income": StatsService.calculate_basic_stats(empty),
                 "by_category": {}
             }
 
-        expense_amounts = [t["amount"] for t in transactions if t["type"] == "expense"]
-        income_amounts = [t["amount"] for t in transactions if t["type"] == "income"]
-
-        # Group by category
-        by_category = {}
-        for t in transactions:
-            category = t["category"] or "Uncategorized"
-            if category not in by_category:
-                by_category[category] = {"count": 0, "total": 0, "amounts": []}
-            by_category[category]["count"] += 1
-            by_category[category]["total"] += t["amount"]
-            by_category[category]["amounts"].append(t["amount"])
+        amounts, scale = StatsService.ledger_minor_units(transactions, base_currency)
+        types = np.array(transactions["type"])
+        expense_amounts = amounts[types == "expense"]
+        income_amounts = amounts[types == "income"]
+        expense_total = int(expense_amounts.sum()) / scale
 
-        # Calculate stats per category
+        # Grouped by category id in SQL
         category_stats = {}
-        for category, data in by_category.items():
-            category_stats[category] = {
+        groups = get_category_totals(from_date, to_date, by_currency=by_currency)
+        for name, data in StatsService.group_totals(groups, base_currency).items():
+            category_stats[name] = {
                 "count": data["count"],
-                "total": round(data["total"], 2),
-                "mean": round(statistics.mean(data["amounts"]), 2),
-                "percentage": round((data["total"] / sum(expense_amounts) * 100), 2) if expense_amounts else 0
+                "total": data["total"],
+                "mean": round(data["total"] / data["count"], 2),
+                "percentage": round((data["total"] / expense_total * 100), 2) if expense_total else 0
             }
 
         return {
             "period": {"from": from_date, "to": to_date},
-            "total_transactions": len(transactions),
-            "expenses": StatsService.calculate_basic_stats(expense_amounts),
-            "income": StatsService.calculate_basic_stats(income_amounts),
-            "net": round(sum(income_amounts) - sum(expense_amounts), 2),
+            "base_currency": base_currency,
+            "total_transactions": len(amounts),
+            "expenses": StatsService.calculate_basic_stats(expense_amounts, scale),
+            "income": StatsService.calculate_basic_stats(income_amounts, scale),
+            "net": (int(income_amounts.sum()) - int(expense_amounts.sum())) / scale,
             "by_category": category_stats
         }
 
     @staticmethod
-    def get_income_stats(from_date=None, to_date=None):
-        income_records = get_income_for_stats(from_date, to_date)
+    def get_income_stats(from_date=None, to_date=None, base_currency=None):
+        by_currency = base_currency is not None
+        income_records = get_income_for_stats(from_date, to_date, by_currency=by_currency)
 
-        if not income_records:
+        if not income_records["amount"]:
             return {
                 "period": {"from": from_date, "to": to_date},
+                "base_currency": base_currency,
                 "total_records": 0,
-                "stats": StatsService.calculate_basic_stats([]),
+                "stats": StatsService.calculate_basic_stats(np.array([], dtype=np.int64)),
                 "by_source": {}
             }
 
-        amounts = [i["amount"] for i in income_records]
+        amounts, scale = StatsService.ledger_minor_units(income_records, base_currency)
+        total = int(amounts.sum()) / scale
 
-        # Group by source
-        by_source = {}
-        for i in income_records:
-            source = i["source"] or "Unknown"
-            if source not in by_source:
-                by_source[source] = {"count": 0, "total": 0, "amounts": []}
-            by_source[source]["count"] += 1
-            by_source[source]["total"] += i["amount"]
-            by_source[source]["amounts"].append(i["amount"])
-
-        # Calculate stats per source
+        # Grouped by source id in SQL
         source_stats = {}
-        for source, data in by_source.items():
-            source_stats[source] = {
+        groups = get_source_totals(from_date, to_date, by_currency=by_currency)
+        for name, data in StatsService.group_totals(groups, base_currency).items():
+            source_stats[name] = {
                 "count": data["count"],
-                "total": round(data["total"], 2),
-                "mean": round(statistics.mean(data["amounts"]), 2),
-                "percentage": round((data["total"] / sum(amounts) * 100), 2)
+                "total": data["total"],
+                "mean": round(data["total"] / data["count"], 2),
+                "percentage": round((data["total"] / total * 100), 2)
             }
 
         return {
             "period": {"from": from_date, "to": to_date},
-            "total_records": len(income_records),
-            "stats": StatsService.calculate_basic_stats(amounts),
+            "base_currency": base_currency,
+            "total_records": len(amounts),
+            "stats": StatsService.calculate_basic_stats(amounts, scale),
             "by_source": source_stats
         }
 
     @staticmethod
-    def get_summary(from_date=None, to_date=None):
-        transaction_stats = StatsService.get_transaction_stats(from_date, to_date)
-        income_stats = StatsService.get_income_stats(from_date, to_date)
+    def get_summary(from_date=None, to_date=None, base_currency=None):
+        transaction_stats = StatsService.get_transaction_stats(from_date, to_date, base_currency)
+        income_stats = StatsService.get_income_stats(from_date, to_date, base_currency)
 
         return {
             "period": {"from": from_date, "to": to_date},
+            "base_currency": base_currency,
             "transactions": {
                 "count": transaction_stats["total_transactions"],
                 "total_expenses": transaction_stats["expenses"]["sum"],
@@ -147,4 +187,71 @@ class StatsService:
             "source_breakdown": income_stats["by_source"]
         }
 
+    # numpy datetime64 unit and step for each granularity; weeks are 7-day steps from a Monday
+    BUCKET_UNITS = {
+        "day": ("D", 1),
+        "week": ("D", 7),
+        "month": ("M", 1),
+        "year": ("Y", 1)
+    }
+    METRICS = ("expense", "income", "net")
+
+    @staticmethod
+    def bucket_start(date_str, granularity):
+        unit, _ = StatsService.BUCKET_UNITS[granularity]
+        day = np.datetime64(date_str, "D")
+        if granularity == "week":
+            # 1970-01-01 was a Thursday, so Monday-aligned weeks are offset by 3 days
+            return day - (day.astype(np.int64) + 3) % 7
+        return day.astype(f"datetime64[{unit}]")
+
+    @staticmethod
+    def get_timeseries(metric="expense", granularity="month", group_by=None,
+                       from_date=None, to_date=None, base_currency=None):
+        if metric not in StatsService.METRICS:
+            raise ValueError("metric must be one of: " + ", ".join(StatsService.METRICS))
+
+        rows = get_bucket_totals(granularity, group_by, from_date, to_date, by_currency=base_currency is not None)
+        rows = [r for r in rows if metric == "net" or r[2] == metric]
+
+        result = {
+            "metric": metric,
+            "granularity": granularity,
+            "group_by": group_by,
+            "period": {"from": from_date, "to": to_date},
+            "base_currency": base_currency,
+            "buckets": [],
+            "series": []
+        }
+        if not rows and not (from_date and to_date):
+            return result
+
+        unit, step = StatsService.BUCKET_UNITS[granularity]
+        keys = np.array([r[0] for r in rows])
+        # Bucket keys are 'YYYY-MM-DD', 'YYYY-MM' or 'YYYY', all parseable by numpy
+        bucket_values = keys.astype(f"datetime64[{unit}]") if len(rows) else np.array([], dtype=f"datetime64[{unit}]")
+
+        start = StatsService.bucket_start(from_date, granularity) if from_date else bucket_values.min()
+        end = StatsService.bucket_start(to_date, granularity) if to_date else bucket_values.max()
+        buckets = np.arange(start, end + step, step)
+
+        labels = np.array(["Total" if r[1] is None else str(r[1]) for r in rows]) if group_by else np.full(len(rows), "Total")
+        groups, group_index = np.unique(labels, return_inverse=True)
+
+        signs = np.array([1.0 if metric != "net" or r[2] == "income" else -1.0 for r in rows])
+        totals = np.array([r[-1] for r in rows], dtype=float) * signs
+        if base_currency is not None:
+            # Rows are per month and currency; the scatter below adds them up
+            totals *= FxService.factors([r[4] for r in rows], [r[3] for r in rows], base_currency)
+
+        # Scatter the sparse (group, bucket) totals into a zero-filled matrix
+        matrix = np.zeros((len(groups), len(buckets)))
+        np.add.at(matrix, (group_index, np.searchsorted(buckets, bucket_values)), totals)
+
+        result["buckets"] = [str(b) for b in buckets]
+        result["series"] = [
+            {"key": str(group), "values": np.round(values, 2).tolist(), "total": round(float(values.sum()), 2)}
+            for group, values in zip(groups, matrix)
+        ]
+        return result
 
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database.db as db
+import services.backup_service as backup_service
+from app import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # A fresh main database, tenant and backup directory per test, without sample data
+    monkeypatch.setattr(db, "DATABASE_PATH", str(tmp_path / "finance.db"))
+    monkeypatch.setattr(db, "TENANT_DATABASE_DIR", str(tmp_path / "tenants"))
+    monkeypatch.setattr(db, "TENANT_SEED_SAMPLE_DATA", False)
+    monkeypatch.setattr(backup_service, "BACKUP_DIR", str(tmp_path / "backups"))
+    db.init_db(verbose=False)
+    db.init_users_table()
+    db.init_fx_rates_table()
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    def login(username, password="secret123"):
+        client.post('/auth/register', json={"username": username, "password": password})
+        token = client.post('/auth/login', json={"username": username, "password": password}).get_json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+    return login
@@ -0,0 +1,38 @@
+import io
+
+import api.routes as routes
+
+
+def test_maintenance_needs_an_admin(client, login, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_USERNAMES", ("root",))
+    user = login("alice")
+    admin = login("root")
+
+    assert client.get('/admin/maintenance').status_code == 401
+    assert client.get('/admin/maintenance', headers=user).status_code == 403
+    assert client.post('/admin/maintenance', json={"tasks": ["checkpoint"]}, headers=user).status_code == 403
+
+    response = client.get('/admin/maintenance', headers=admin)
+    assert response.status_code == 200
+    assert "scheduler" in response.get_json()
+
+
+def test_backups_need_an_admin(client, login, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_USERNAMES", ("root",))
+    user = login("alice")
+
+    assert client.post('/admin/backup', json={"id": "eom"}, headers=user).status_code == 403
+    assert client.get('/admin/backups', headers=user).status_code == 403
+
+
+def test_fx_rate_import_needs_an_admin(client, login, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_USERNAMES", ("root",))
+    rates = "date,currency,rate\n2025-01-02,USD,1.04\n"
+
+    def upload(headers):
+        return client.post('/fx/rates/import', data={"file": (io.BytesIO(rates.encode()), "rates.csv")},
+                           headers=headers, content_type="multipart/form-data")
+
+    assert upload(login("alice")).status_code == 403
+    assert upload(login("root")).status_code == 201
+    assert client.get('/fx/rates', headers=login("alice")).get_json()["count"] == 1
@@ -0,0 +1,128 @@
+import sqlite3
+
+import database.db as db
+
+
+def add_accounts(client, headers):
+    for account_id, currency in (("USD", "USD"), ("JPY", "JPY"), ("KWD", "KWD")):
+        client.post('/accounts', json={"id": account_id, "name": account_id, "currency": currency}, headers=headers)
+
+
+def add_expense(client, headers, id, account_id, amount, date="2025-01-10"):
+    return client.post('/transactions', json={"id": id, "account_id": account_id, "date": date, "amount": amount,
+                                              "type": "expense", "category": "Food"}, headers=headers)
+
+
+def test_amounts_are_stored_in_minor_units_and_summed_exactly(client, login):
+    headers = login("alice")
+    add_accounts(client, headers)
+    for i in range(10):
+        assert add_expense(client, headers, f"D{i}", "USD", 0.1).status_code == 201
+    add_expense(client, headers, "K1", "KWD", 1.005)
+    add_expense(client, headers, "Y1", "JPY", 1500)
+
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        conn = db.get_read_connection()
+        stored = dict(conn.execute("SELECT id, amount FROM transactions WHERE id IN ('D0', 'K1', 'Y1')").fetchall())
+        types = {row[0] for row in conn.execute("SELECT typeof(amount) FROM transactions")}
+        db.close_db_connection(conn)
+    assert stored == {"D0": 10, "K1": 1005, "Y1": 1500}
+    assert types == {"integer"}
+
+    # Ten 0.1s add up to exactly 1, not 0.9999999999999999
+    assert client.get('/accounts/USD/balance?as_of=2025-12-31', headers=headers).get_json()["balance"] == -1
+    stats = client.get('/stats/transactions', headers=headers).get_json()
+    assert stats["expenses"]["sum"] == 1502.005
+    assert client.get('/transactions/K1', headers=headers).get_json()["amount"] == 1.005
+
+
+def test_amounts_finer_than_the_currency_are_rejected(client, login):
+    headers = login("alice")
+    add_accounts(client, headers)
+
+    for account_id, amount in (("USD", 0.001), ("USD", 10.005), ("JPY", 0.5), ("KWD", 1.0001)):
+        response = add_expense(client, headers, "X", account_id, amount)
+        assert response.status_code == 400
+        assert "decimal places" in response.get_json()["error"]
+    assert add_expense(client, headers, "X", "USD", 10.05).status_code == 201
+    assert client.put('/transactions/X', json={"amount": 1.234}, headers=headers).status_code == 400
+    assert client.get('/transactions/X', headers=headers).get_json()["amount"] == 10.05
+
+
+def test_currency_changes_keep_the_scale_of_existing_amounts(client, login):
+    headers = login("alice")
+    add_accounts(client, headers)
+    add_expense(client, headers, "T1", "USD", 19.99)
+
+    assert client.put('/accounts/USD', json={"currency": "JPY"}, headers=headers).status_code == 400
+    assert client.put('/accounts/USD', json={"currency": "EUR"}, headers=headers).status_code == 200
+    assert client.get('/transactions/T1', headers=headers).get_json()["amount"] == 19.99
+    # Without amounts any currency is fine
+    assert client.put('/accounts/JPY', json={"currency": "BHD"}, headers=headers).status_code == 200
+    assert add_expense(client, headers, "T2", "JPY", 0.125).status_code == 201
+
+
+def test_real_amounts_are_migrated_to_minor_units(client, tmp_path, monkeypatch):
+    # A main database from before minor units: REAL amounts and no account scale
+    path = str(tmp_path / "old.db")
+    monkeypatch.setattr(db, "DATABASE_PATH", path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE accounts (id TEXT PRIMARY KEY, name TEXT NOT NULL, currency TEXT NOT NULL DEFAULT 'USD',
+                               created_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE transactions (id TEXT PRIMARY KEY, account_id TEXT NOT NULL, date TEXT NOT NULL,
+                                   amount REAL NOT NULL, type TEXT NOT NULL, category_id INTEGER, note TEXT,
+                                   created_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE income (id TEXT PRIMARY KEY, account_id TEXT NOT NULL, date TEXT NOT NULL, amount REAL NOT NULL,
+                             source_id INTEGER, created_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE account_balance_checkpoints (account_id TEXT NOT NULL, month TEXT NOT NULL,
+                                                  net REAL NOT NULL DEFAULT 0, balance REAL NOT NULL DEFAULT 0,
+                                                  PRIMARY KEY (account_id, month));
+        CREATE TABLE budgets (id TEXT PRIMARY KEY, name TEXT NOT NULL, category_id INTEGER, account_id TEXT,
+                              amount REAL NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE budget_spend (budget_id TEXT NOT NULL, month TEXT NOT NULL, spent REAL NOT NULL DEFAULT 0,
+                                   PRIMARY KEY (budget_id, month));
+        INSERT INTO categories (id, name) VALUES (1, 'Food');
+        INSERT INTO accounts (id, name, currency) VALUES ('USD', 'Checking', 'USD'), ('JPY', 'Tokyo', 'JPY'),
+                                                         ('KWD', 'Kuwait', 'KWD');
+        INSERT INTO transactions (id, account_id, date, amount, type, category_id) VALUES
+            ('T1', 'USD', '2025-01-02', 0.1, 'expense', 1), ('T2', 'USD', '2025-01-03', 0.2, 'expense', 1),
+            ('T3', 'USD', '2025-02-01', 19.99, 'expense', 1), ('T4', 'JPY', '2025-01-04', 1500, 'expense', 1),
+            ('T5', 'KWD', '2025-01-05', 2.675, 'expense', 1);
+        INSERT INTO income (id, account_id, date, amount) VALUES ('I1', 'USD', '2025-01-01', 1000.3);
+        INSERT INTO account_balance_checkpoints VALUES ('USD', '2025-01', 1000.0, 1000.0);
+        INSERT INTO budgets (id, name, category_id, account_id, amount) VALUES ('B1', 'Food', 1, 'USD', 50.5);
+        INSERT INTO budget_spend VALUES ('B1', '2025-01', 0.3);
+    """)
+    conn.commit()
+    conn.close()
+
+    db.init_db(verbose=False)
+
+    conn = sqlite3.connect(path)
+    stored = dict(conn.execute("SELECT id, amount FROM transactions"))
+    types = {row[0] for row in conn.execute("SELECT typeof(amount) FROM transactions UNION "
+                                            "SELECT typeof(amount) FROM income UNION "
+                                            "SELECT typeof(amount) FROM budgets")}
+    scales = dict(conn.execute("SELECT id, scale FROM accounts"))
+    conn.close()
+    assert stored == {"T1": 10, "T2": 20, "T3": 1999, "T4": 1500, "T5": 2675}
+    assert types == {"integer"}
+    assert scales == {"USD": 100, "JPY": 1, "KWD": 1000}
+
+    assert {row["id"]: row["amount"] for row in db.get_all_transactions()}["T5"] == 2.675
+    assert db.get_all_income()[0]["amount"] == 1000.3
+    assert db.get_budget("B1")["amount"] == 50.5
+    assert db.get_budget_status("2025-01", "B1")[0]["spent"] == 0.3
+    # Balances are exact: 1000.3 - 0.1 - 0.2, then - 19.99
+    assert db.get_account_balance("USD", "2025-01-31")["balance"] == 1000
+    assert db.get_account_balance("USD", "2025-02-28")["balance"] == 980.01
+    assert db.get_monthly_expense_totals(by_currency=True)[:3] == [
+        {"month": "2025-01", "currency": "JPY", "total": 1500},
+        {"month": "2025-01", "currency": "KWD", "total": 2.675},
+        {"month": "2025-01", "currency": "USD", "total": 0.3}]
+
+    db.init_db(verbose=False)
+    assert db.get_all_transactions()[0]["amount"] == 19.99
@@ -0,0 +1,75 @@
+import database.db as db
+from services import AnomalyService
+
+
+def anomaly_state():
+    conn = db.get_read_connection()
+    conn.row_factory = None
+    try:
+        stats = conn.execute("SELECT category_id, currency, count, round(mean, 6), round(var, 6) "
+                             "FROM category_expense_stats ORDER BY category_id, currency").fetchall()
+        scores = conn.execute("SELECT transaction_id, round(score, 6), round(expected, 6), baseline_count "
+                              "FROM transaction_anomalies ORDER BY transaction_id").fetchall()
+    finally:
+        db.close_db_connection(conn)
+    return stats, scores
+
+
+def test_bulk_changes_refresh_anomaly_scores(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    for i in range(12):
+        client.post('/transactions', json={"id": f"T{i:02d}", "account_id": "ACC", "date": f"2025-01-{i + 1:02d}",
+                                           "amount": 20 + i % 3, "type": "expense",
+                                           "category": "Food" if i % 2 else "Fun"}, headers=headers)
+
+    user_id = db.get_user_by_username("alice")["id"]
+    for method, url, body in (
+            ("patch", '/transactions?category=Fun', {"amount": 500}),
+            ("patch", '/transactions?from=2025-01-05&to=2025-01-08', {"category": "Food"}),
+            ("patch", '/transactions?account_id=ACC&category=Food', {"date": "2025-02-01"}),
+            ("delete", '/transactions?to=2025-01-03', None)):
+        response = getattr(client, method)(url, json=body, headers=headers)
+        assert response.get_json()["changed"] > 0
+
+        # The kept scores are what a full recomputation gives
+        with db.tenant(user_id):
+            state = anomaly_state()
+            AnomalyService.backfill()
+            assert anomaly_state() == state
+
+
+def test_currencies_keep_separate_statistics(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+    for i in range(8):
+        client.post('/transactions', json={"id": f"U{i}", "account_id": "USD", "date": f"2025-01-{i + 1:02d}",
+                                           "amount": 100 + i, "type": "expense", "category": "Food"},
+                    headers=headers)
+        client.post('/transactions', json={"id": f"J{i}", "account_id": "JPY", "date": f"2025-01-{i + 1:02d}",
+                                           "amount": 10000 + 100 * i, "type": "expense", "category": "Food"},
+                    headers=headers)
+
+    # A usual yen amount is scored against the yen history, not the dollar one
+    anomaly = client.post('/transactions', json={"id": "J8", "account_id": "JPY", "date": "2025-01-09",
+                                                 "amount": 10400, "type": "expense", "category": "Food"},
+                          headers=headers).get_json()["anomaly"]
+    assert not anomaly["flagged"]
+    assert anomaly["expected"] > 10000
+
+    anomaly = client.post('/transactions', json={"id": "U8", "account_id": "USD", "date": "2025-01-09",
+                                                 "amount": 104, "type": "expense", "category": "Food"},
+                          headers=headers).get_json()["anomaly"]
+    assert not anomaly["flagged"]
+    assert anomaly["expected"] < 200
+
+    user_id = db.get_user_by_username("alice")["id"]
+    with db.tenant(user_id):
+        stats, _ = anomaly_state()
+        assert [row[1:3] for row in stats] == [("JPY", 9), ("USD", 9)]
+
+        # The vectorized rebuild keys its series the same way
+        state = anomaly_state()
+        AnomalyService.backfill()
+        assert anomaly_state() == state
@@ -0,0 +1,152 @@
+import io
+
+import database.db as db
+
+
+def archived_user(client, login):
+    # Two old years go to archive partitions; 2025 stays in the hot tables
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    for i, date in enumerate(["2019-03-01", "2019-07-15", "2020-02-10", "2025-01-05", "2025-02-05"]):
+        client.post('/transactions', json={"id": f"TXN{i}", "account_id": "ACC", "date": date,
+                                           "amount": 10 + i, "type": "expense", "category": "Food"},
+                    headers=headers)
+        client.post('/income', json={"id": f"INC{i}", "account_id": "ACC", "date": date,
+                                     "amount": 100 + i, "source": "Salary"}, headers=headers)
+
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        report = db.archive_ledger("2021-01-01")
+    assert report["archived"] == {"transactions": 3, "income": 3}
+    return headers
+
+
+def test_listings_include_archived_rows(client, login):
+    headers = archived_user(client, login)
+
+    transactions = client.get('/transactions', headers=headers).get_json()["transactions"]
+    assert [row["id"] for row in transactions] == ["TXN4", "TXN3", "TXN2", "TXN1", "TXN0"]
+    assert client.get('/income', headers=headers).get_json()["count"] == 5
+
+    response = client.get('/transactions/TXN0', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["amount"] == 10
+    assert client.get('/income/INC2', headers=headers).get_json()["date"] == "2020-02-10"
+
+
+def test_ledger_pages_through_archived_rows(client, login):
+    headers = archived_user(client, login)
+
+    entries = []
+    cursor = None
+    while True:
+        url = '/ledger?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url, headers=headers).get_json()
+        entries.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(entries) == 10
+    assert [entry["date"] for entry in entries] == sorted((entry["date"] for entry in entries), reverse=True)
+    assert {entry["id"] for entry in entries} == {f"TXN{i}" for i in range(5)} | {f"INC{i}" for i in range(5)}
+
+
+def test_archived_rows_are_read_only(client, login):
+    headers = archived_user(client, login)
+
+    response = client.put('/transactions/TXN0', json={"amount": 99}, headers=headers)
+    assert response.status_code == 400
+    assert "archived" in response.get_json()["error"]
+
+    response = client.delete('/income/INC1', headers=headers)
+    assert response.status_code == 400
+    assert client.get('/income/INC1', headers=headers).status_code == 200
+
+
+def import_rows(client, headers, lines):
+    csv = "id,account_id,date,amount,type,category,note\n" + "\n".join(lines) + "\n"
+    return client.post('/import/csv?profile=default', data={"file": (io.BytesIO(csv.encode()), "rows.csv")},
+                       headers=headers, content_type="multipart/form-data").get_json()
+
+
+def test_archived_ids_stay_taken(client, login):
+    headers = archived_user(client, login)
+
+    response = client.post('/transactions', json={"id": "TXN0", "account_id": "ACC", "date": "2025-03-01",
+                                                  "amount": 5, "type": "expense"}, headers=headers)
+    assert response.status_code == 400
+    assert "already exists" in response.get_json()["error"]
+
+    response = client.post('/income', json={"id": "INC1", "account_id": "ACC", "date": "2025-03-01",
+                                            "amount": 5}, headers=headers)
+    assert response.status_code == 400
+
+    report = import_rows(client, headers, ["TXN1,ACC,2025-03-02,7,expense,Food,"])
+    assert report["imported"] == 0
+    assert report["errors"][0]["error"] == "ID already exists"
+
+
+def test_import_reconciles_against_archived_rows(client, login):
+    headers = archived_user(client, login)
+
+    # Same account, date and amount as archived TXN0 (no note), under a new id
+    report = import_rows(client, headers, ["NEW1,ACC,2019-03-01,10,expense,Food,",
+                                           "NEW2,ACC,2019-03-03,10,expense,Food,"])
+    assert report["exact_duplicates"] == 1
+    assert report["imported"] == 1
+    assert report["possible_duplicates"][0]["existing_id"] == "TXN0"
+
+
+def test_bulk_changes_reject_archived_rows(client, login):
+    headers = archived_user(client, login)
+
+    response = client.patch('/transactions?from=2019-01-01&to=2025-12-31', json={"note": "x"}, headers=headers)
+    assert response.status_code == 400
+    assert "archived" in response.get_json()["error"]
+
+    response = client.delete('/income?to=2020-12-31&dry_run=true', headers=headers)
+    assert response.status_code == 400
+
+    response = client.delete('/income?from=2025-01-01', headers=headers)
+    assert response.get_json() == {"matched": 2, "changed": 2, "dry_run": False}
+
+
+def test_id_checks_and_lookups_attach_only_the_partition_with_the_row(client, login, monkeypatch):
+    headers = archived_user(client, login)
+    attached = []
+    archive_database_path = db.archive_database_path
+
+    def spy(year):
+        attached.append(year)
+        return archive_database_path(year)
+    monkeypatch.setattr(db, "archive_database_path", spy)
+
+    response = client.post('/transactions', json={"id": "TXN9", "account_id": "ACC", "date": "2025-03-01",
+                                                  "amount": 5, "type": "expense"}, headers=headers)
+    assert response.status_code == 201
+    assert client.post('/income', json={"id": "INC2", "account_id": "ACC", "date": "2025-03-01",
+                                        "amount": 5}, headers=headers).status_code == 400
+    assert import_rows(client, headers, ["TXN1,ACC,2025-03-02,7,expense,Food,"])["imported"] == 0
+    assert client.get('/transactions/TXN3', headers=headers).status_code == 200
+    assert client.get('/income/MISSING', headers=headers).status_code == 404
+    assert attached == []
+
+    assert client.get('/transactions/TXN0', headers=headers).get_json()["date"] == "2019-03-01"
+    assert attached == ["2019"]
+
+
+def test_archived_ids_are_registered_for_older_archives(client, login):
+    headers = archived_user(client, login)
+
+    # Databases archived before the registry get it filled from the partitions
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        conn = db.get_db_connection()
+        conn.execute("DROP TABLE archived_ids")
+        conn.commit()
+        db.close_db_connection(conn)
+        db.init_db(verbose=False)
+
+    assert client.get('/income/INC2', headers=headers).get_json()["amount"] == 102
+    response = client.post('/transactions', json={"id": "TXN1", "account_id": "ACC", "date": "2025-03-01",
+                                                  "amount": 5, "type": "expense"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+import api.routes as routes
+import database.db as db
+
+
+def spend(client, headers, id, amount):
+    response = client.post('/transactions', json={"id": id, "account_id": "ACC", "date": "2025-03-10",
+                                                  "amount": amount, "type": "expense", "category": "Food"},
+                           headers=headers)
+    assert response.status_code == 201
+
+
+def test_backup_covers_main_and_every_user_database(client, login, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_USERNAMES", ("root",))
+    admin = login("root")
+    users = {name: login(name) for name in ("alice", "bob")}
+    for headers in users.values():
+        client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+
+    response = client.post('/admin/backup', json={"id": "eom"}, headers=admin)
+    assert response.status_code == 201
+    report = response.get_json()
+    databases = {database["database"]: database for database in report["databases"]}
+    user_ids = {name: db.get_user_by_username(name)["id"] for name in ("root", "alice", "bob")}
+    assert set(databases) == {"finance"} | {f"user_{user_id}" for user_id in user_ids.values()}
+
+    # The main copy has the users and tokens
+    main = sqlite3.connect(os.path.join(databases["finance"]["path"], "finance.db"))
+    assert {row[0] for row in main.execute("SELECT username FROM users")} == {"root", "alice", "bob"}
+    main.close()
+
+    # Every user sees the backup and can't reuse its id
+    assert [backup["id"] for backup in client.get('/backups', headers=users["bob"]).get_json()] == ["eom"]
+    assert client.post('/admin/backup', json={"id": "eom"}, headers=admin).status_code == 400
+
+    response = client.post('/admin/backup', json={"id": "solo", "user": "alice"}, headers=admin)
+    assert [database["database"] for database in response.get_json()["databases"]] == [f"user_{user_ids['alice']}"]
+    assert client.get('/backups', headers=users["bob"]).get_json()[0]["id"] == "eom"
+    assert client.post('/admin/backup', json={"user": "nobody"}, headers=admin).status_code == 400
+
+
+def test_snapshot_reads_the_data_as_of_the_backup(client, login, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_USERNAMES", ("root",))
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    spend(client, headers, "T1", 40)
+    spend(client, headers, "T2", 60)
+    assert client.post('/admin/backup', json={"id": "march"}, headers=login("root")).status_code == 201
+
+    spend(client, headers, "T3", 900)
+    client.put('/transactions/T1', json={"amount": 45}, headers=headers)
+
+    live = client.get('/stats/transactions', headers=headers).get_json()
+    assert live["total_transactions"] == 3
+    assert live["expenses"]["sum"] == 1005
+
+    snapshot = client.get('/stats/transactions?snapshot=march', headers=headers).get_json()
+    assert snapshot["total_transactions"] == 2
+    assert snapshot["expenses"]["sum"] == 100
+
+    assert client.get('/stats/transactions?snapshot=april', headers=headers).status_code == 400
@@ -0,0 +1,101 @@
+import io
+
+import database.db as db
+
+
+def seed(client, headers):
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    client.post('/income', json={"id": "I1", "account_id": "ACC", "date": "2025-01-01", "amount": 1000,
+                                 "source": "Salary"}, headers=headers)
+    client.post('/transactions', json={"id": "T1", "account_id": "ACC", "date": "2025-01-15", "amount": 200.25,
+                                       "type": "expense"}, headers=headers)
+    client.post('/transactions', json={"id": "T2", "account_id": "ACC", "date": "2025-02-10", "amount": 50,
+                                       "type": "income"}, headers=headers)
+    client.post('/transactions', json={"id": "T3", "account_id": "ACC", "date": "2025-04-20", "amount": 100,
+                                       "type": "expense"}, headers=headers)
+
+
+def balance(client, headers, as_of):
+    return client.get(f'/accounts/ACC/balance?as_of={as_of}', headers=headers).get_json()["balance"]
+
+
+def history(client, headers, query=''):
+    response = client.get(f'/accounts/ACC/balance_history{query}', headers=headers).get_json()
+    return [(entry["period"], entry["net"], entry["balance"]) for entry in response["history"]]
+
+
+def checkpoints(username):
+    with db.tenant(db.get_user_by_username(username)["id"]):
+        conn = db.get_db_connection()
+        rows = conn.execute("SELECT account_id, month, net, balance FROM account_balance_checkpoints "
+                            "ORDER BY account_id, month").fetchall()
+        db.close_db_connection(conn)
+    return [tuple(row) for row in rows]
+
+
+def test_balance_at_a_date(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    assert balance(client, headers, "2024-12-31") == 0
+    assert balance(client, headers, "2025-01-01") == 1000
+    assert balance(client, headers, "2025-01-14") == 1000
+    assert balance(client, headers, "2025-01-15") == 799.75
+    assert balance(client, headers, "2025-03-31") == 849.75
+    assert balance(client, headers, "2025-12-31") == 749.75
+
+    response = client.get('/accounts/ACC/balance?as_of=2025-02-28', headers=headers).get_json()
+    assert response == {"account_id": "ACC", "as_of": "2025-02-28", "balance": 849.75, "currency": "USD"}
+    assert client.get('/accounts/ACC/balance?as_of=31-01-2025', headers=headers).status_code == 400
+    assert client.get('/accounts/NOPE/balance', headers=headers).status_code == 404
+
+
+def test_balance_history_carries_quiet_months(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    assert history(client, headers) == [("2025-01", 799.75, 799.75), ("2025-02", 50, 849.75),
+                                        ("2025-03", 0, 849.75), ("2025-04", -100, 749.75)]
+    assert history(client, headers, '?from=2025-02&to=2025-03') == [("2025-02", 50, 849.75),
+                                                                     ("2025-03", 0, 849.75)]
+    assert history(client, headers, '?granularity=year') == [("2025", 749.75, 749.75)]
+    assert client.get('/accounts/ACC/balance_history?granularity=week', headers=headers).status_code == 400
+
+
+def test_checkpoints_follow_updates_deletes_and_imports(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    # Move an expense to another month and change its amount
+    client.put('/transactions/T1', json={"date": "2025-03-05", "amount": 300}, headers=headers)
+    assert history(client, headers) == [("2025-01", 1000, 1000), ("2025-02", 50, 1050),
+                                        ("2025-03", -300, 750), ("2025-04", -100, 650)]
+
+    client.delete('/income/I1', headers=headers)
+    client.delete('/transactions?from=2025-04-01', headers=headers)
+    csv = "id,account_id,date,amount,type,category,note\nN1,ACC,2025-05-02,25,expense,Food,\n"
+    client.post('/import/csv', data={"file": (io.BytesIO(csv.encode()), "rows.csv")}, headers=headers,
+                content_type="multipart/form-data")
+    assert balance(client, headers, "2025-12-31") == -275
+    assert history(client, headers, '?from=2025-03') == [("2025-03", -300, -250), ("2025-04", 0, -250),
+                                                         ("2025-05", -25, -275)]
+
+
+def test_rebuild_matches_the_trigger_maintained_checkpoints(client, login):
+    headers = login("alice")
+    seed(client, headers)
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+    client.post('/transactions', json={"id": "J1", "account_id": "JPY", "date": "2024-11-30", "amount": 1500,
+                                       "type": "expense"}, headers=headers)
+    client.put('/transactions/T2', json={"amount": 75}, headers=headers)
+
+    maintained = checkpoints("alice")
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        conn = db.get_db_connection()
+        conn.execute("DELETE FROM account_balance_checkpoints")
+        conn.commit()
+        db.close_db_connection(conn)
+        db.rebuild_balance_checkpoints()
+
+    assert checkpoints("alice") == maintained
+    assert ("JPY", "2024-11", -1500, -1500) in maintained
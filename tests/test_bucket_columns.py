@@ -0,0 +1,80 @@
+import database.db as db
+
+
+def seed(client, headers):
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+    for i, (account, date, amount) in enumerate([("USD", "1970-01-01", 1.5), ("USD", "2024-02-29", 10.25),
+                                                 ("JPY", "2024-02-01", 500), ("USD", "2024-03-01", 2)]):
+        client.post('/transactions', json={"id": f"T{i}", "account_id": account, "date": date, "amount": amount,
+                                           "type": "expense"}, headers=headers)
+    client.post('/income', json={"id": "I1", "account_id": "USD", "date": "2024-02-15", "amount": 99.99},
+                headers=headers)
+
+
+def test_generated_columns_follow_the_date(client, login):
+    headers = login("alice")
+    seed(client, headers)
+    client.put('/transactions/T3', json={"date": "2024-12-31"}, headers=headers)
+
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        conn = db.get_db_connection()
+        rows = conn.execute("SELECT id, month_key, epoch_day FROM transactions ORDER BY id").fetchall()
+        income = conn.execute("SELECT month_key, epoch_day FROM income").fetchone()
+        db.close_db_connection(conn)
+
+    assert [tuple(row) for row in rows] == [("T0", "1970-01", 0), ("T1", "2024-02", 19782),
+                                            ("T2", "2024-02", 19754), ("T3", "2024-12", 20088)]
+    assert tuple(income) == ("2024-02", db.to_epoch_day("2024-02-15"))
+    # The generated columns stay out of API responses
+    assert "month_key" not in client.get('/transactions/T1', headers=headers).get_json()
+    assert "epoch_day" not in client.get('/income', headers=headers).get_json()["income"][0]
+
+
+def test_monthly_totals_group_on_the_indexed_month_key(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        assert db.get_monthly_expense_totals() == [{"month": "1970-01", "total": 1.5},
+                                                   {"month": "2024-02", "total": 510.25},
+                                                   {"month": "2024-03", "total": 2}]
+        assert db.get_monthly_expense_totals(by_currency=True)[1:3] == [
+            {"month": "2024-02", "currency": "JPY", "total": 500},
+            {"month": "2024-02", "currency": "USD", "total": 10.25}]
+        assert db.get_monthly_income_totals() == [{"month": "2024-02", "total": 99.99}]
+
+        conn = db.get_db_connection()
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT month_key, account_id, SUM(amount) FROM transactions "
+            "WHERE type = 'expense' GROUP BY month_key, account_id"))
+        day_plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT epoch_day, SUM(amount) FROM income WHERE epoch_day >= ? GROUP BY 1",
+            (db.to_epoch_day("2024-01-01"),)))
+        db.close_db_connection(conn)
+
+    assert "idx_transactions_month_account" in plan
+    assert "TEMP B-TREE" not in plan
+    assert "idx_income_epoch_day" in day_plan
+
+
+def test_init_db_adds_the_columns_to_older_tables(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        conn = db.get_db_connection()
+        for table in db.LEDGER_TABLES:
+            conn.execute(f"DROP INDEX idx_{table}_month_account")
+            conn.execute(f"DROP INDEX idx_{table}_epoch_day")
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN month_key")
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN epoch_day")
+        conn.commit()
+        db.close_db_connection(conn)
+
+        db.init_db(verbose=False)
+        assert db.get_monthly_expense_totals()[0] == {"month": "1970-01", "total": 1.5}
+
+    series = client.get('/stats/timeseries?granularity=day&from=2024-02-28&to=2024-03-01',
+                        headers=headers).get_json()
+    assert series["series"][0]["values"] == [0, 10.25, 2]
@@ -0,0 +1,85 @@
+import database.db as db
+
+
+def setup_accounts(client, headers):
+    for account_id, currency in (("USD1", "USD"), ("EUR1", "EUR"), ("KWD1", "KWD")):
+        client.post('/accounts', json={"id": account_id, "name": account_id, "currency": currency},
+                    headers=headers)
+
+
+def spend(client, headers, account_id, amount, id, date="2025-03-10", category="Food"):
+    response = client.post('/transactions', json={"id": id, "account_id": account_id, "date": date,
+                                                  "amount": amount, "type": "expense", "category": category},
+                           headers=headers)
+    assert response.status_code == 201
+
+
+def status(client, headers, budget_id):
+    return client.get(f'/budgets/{budget_id}/status?month=2025-03', headers=headers).get_json()
+
+
+def test_budgets_on_all_accounts_count_one_currency(client, login):
+    headers = login("alice")
+    setup_accounts(client, headers)
+    client.post('/budgets', json={"id": "ALL", "name": "All USD", "amount": 100}, headers=headers)
+    client.post('/budgets', json={"id": "EUR", "name": "All EUR", "amount": 100, "currency": "eur"},
+                headers=headers)
+    client.post('/budgets', json={"id": "KWD", "name": "Food KWD", "amount": 10, "currency": "KWD",
+                                  "category": "Food"}, headers=headers)
+
+    spend(client, headers, "USD1", 10.25, "T1")
+    spend(client, headers, "EUR1", 40, "T2")
+    spend(client, headers, "KWD1", 1.005, "T3")
+
+    usd = status(client, headers, "ALL")
+    assert usd["currency"] == "USD"
+    assert usd["spent"] == 10.25
+    assert status(client, headers, "EUR")["spent"] == 40
+    kwd = status(client, headers, "KWD")
+    assert kwd["spent"] == 1.005
+    assert kwd["remaining"] == 8.995
+
+    client.delete('/transactions/T2', headers=headers)
+    assert status(client, headers, "EUR")["spent"] == 0
+
+
+def test_budget_on_an_account_uses_its_currency(client, login):
+    headers = login("alice")
+    setup_accounts(client, headers)
+
+    response = client.post('/budgets', json={"id": "B", "name": "B", "amount": 50, "account_id": "EUR1",
+                                             "currency": "USD"}, headers=headers)
+    assert response.status_code == 400
+
+    response = client.post('/budgets', json={"id": "B", "name": "B", "amount": 50, "account_id": "EUR1"},
+                           headers=headers)
+    assert response.get_json()["currency"] == "EUR"
+
+    spend(client, headers, "KWD1", 2.5, "T1")
+    assert client.put('/budgets/B', json={"currency": "KWD"}, headers=headers).status_code == 400
+    budget = client.get('/budgets/B', headers=headers).get_json()
+    assert budget["currency"] == "EUR"
+
+    # Budgets on all accounts can change currency; the amount is stored at its scale
+    client.post('/budgets', json={"id": "C", "name": "C", "amount": 50}, headers=headers)
+    response = client.put('/budgets/C', json={"currency": "KWD", "amount": 7.125}, headers=headers)
+    assert response.get_json()["currency"] == "KWD"
+    assert response.get_json()["amount"] == 7.125
+    assert status(client, headers, "C")["spent"] == 2.5
+
+
+def test_budgets_without_currency_are_migrated(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "JPY1", "name": "Yen", "currency": "JPY"}, headers=headers)
+    spend(client, headers, "JPY1", 1200, "T1")
+
+    # Budgets on all accounts from before budgets had a currency: 50.00 at the default scale
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        conn = db.get_db_connection()
+        conn.execute("INSERT INTO budgets (id, name, amount) VALUES ('OLD', 'Old', 5000)")
+        conn.commit()
+        db.close_db_connection(conn)
+        db.init_db(verbose=False)
+
+    budget = status(client, headers, "OLD")
+    assert (budget["currency"], budget["amount"], budget["spent"]) == ("JPY", 50, 1200)
@@ -0,0 +1,79 @@
+def seed(client, headers):
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+    for i in range(4):
+        client.post('/transactions', json={"id": f"T{i}", "account_id": "USD" if i % 2 else "JPY",
+                                           "date": f"2025-0{i + 1}-10", "amount": 100 + i, "type": "expense",
+                                           "category": "Food"}, headers=headers)
+        client.post('/income', json={"id": f"I{i}", "account_id": "USD", "date": f"2025-0{i + 1}-01",
+                                     "amount": 1000, "source": "Salary"}, headers=headers)
+
+
+def transactions(client, headers):
+    return {row["id"]: row for row in client.get('/transactions', headers=headers).get_json()["transactions"]}
+
+
+def test_bulk_update_changes_only_matching_rows(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    response = client.patch('/transactions?from=2025-02-01&to=2025-03-31&dry_run=true',
+                            json={"category": "Groceries"}, headers=headers)
+    assert response.get_json() == {"matched": 2, "changed": 0, "dry_run": True}
+    assert {row["category"] for row in transactions(client, headers).values()} == {"Food"}
+
+    response = client.patch('/transactions?from=2025-02-01&to=2025-03-31',
+                            json={"category": "Groceries", "note": "moved"}, headers=headers)
+    assert response.get_json() == {"matched": 2, "changed": 2, "dry_run": False}
+    rows = transactions(client, headers)
+    assert [rows[i]["category"] for i in ("T0", "T1", "T2", "T3")] == ["Food", "Groceries", "Groceries", "Food"]
+    assert rows["T1"]["note"] == "moved"
+
+    # Amounts are scaled to each row's account currency
+    client.patch('/transactions?category=Groceries', json={"amount": 42}, headers=headers)
+    rows = transactions(client, headers)
+    assert (rows["T1"]["amount"], rows["T2"]["amount"]) == (42, 42)
+
+    response = client.patch('/income?account_id=USD&to=2025-02-28', json={"amount": 1500.5}, headers=headers)
+    assert response.get_json()["changed"] == 2
+    assert client.get('/income/I1', headers=headers).get_json()["amount"] == 1500.5
+    assert client.get('/income/I2', headers=headers).get_json()["amount"] == 1000
+
+
+def test_bulk_delete_counts_and_removes_rows(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    response = client.delete('/transactions?account_id=JPY&dry_run=1', headers=headers)
+    assert response.get_json() == {"matched": 2, "changed": 0, "dry_run": True}
+    assert len(transactions(client, headers)) == 4
+
+    response = client.delete('/transactions?account_id=JPY', headers=headers)
+    assert response.get_json() == {"matched": 2, "changed": 2, "dry_run": False}
+    assert sorted(transactions(client, headers)) == ["T1", "T3"]
+
+    assert client.delete('/income?from=2030-01-01', headers=headers).get_json() == \
+        {"matched": 0, "changed": 0, "dry_run": False}
+    assert client.delete('/income?from=2025-03-01', headers=headers).get_json()["changed"] == 2
+    assert client.get('/income', headers=headers).get_json()["count"] == 2
+
+
+def test_bulk_operations_need_filters_and_known_fields(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    response = client.delete('/transactions', headers=headers)
+    assert response.status_code == 400
+    assert "filter" in response.get_json()["error"]
+    assert client.patch('/income', json={"amount": 1}, headers=headers).status_code == 400
+
+    response = client.patch('/transactions?account_id=USD', json={"id": "X"}, headers=headers)
+    assert response.status_code == 400
+    assert "id" in response.get_json()["error"]
+    assert client.patch('/transactions?account_id=USD', json={"amount": -5}, headers=headers).status_code == 400
+    # 0.5 fits USD but not the JPY account either row may belong to
+    assert client.patch('/transactions?type=expense', json={"amount": 0.5}, headers=headers).status_code == 400
+    assert client.patch('/income?account_id=USD', json={"source": None}, headers=headers).status_code == 400
+
+    assert len(transactions(client, headers)) == 4
+    assert {row["amount"] for row in transactions(client, headers).values()} == {100, 101, 102, 103}
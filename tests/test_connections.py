@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database.db as db
+
+
+def writer_is_free():
+    # The writer is per file and per thread; check from another thread
+    result = []
+    lock = db._pool(db.current_database_path(), "write").lock
+
+    def try_acquire():
+        result.append(lock.acquire(timeout=0.5))
+        if result[0]:
+            lock.release()
+
+    thread = threading.Thread(target=try_acquire)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_databases_run_in_wal_mode_with_read_only_readers(client, login):
+    login("alice")
+    for scope in (db.main_database(), db.tenant(db.get_user_by_username("alice")["id"])):
+        with scope:
+            reader = db.get_read_connection()
+            try:
+                assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+                with pytest.raises(sqlite3.OperationalError, match="readonly"):
+                    reader.execute("INSERT INTO categories (name) VALUES ('Food')")
+            finally:
+                db.close_db_connection(reader)
+
+            # Returned readers are kept for the next caller
+            assert db.get_read_connection() is reader
+            db.close_db_connection(reader)
+
+
+def test_readers_see_the_last_commit_while_a_write_is_open(client):
+    db.create_account("ACC", "Main", "USD")
+    writer = db.get_db_connection()
+    try:
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("UPDATE accounts SET name = 'Renamed' WHERE id = 'ACC'")
+
+        # Not blocked by the open write, and not shown its uncommitted change
+        result = []
+        thread = threading.Thread(target=lambda: result.append(db.get_account("ACC")["name"]))
+        thread.start()
+        thread.join(timeout=5)
+        assert result == ["Main"]
+
+        writer.commit()
+    finally:
+        db.close_db_connection(writer)
+    assert db.get_account("ACC")["name"] == "Renamed"
+
+
+def test_nested_writer_acquires_share_one_connection(client):
+    outer = db.get_db_connection()
+    try:
+        inner = db.get_db_connection()
+        assert inner is outer
+        db.close_db_connection(inner)
+        assert not writer_is_free()
+
+        outer.execute("INSERT INTO categories (name) VALUES ('Food')")
+    finally:
+        db.close_db_connection(outer)
+
+    # Released at the outermost close, and what was not committed is rolled back
+    assert writer_is_free()
+    assert db.get_categories() == []
+
+
+def test_failed_writes_hand_the_writer_back(client):
+    db.create_account("ACC", "Main", "USD")
+    db.create_transaction("T1", "ACC", "2025-01-01", 5.0, "expense")
+
+    for write in (lambda: db.create_transaction("T1", "ACC", "2025-01-02", 5.0, "expense"),
+                  lambda: db.bulk_insert_transactions([("T1", "ACC", "2025-01-02", 5.0, "expense", None, None)]),
+                  lambda: db.create_account("ACC", "Again", "USD")):
+        with pytest.raises(ValueError):
+            write()
+        assert writer_is_free()
+
+    with db.snapshot(db.DATABASE_PATH):
+        with pytest.raises(ValueError, match="read-only"):
+            db.get_db_connection()
@@ -0,0 +1,102 @@
+import csv
+import gzip
+import io
+import json
+
+import database.db as db
+
+
+def add_ledger(client, headers, account_id, count):
+    client.post('/accounts', json={"id": account_id, "name": account_id, "currency": "USD"}, headers=headers)
+    for i in range(count):
+        response = client.post('/transactions', json={
+            "id": f"{account_id}-{i}", "account_id": account_id, "date": f"2025-01-{i + 1:02d}",
+            "amount": 10 + i, "type": "expense", "category": "Food"
+        }, headers=headers)
+        assert response.status_code == 201
+
+
+def test_export_streams_from_each_users_database(client, login):
+    # Legacy rows in the main database must never reach a user's export
+    db.create_account("LEGACY", "Legacy", "USD")
+    db.create_transaction("LEGACY-TX", "LEGACY", "2025-01-01", 1.0, "expense", note="secret main data")
+
+    alice = login("alice")
+    bob = login("bob")
+    add_ledger(client, alice, "ALICE", 12)
+    add_ledger(client, bob, "BOB", 3)
+
+    response = client.get('/export/transactions?format=csv', headers=alice)
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert response.status_code == 200
+    assert len(rows) == 12
+    assert {row["account_id"] for row in rows} == {"ALICE"}
+
+    response = client.get('/export/transactions?format=ndjson', headers=bob)
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    assert len(rows) == 3
+    assert {row["account_id"] for row in rows} == {"BOB"}
+    assert "secret main data" not in response.get_data(as_text=True)
+
+
+def test_gzip_export_reads_the_users_database(client, login):
+    alice = login("alice")
+    add_ledger(client, alice, "ALICE", 4)
+
+    response = client.get('/export/transactions?format=csv&gzip=1', headers=alice)
+    text = gzip.decompress(response.get_data()).decode()
+    assert len(list(csv.DictReader(io.StringIO(text)))) == 4
+
+
+def test_csv_export_has_a_header_and_filters(client, login):
+    alice = login("alice")
+    add_ledger(client, alice, "ALICE", 6)
+    client.post('/transactions', json={"id": "RENT", "account_id": "ALICE", "date": "2025-01-03",
+                                       "amount": 900.5, "type": "expense", "category": "Rent"}, headers=alice)
+
+    response = client.get('/export/transactions?format=csv&from=2025-01-02&to=2025-01-04', headers=alice)
+    assert response.headers["Content-Disposition"] == "attachment; filename=transactions.csv"
+    reader = csv.DictReader(io.StringIO(response.get_data(as_text=True)))
+    rows = list(reader)
+    assert tuple(reader.fieldnames) == db.TRANSACTION_COLUMNS
+    assert sorted(row["id"] for row in rows) == ["ALICE-1", "ALICE-2", "ALICE-3", "RENT"]
+    assert next(row for row in rows if row["id"] == "RENT")["amount"] == "900.5"
+
+    response = client.get('/export/transactions?format=ndjson&category=Rent', headers=alice)
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert rows == [dict(rows[0], id="RENT", amount=900.5, category="Rent")]
+
+
+def test_income_export_and_gzipped_ndjson(client, login):
+    alice = login("alice")
+    client.post('/accounts', json={"id": "ALICE", "name": "Alice", "currency": "USD"}, headers=alice)
+    for i, source in enumerate(["Salary", "Salary", "Gift"]):
+        client.post('/income', json={"id": f"INC{i}", "account_id": "ALICE", "date": f"2025-02-0{i + 1}",
+                                     "amount": 100 + i, "source": source}, headers=alice)
+
+    response = client.get('/export/income?format=ndjson&source=Salary&gzip=true', headers=alice)
+    assert response.mimetype == "application/gzip"
+    assert response.headers["Content-Disposition"] == "attachment; filename=income.ndjson.gz"
+    rows = [json.loads(line) for line in gzip.decompress(response.get_data()).decode().splitlines()]
+    assert [(row["id"], row["amount"]) for row in rows] == [("INC1", 101), ("INC0", 100)]
+    assert set(rows[0]) == set(db.INCOME_COLUMNS)
+
+
+def test_export_streams_in_chunks(client, login):
+    alice = login("alice")
+    add_ledger(client, alice, "ALICE", 7)
+
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        chunks = list(db.iter_transactions_by_date_range(chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row[0] for chunk in chunks for row in chunk] == [f"ALICE-{i}" for i in range(6, -1, -1)]
+
+
+def test_export_rejects_unknown_formats_and_bad_filters(client, login):
+    alice = login("alice")
+
+    response = client.get('/export/transactions?format=xml', headers=alice)
+    assert response.status_code == 400
+    assert client.get('/export/income?format=json', headers=alice).status_code == 400
+    assert client.get('/export/transactions?from=2025-13-01', headers=alice).status_code == 400
+    assert client.get('/export/transactions').status_code == 401
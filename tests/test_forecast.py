@@ -0,0 +1,163 @@
+import numpy as np
+
+from services import ForecastService
+from services.forecast_models import MODELS
+
+
+def income_history(values):
+    return [{"month": str(month), "total": float(value)}
+            for month, value in zip(np.arange(np.datetime64("2020-01"), np.datetime64("2020-01") + len(values)),
+                                    values)]
+
+
+def test_model_info_describes_the_chosen_model(monkeypatch):
+    ForecastService._fit_cache.clear()
+
+    # A strong 12-month season, where Holt-Winters or a seasonal model wins
+    season = np.array([100, 120, 90, 300, 80, 110, 95, 400, 105, 85, 130, 500], dtype=float)
+    history = income_history(np.tile(season, 3) + np.arange(36))
+    monkeypatch.setattr(ForecastService, "monthly_totals", staticmethod(lambda fetch, base_currency=None: history))
+
+    for model in ("linear", "linear_seasonal", "holt_winters", "seasonal_naive"):
+        info = ForecastService.get_income_forecast(3, model=model)["model_info"]
+        assert info["model"] == model
+        if model in ("linear", "linear_seasonal"):
+            assert "slope" in info and "intercept" in info
+        else:
+            assert "slope" not in info and "intercept" not in info
+            assert model in info["interpretation"]
+
+    linear = ForecastService.get_income_forecast(3, model="linear")["model_info"]
+    seasonal = ForecastService.get_income_forecast(3, model="linear_seasonal")["model_info"]
+    assert seasonal["r_squared"] > linear["r_squared"]
+
+    # The linear model's slope is the least-squares trend of the history
+    y = np.array([row["total"] for row in history])
+    assert linear["slope"] == round(float(np.polyfit(np.arange(len(y)), y, 1)[0]), 2)
+
+
+def rolling_mae(name, y, first_origin, horizon):
+    errors = []
+    for origin in range(first_origin, len(y)):
+        steps = min(horizon, len(y) - origin)
+        _, forecast = MODELS[name][0](y[:origin], steps, 0)
+        errors.append(np.abs(y[origin:origin + steps] - forecast))
+    return round(float(np.concatenate(errors).mean()), 2)
+
+
+def test_candidates_are_backtested_on_the_same_origins():
+    y = np.random.default_rng(7).normal(100, 20, 30) + np.tile([0, 0, 50, 0, 0, 0, 0, 0, 0, 0, 0, 80], 3)[:30]
+
+    # Every model is scored from the first origin Holt-Winters can fit
+    _, _, scores = ForecastService.select_model(y, 3, 0)
+    assert set(scores) == set(MODELS)
+    for name in MODELS:
+        assert scores[name] == rolling_mae(name, y, MODELS["holt_winters"][1], 3)
+
+    # With 24 months Holt-Winters has no month left to score, so the others
+    # are compared from the first origin linear_seasonal can fit
+    _, _, scores = ForecastService.select_model(y[:24], 3, 0)
+    assert set(scores) == {"linear", "seasonal_naive", "linear_seasonal"}
+    assert scores["linear"] == rolling_mae("linear", y[:24], MODELS["linear_seasonal"][1], 3)
+
+
+def test_category_forecast_fits_each_series_like_polyfit(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "CARD", "name": "Card", "currency": "USD"}, headers=headers)
+    food = [120, 135, 150, 0, 170, 182.5]
+    rent = [900, 900, 950, 950, 1000, 1000]
+    for i, (f, r) in enumerate(zip(food, rent)):
+        if f:
+            client.post('/transactions', json={"id": f"F{i}", "account_id": "CARD", "date": f"2025-0{i + 1}-10",
+                                               "amount": f, "type": "expense", "category": "Food"}, headers=headers)
+        client.post('/transactions', json={"id": f"R{i}", "account_id": "ACC", "date": f"2025-0{i + 1}-01",
+                                           "amount": r, "type": "expense", "category": "Rent"}, headers=headers)
+
+    forecast = client.get('/stats/category_forecast?months=2', headers=headers).get_json()
+    assert forecast["history_months"] == [f"2025-0{i}" for i in range(1, 7)]
+    assert forecast["forecast_months"] == ["2025-07", "2025-08"]
+    series = {entry["key"]: entry for entry in forecast["series"]}
+    assert sorted(series) == ["Food", "Rent"]
+
+    x = np.arange(6)
+    for key, y in (("Food", food), ("Rent", rent)):
+        slope, intercept = np.polyfit(x, y, 1)
+        assert series[key]["history"] == y
+        assert series[key]["slope"] == round(float(slope), 2)
+        assert series[key]["intercept"] == round(float(intercept), 2)
+        assert series[key]["forecast"] == [round(float(intercept + slope * m), 2) for m in (6, 7)]
+        assert series[key]["r_squared"] == round(float(np.corrcoef(x, y)[0, 1] ** 2), 4)
+
+    by_account = client.get('/stats/category_forecast?group_by=account', headers=headers).get_json()
+    assert {entry["key"]: entry["history"] for entry in by_account["series"]} == {"ACC": rent, "CARD": food}
+
+
+def test_category_forecast_needs_two_months_and_valid_arguments(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    client.post('/income', json={"id": "I1", "account_id": "ACC", "date": "2025-01-01", "amount": 10,
+                                 "source": "Salary"}, headers=headers)
+
+    forecast = client.get('/stats/category_forecast?metric=income', headers=headers).get_json()
+    assert forecast["series"] == []
+    assert "at least 2 months" in forecast["error"]
+
+    assert client.get('/stats/category_forecast?metric=net', headers=headers).status_code == 400
+    assert client.get('/stats/category_forecast?group_by=note', headers=headers).status_code == 400
+    assert client.get('/stats/category_forecast?months=13', headers=headers).status_code == 400
+
+
+def test_bootstrap_intervals_match_refitting_each_replicate():
+    ForecastService._fit_cache.clear()
+    rng = np.random.default_rng(3)
+    y = 500 + 12 * np.arange(24) + rng.normal(0, 40, 24)
+    months = np.arange(np.datetime64("2023-01"), np.datetime64("2025-01"))
+    fit = ForecastService.fit_series(y, months, 3, model="linear")
+
+    intervals = ForecastService.bootstrap_intervals(y, fit, 400, np.random.default_rng(11))
+
+    # The same resampling, one np.polyfit per replicate
+    draws = np.random.default_rng(11)
+    residuals = y - fit["fitted"]
+    residuals = residuals - residuals.mean()
+    history = draws.integers(0, 24, (400, 24))
+    noise = draws.integers(0, 24, (400, 3))
+    paths = np.array([np.polyval(np.polyfit(np.arange(24), fit["fitted"] + residuals[h], 1), np.arange(24, 27))
+                      for h in history]) + residuals[noise]
+    for level in (80, 95):
+        tail = (100 - level) / 2
+        lower, upper = intervals[level]
+        np.testing.assert_allclose(lower, np.percentile(paths, tail, axis=0))
+        np.testing.assert_allclose(upper, np.percentile(paths, 100 - tail, axis=0))
+        assert np.all(lower <= fit["forecast"]) and np.all(fit["forecast"] <= upper)
+
+    assert np.all(intervals[95][0] < intervals[80][0]) and np.all(intervals[80][1] < intervals[95][1])
+
+
+def test_forecast_intervals_in_the_api(client, login, monkeypatch):
+    ForecastService._fit_cache.clear()
+    headers = login("alice")
+    season = np.array([100, 120, 90, 300, 80, 110, 95, 400, 105, 85, 130, 500], dtype=float)
+    history = income_history(np.tile(season, 2) + np.arange(24) * 3)
+    monkeypatch.setattr(ForecastService, "monthly_totals", staticmethod(lambda fetch, base_currency=None: history))
+
+    for model in ("linear", "seasonal_naive"):
+        forecast = client.get(f'/stats/income_forecast?months=4&model={model}&intervals=true&replicates=500',
+                              headers=headers).get_json()["forecast"]
+        assert len(forecast) == 4
+        for row in forecast:
+            assert 0 <= row["lower_95"] <= row["lower_80"] <= row["predicted_income"]
+            assert row["predicted_income"] <= row["upper_80"] <= row["upper_95"]
+
+    forecast = client.get('/stats/income_forecast?months=2', headers=headers).get_json()["forecast"]
+    assert "lower_80" not in forecast[0]
+    assert client.get('/stats/income_forecast?intervals=true&replicates=10', headers=headers).status_code == 400
+    assert client.get('/stats/expense_forecast?intervals=1&replicates=999999', headers=headers).status_code == 400
+
+    # A perfect fit has nothing to resample
+    fit = ForecastService.fit_series(np.arange(12.0), np.arange(np.datetime64("2024-01"), np.datetime64("2025-01")),
+                                     2, model="linear")
+    lower, upper = ForecastService.bootstrap_intervals(np.arange(12.0), fit, 200)[95]
+    np.testing.assert_allclose(lower, [12, 13])
+    np.testing.assert_allclose(upper, [12, 13])
@@ -0,0 +1,66 @@
+import io
+
+import api.routes as routes
+
+
+def import_rates(client, login, monkeypatch, rates):
+    monkeypatch.setattr(routes, "ADMIN_USERNAMES", ("root",))
+    response = client.post('/fx/rates/import', data={"file": (io.BytesIO(rates.encode()), "rates.csv")},
+                           headers=login("root"), content_type="multipart/form-data")
+    assert response.status_code == 201
+
+
+def dollar_and_yen_accounts(client, headers):
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+
+
+def test_simulation_converts_history_and_balances(client, login, monkeypatch):
+    # 150 yen to the dollar throughout
+    import_rates(client, login, monkeypatch, "date,currency,rate\n2025-01-02,USD,1.0\n2025-01-02,JPY,150\n")
+    headers = login("alice")
+    dollar_and_yen_accounts(client, headers)
+    for month in ("01", "02", "03"):
+        client.post('/income', json={"id": f"I{month}", "account_id": "USD", "date": f"2025-{month}-05",
+                                     "amount": 1000, "source": "Salary"}, headers=headers)
+        client.post('/transactions', json={"id": f"T{month}", "account_id": "JPY", "date": f"2025-{month}-10",
+                                           "amount": 15000, "type": "expense", "category": "Rent"},
+                    headers=headers)
+
+    body = {"months": 3, "paths": 50, "method": "normal", "seed": 1}
+    result = client.post('/stats/simulate?base_currency=USD', json=body, headers=headers).get_json()
+    assert result["base_currency"] == "USD"
+    # 3000 dollars less 45000 yen, then 1000 dollars in and 15000 yen out a month
+    assert result["starting_balance"] == 2700
+    assert result["mean"] == [3600, 4500, 5400]
+    assert {s["key"]: s["monthly_mean"] for s in result["series"]} == {"Rent": 100, "Salary": 1000}
+
+    assert client.post('/stats/simulate?base_currency=XX', json=body, headers=headers).status_code == 400
+    assert client.post('/stats/simulate?base_currency=GBP', json=body, headers=headers).status_code == 400
+
+
+def test_recurring_projection_converts_each_occurrence(client, login, monkeypatch):
+    # The yen weakens from 100 to 200 to the dollar in February
+    import_rates(client, login, monkeypatch, "date,currency,rate\n2026-01-02,USD,1.0\n2026-01-02,JPY,100\n"
+                                             "2026-02-02,USD,1.0\n2026-02-02,JPY,200\n")
+    headers = login("alice")
+    dollar_and_yen_accounts(client, headers)
+    for schedule in ({"id": "PAY", "target": "income", "account_id": "USD", "amount": 1000},
+                     {"id": "RENT", "target": "transactions", "type": "expense", "account_id": "JPY",
+                      "amount": 20000}):
+        response = client.post('/recurring', json={"name": schedule["id"], "frequency": "monthly",
+                                                   "day_of_month": 1, "start_date": "2026-01-01", **schedule},
+                               headers=headers)
+        assert response.status_code == 201
+
+    projection = client.get('/stats/recurring_projection?months=3&from=2026-01&base_currency=USD',
+                            headers=headers).get_json()
+    assert projection["base_currency"] == "USD"
+    assert projection["income"] == [1000, 1000, 1000]
+    assert projection["expense"] == [200, 100, 100]
+    assert {s["id"]: s["total"] for s in projection["schedules"]} == {"PAY": 3000, "RENT": 400}
+
+    # Without a base currency each amount stays in its own currency
+    projection = client.get('/stats/recurring_projection?months=1&from=2026-01', headers=headers).get_json()
+    assert projection["base_currency"] is None
+    assert projection["expense"] == [20000]
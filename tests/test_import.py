@@ -0,0 +1,118 @@
+import io
+
+import database.db as db
+from services import ImportService
+
+
+def upload(client, headers, text, **values):
+    data = {"file": (io.BytesIO(text.encode()), "rows.csv"), **values}
+    return client.post('/import/csv', data=data, headers=headers, content_type="multipart/form-data")
+
+
+def setup_accounts(client, headers):
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+
+
+def test_amounts_finer_than_the_currency_are_reported_per_row(client, login):
+    headers = login("alice")
+    setup_accounts(client, headers)
+    rows = ["id,account_id,date,amount,type,category,note",
+            "T1,USD,2025-01-02,10.07,expense,Food,",
+            "T2,USD,2025-01-03,10.000000001,expense,Food,",
+            "T3,USD,2025-01-04,10.100,expense,Food,",
+            "T4,JPY,2025-01-05,500.5,expense,Food,",
+            "T5,JPY,2025-01-06,1e3,expense,Food,"]
+
+    # Row by row through the chunks, with the bad rows in between
+    response = upload(client, headers, "\n".join(rows) + "\n")
+    assert response.status_code == 201
+    report = response.get_json()
+    assert report["imported"] == 3
+    assert [(error["id"], error["line"]) for error in report["errors"]] == [("T2", 3), ("T4", 5)]
+    assert all("decimal places" in error["error"] for error in report["errors"])
+
+    amounts = {row["id"]: row["amount"] for row in client.get('/transactions', headers=headers)
+               .get_json()["transactions"]}
+    assert amounts == {"T1": 10.07, "T3": 10.1, "T5": 1000}
+
+
+def test_import_reads_in_chunks_and_rejects_bad_rows(client, login):
+    headers = login("alice")
+    setup_accounts(client, headers)
+    rows = ["id,account_id,date,amount,type,category,note",
+            "A1,USD,2025-01-02,5,expense,Food,lunch",
+            "A2,NOPE,2025-01-02,5,expense,Food,",
+            "A3,USD,2025-13-02,5,expense,Food,",
+            "A4,USD,2025-01-04,-5,expense,Food,",
+            "A5,USD,2025-01-05,5,transfer,Food,",
+            "A1,USD,2025-01-06,6,expense,Food,",
+            ",USD,2025-01-07,7,expense,Food,",
+            "A8,USD,2025-01-08,8,income,Refund,"]
+
+    # Chunks of two rows: the repeated A1 is caught against the committed first chunk
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        report = ImportService.import_csv(io.StringIO("\n".join(rows) + "\n"), chunk_size=2)
+    assert report["rows_read"] == 8
+    assert report["imported"] == 2
+    assert [error["error"] for error in report["errors"]] == [
+        "Unknown account", "Invalid date", "Amount must be positive", "Type must be 'expense' or 'income'",
+        "ID already exists", "Missing id"
+    ]
+
+    # Importing the same file again only finds existing ids
+    report = upload(client, headers, "\n".join(rows) + "\n").get_json()
+    assert report["imported"] == 0
+
+
+def test_import_skips_exact_duplicates_and_reports_nearby_ones(client, login):
+    headers = login("alice")
+    setup_accounts(client, headers)
+    client.post('/transactions', json={"id": "OLD1", "account_id": "USD", "date": "2025-03-10", "amount": 12.5,
+                                       "type": "expense", "category": "Food", "note": "Coffee Shop #12"},
+                headers=headers)
+    client.post('/transactions', json={"id": "OLD2", "account_id": "JPY", "date": "2025-03-10", "amount": 800,
+                                       "type": "expense", "category": "Food"}, headers=headers)
+    rows = ["id,account_id,date,amount,type,category,note",
+            # Same account, day, amount and note once normalized
+            "N1,USD,2025-03-10,12.50,expense,Food,  coffee shop 12!",
+            # Same account and amount, two days later
+            "N2,USD,2025-03-12,12.5,expense,Food,",
+            # Outside the window, other amount, other account
+            "N3,USD,2025-03-20,12.5,expense,Food,",
+            "N4,USD,2025-03-10,12.51,expense,Food,coffee shop 12",
+            "N5,JPY,2025-03-11,800,expense,Food,",
+            "N6,USD,2025-03-11,800,expense,Food,"]
+
+    report = upload(client, headers, "\n".join(rows) + "\n").get_json()
+    assert report["exact_duplicates"] == 1
+    assert report["imported"] == 5
+    assert report["errors"] == [{"line": 2, "id": "N1", "error": "Duplicate of 'OLD1'"}]
+    assert report["possible_duplicates"] == [
+        {"line": 3, "id": "N2", "existing_id": "OLD1", "days_apart": 2},
+        {"line": 6, "id": "N5", "existing_id": "OLD2", "days_apart": 1},
+    ]
+
+
+def test_import_window_and_keep_duplicates(client, login):
+    headers = login("alice")
+    setup_accounts(client, headers)
+    client.post('/transactions', json={"id": "OLD1", "account_id": "USD", "date": "2025-03-10", "amount": 5,
+                                       "type": "expense"}, headers=headers)
+    rows = ["id,account_id,date,amount,type,category,note",
+            "N1,USD,2025-03-10,5,expense,,",
+            "N2,USD,2025-03-15,5,expense,,"]
+
+    report = upload(client, headers, "\n".join(rows) + "\n", skip_duplicates="false", window_days="5").get_json()
+    assert report["exact_duplicates"] == 1
+    assert report["imported"] == 2
+    assert report["possible_duplicates"] == [{"line": 3, "id": "N2", "existing_id": "OLD1", "days_apart": 5}]
+
+    # Rows of the same import are not matched against each other
+    rows = ["id,account_id,date,amount,type,category,note",
+            "A1,USD,2025-06-01,7,expense,,",
+            "A2,USD,2025-06-01,7,expense,,"]
+    report = upload(client, headers, "\n".join(rows) + "\n").get_json()
+    assert report["imported"] == 2
+    assert report["exact_duplicates"] == 0
+    assert report["possible_duplicates"] == []
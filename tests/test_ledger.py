@@ -0,0 +1,68 @@
+def seed(client, headers):
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "SAV", "name": "Savings", "currency": "USD"}, headers=headers)
+    # Many entries share a date, and the same id is used in both tables
+    dates = ["2025-01-01", "2025-01-02", "2025-01-02", "2025-01-02", "2025-01-03", "2025-01-02", "2025-01-01"]
+    for i, date in enumerate(dates):
+        client.post('/transactions', json={"id": f"E{i}", "account_id": "ACC" if i % 3 else "SAV", "date": date,
+                                           "amount": 10 + i, "type": "expense",
+                                           "category": "Food" if i % 2 else "Rent"}, headers=headers)
+    for i, date in enumerate(dates[:4]):
+        client.post('/income', json={"id": f"E{i}", "account_id": "ACC", "date": date, "amount": 100 + i,
+                                     "source": "Salary"}, headers=headers)
+
+
+def page_through(client, headers, query, limit):
+    entries = []
+    cursor = None
+    while True:
+        url = f'/ledger?limit={limit}{query}' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url, headers=headers).get_json()
+        assert page["count"] == len(page["entries"]) <= limit
+        entries.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return entries
+
+
+def test_ledger_pages_are_ordered_without_gaps_or_repeats(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    everything = client.get('/ledger?limit=1000', headers=headers).get_json()
+    assert everything["count"] == 11
+    assert everything["next_cursor"] is None
+    keys = [(entry["date"], entry["record_type"], entry["id"]) for entry in everything["entries"]]
+    assert keys == sorted(keys, reverse=True)
+    assert keys[:3] == [("2025-01-03", "transaction", "E4"), ("2025-01-02", "transaction", "E5"),
+                        ("2025-01-02", "transaction", "E3")]
+
+    for limit in (1, 2, 3, 4, 10, 11):
+        assert page_through(client, headers, '', limit) == everything["entries"]
+
+
+def test_ledger_entries_and_filters(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    entries = page_through(client, headers, '&account_id=ACC&from=2025-01-02&to=2025-01-02', 2)
+    assert [(entry["record_type"], entry["id"]) for entry in entries] == [
+        ("transaction", "E5"), ("transaction", "E2"), ("transaction", "E1"),
+        ("income", "E3"), ("income", "E2"), ("income", "E1")]
+    assert entries[-1] == {"record_type": "income", "id": "E1", "account_id": "ACC", "date": "2025-01-02",
+                           "amount": 101, "type": "income", "category": "Salary", "note": None}
+
+    entries = page_through(client, headers, '&type=expense&category=Food', 2)
+    assert sorted(entry["id"] for entry in entries) == ["E1", "E3", "E5"]
+    assert {entry["record_type"] for entry in entries} == {"transaction"}
+    entries = page_through(client, headers, '&type=income', 3)
+    assert [entry["id"] for entry in entries] == ["E3", "E2", "E1", "E0"]
+
+
+def test_ledger_rejects_bad_cursors_and_limits(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    assert client.get('/ledger?cursor=not-a-cursor', headers=headers).status_code == 400
+    assert client.get('/ledger?limit=0', headers=headers).status_code == 400
+    assert client.get('/ledger?limit=1001', headers=headers).status_code == 400
@@ -0,0 +1,72 @@
+import database.db as db
+
+
+def seed(client, headers):
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    for i, (date, category) in enumerate([("2025-01-05", "Food"), ("2025-02-10", "Rent"), ("2025-03-15", "Food")]):
+        client.post('/transactions', json={"id": f"TXN{i}", "account_id": "ACC", "date": date, "amount": 10.25 + i,
+                                           "type": "expense", "category": category}, headers=headers)
+        client.post('/income', json={"id": f"INC{i}", "account_id": "ACC", "date": date,
+                                     "amount": 100 + i, "source": "Salary"}, headers=headers)
+
+
+def test_columnar_listing_matches_the_row_listing(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    rows = client.get('/transactions', headers=headers).get_json()["transactions"]
+    columnar = client.get('/transactions?format=columnar', headers=headers).get_json()
+    assert columnar["count"] == 3
+    assert columnar["columns"] == list(db.TRANSACTION_COLUMNS)
+    assert columnar["data"] == {column: [row[column] for row in rows] for column in columnar["columns"]}
+
+    columnar = client.get('/income?format=columnar&from=2025-02-01', headers=headers).get_json()
+    assert columnar["count"] == 2
+    assert columnar["data"]["id"] == ["INC2", "INC1"]
+    assert columnar["data"]["amount"] == [102, 101]
+
+
+def test_columnar_listing_filters_and_rejects_unknown_formats(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    columnar = client.get('/transactions?format=columnar&category=Food&fields=id,amount',
+                          headers=headers).get_json()
+    assert columnar == {"columns": ["id", "amount"], "data": {"id": ["TXN2", "TXN0"], "amount": [12.25, 10.25]},
+                        "count": 2}
+
+    empty = client.get('/income?format=columnar&from=2030-01-01', headers=headers).get_json()
+    assert empty["count"] == 0
+    assert all(values == [] for values in empty["data"].values())
+
+    assert client.get('/transactions?format=table', headers=headers).status_code == 400
+    assert client.get('/income?format=csv', headers=headers).status_code == 400
+
+
+def test_fields_select_columns_on_lists_and_single_records(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    rows = client.get('/transactions?fields=amount,date,amount', headers=headers).get_json()["transactions"]
+    assert rows[0] == {"date": "2025-03-15", "amount": 12.25}
+    rows = client.get('/income?fields=id&from=2025-02-01', headers=headers).get_json()["income"]
+    assert rows == [{"id": "INC2"}, {"id": "INC1"}]
+    rows = client.get('/accounts?fields=id,currency', headers=headers).get_json()["accounts"]
+    assert rows == [{"id": "ACC", "currency": "USD"}]
+
+    assert client.get('/transactions/TXN1?fields=category', headers=headers).get_json() == {"category": "Rent"}
+    assert client.get('/income/INC0?fields=source,amount', headers=headers).get_json() == \
+        {"amount": 100, "source": "Salary"}
+    assert client.get('/accounts/ACC?fields=name', headers=headers).get_json() == {"name": "Main"}
+
+
+def test_unknown_fields_are_rejected(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    response = client.get('/transactions?fields=id,password', headers=headers)
+    assert response.status_code == 400
+    assert "password" in response.get_json()["error"]
+    assert client.get('/income/INC0?fields=category', headers=headers).status_code == 400
+    assert client.get('/accounts?fields=id;DROP TABLE accounts', headers=headers).status_code == 400
+    assert client.get('/accounts', headers=headers).get_json()["count"] == 1
@@ -0,0 +1,119 @@
+import sqlite3
+
+import database.db as db
+
+
+def seed(client, headers):
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    for i, (date, category) in enumerate([("2019-05-01", "Food"), ("2025-01-02", "Food"), ("2025-01-03", "Rent")]):
+        client.post('/transactions', json={"id": f"T{i}", "account_id": "ACC", "date": date, "amount": 10 + i,
+                                           "type": "expense", "category": category}, headers=headers)
+    client.post('/income', json={"id": "I1", "account_id": "ACC", "date": "2025-01-01", "amount": 500,
+                                 "source": "Salary"}, headers=headers)
+    client.post('/budgets', json={"id": "B1", "name": "Eating", "amount": 100, "category": "Food",
+                                  "account_id": "ACC"}, headers=headers)
+
+
+def lookup_ids(client, headers, name):
+    return {row["name"]: row["id"] for row in client.get(f'/{name}', headers=headers).get_json()[name]}
+
+
+def test_a_rename_shows_up_everywhere(client, login):
+    headers = login("alice")
+    seed(client, headers)
+    with db.tenant(db.get_user_by_username("alice")["id"]):
+        db.archive_ledger("2020-01-01")
+
+    categories = lookup_ids(client, headers, "categories")
+    assert sorted(categories) == ["Food", "Rent"]
+    response = client.put(f'/categories/{categories["Food"]}', json={"name": " Groceries "}, headers=headers)
+    assert response.get_json() == {"id": categories["Food"], "name": "Groceries"}
+    sources = lookup_ids(client, headers, "sources")
+    client.put(f'/sources/{sources["Salary"]}', json={"name": "Wages"}, headers=headers)
+
+    rows = client.get('/transactions?category=Groceries', headers=headers).get_json()["transactions"]
+    assert sorted(row["id"] for row in rows) == ["T0", "T1"]
+    assert client.get('/transactions?category=Food', headers=headers).get_json()["count"] == 0
+    assert client.get('/transactions/T0', headers=headers).get_json()["category"] == "Groceries"
+    assert client.get('/income/I1', headers=headers).get_json()["source"] == "Wages"
+    assert client.get('/budgets/B1', headers=headers).get_json()["category"] == "Groceries"
+    assert client.get('/budgets/B1/status?month=2025-01', headers=headers).get_json()["spent"] == 11
+    stats = client.get('/stats/transactions', headers=headers).get_json()
+    assert sorted(stats["by_category"]) == ["Groceries", "Rent"]
+    ledger = client.get('/ledger', headers=headers).get_json()["entries"]
+    assert {(entry["id"], entry["category"]) for entry in ledger} == {
+        ("T0", "Groceries"), ("T1", "Groceries"), ("T2", "Rent"), ("I1", "Wages")}
+    assert "Food" not in client.get('/export/transactions', headers=headers).get_data(as_text=True)
+
+    # Writes with a known name reuse its id; a new name gets one
+    client.post('/transactions', json={"id": "T9", "account_id": "ACC", "date": "2025-02-01", "amount": 5,
+                                       "type": "expense", "category": "Groceries"}, headers=headers)
+    client.put('/transactions/T2', json={"category": "Food"}, headers=headers)
+    assert lookup_ids(client, headers, "categories") == {"Groceries": categories["Food"],
+                                                         "Rent": categories["Rent"], "Food": 3}
+
+
+def test_renames_are_validated(client, login):
+    headers = login("alice")
+    seed(client, headers)
+    categories = lookup_ids(client, headers, "categories")
+
+    response = client.put(f'/categories/{categories["Food"]}', json={"name": "Rent"}, headers=headers)
+    assert response.status_code == 400
+    assert "already exists" in response.get_json()["error"]
+    assert client.put(f'/categories/{categories["Food"]}', json={"name": " "}, headers=headers).status_code == 400
+    assert client.put('/categories/999', json={"name": "Other"}, headers=headers).status_code == 404
+    assert client.put('/sources/999', json={"name": "Other"}, headers=headers).status_code == 404
+    assert lookup_ids(client, headers, "categories") == categories
+
+
+def test_name_columns_are_migrated_to_lookup_ids(client, tmp_path, monkeypatch):
+    # A main database from before the lookup tables, with names on every row
+    path = str(tmp_path / "old.db")
+    monkeypatch.setattr(db, "DATABASE_PATH", path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE accounts (id TEXT PRIMARY KEY, name TEXT NOT NULL, currency TEXT NOT NULL DEFAULT 'USD',
+                               created_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE transactions (id TEXT PRIMARY KEY, account_id TEXT NOT NULL, date TEXT NOT NULL,
+                                   amount REAL NOT NULL, type TEXT NOT NULL, category TEXT, note TEXT,
+                                   created_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE income (id TEXT PRIMARY KEY, account_id TEXT NOT NULL, date TEXT NOT NULL, amount REAL NOT NULL,
+                             source TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE budgets (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, account_id TEXT,
+                              amount REAL NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE budget_spend (budget_id TEXT NOT NULL, month TEXT NOT NULL, spent REAL NOT NULL DEFAULT 0,
+                                   PRIMARY KEY (budget_id, month));
+        CREATE INDEX idx_transactions_category ON transactions(category);
+        INSERT INTO accounts (id, name) VALUES ('ACC', 'Main');
+        INSERT INTO transactions (id, account_id, date, amount, type, category) VALUES
+            ('T1', 'ACC', '2025-01-02', 12.5, 'expense', 'Food'), ('T2', 'ACC', '2025-01-03', 7, 'expense', 'Food'),
+            ('T3', 'ACC', '2025-01-04', 900, 'expense', 'Rent'), ('T4', 'ACC', '2025-01-05', 3, 'income', NULL);
+        INSERT INTO income (id, account_id, date, amount, source) VALUES ('I1', 'ACC', '2025-01-01', 2000, 'Salary');
+        INSERT INTO budgets (id, name, category, account_id, amount) VALUES ('B1', 'Eating', 'Food', 'ACC', 50);
+        INSERT INTO budget_spend VALUES ('B1', '2025-01', 19.5);
+    """)
+    conn.commit()
+    conn.close()
+
+    db.init_db(verbose=False)
+
+    conn = sqlite3.connect(path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+    stored = conn.execute("SELECT id, category_id FROM transactions ORDER BY id").fetchall()
+    conn.close()
+    assert "category" not in columns and "category_id" in columns
+    assert [name for _, name in sorted((row["id"], row["name"]) for row in db.get_categories())] == ["Food", "Rent"]
+    food = next(row["id"] for row in db.get_categories() if row["name"] == "Food")
+    assert stored[:2] == [("T1", food), ("T2", food)] and stored[3] == ("T4", None)
+
+    assert {row["id"]: row["category"] for row in db.get_all_transactions()} == {
+        "T1": "Food", "T2": "Food", "T3": "Rent", "T4": None}
+    assert db.get_all_income()[0]["source"] == "Salary"
+    assert db.get_budget("B1")["category"] == "Food"
+    assert db.get_budget_status("2025-01", "B1")[0]["spent"] == 19.5
+    assert len(db.get_transactions_by_date_range(category="Food")) == 2
+
+    # Running init_db again leaves the migrated database alone
+    db.init_db(verbose=False)
+    assert len(db.get_categories()) == 2
@@ -0,0 +1,177 @@
+import database.db as db
+
+
+def raw_schedules(user_id):
+    with db.tenant(user_id):
+        conn = db.get_read_connection()
+        conn.row_factory = None
+        try:
+            return conn.execute("SELECT id, amount, typeof(amount), category_id, source_id "
+                                "FROM recurring_schedules ORDER BY id").fetchall()
+        finally:
+            db.close_db_connection(conn)
+
+
+def test_schedules_store_minor_units_and_lookup_ids(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "KWD", "name": "Kuwait", "currency": "KWD"}, headers=headers)
+    for schedule in ({"id": "RENT", "target": "transactions", "type": "expense", "account_id": "USD",
+                      "amount": 1200.55, "category": "Housing"},
+                     {"id": "PAY", "target": "income", "account_id": "KWD", "amount": 850.125,
+                      "category": "Salary"}):
+        response = client.post('/recurring', json={"name": schedule["id"], "frequency": "monthly",
+                                                   "day_of_month": 1, "start_date": "2025-01-01", **schedule},
+                               headers=headers)
+        assert response.status_code == 201
+        assert response.get_json()["amount"] == schedule["amount"]
+        assert response.get_json()["category"] == schedule["category"]
+
+    categories = {row["name"]: row["id"] for row in client.get('/categories', headers=headers).get_json()["categories"]}
+    sources = {row["name"]: row["id"] for row in client.get('/sources', headers=headers).get_json()["sources"]}
+    user_id = db.get_user_by_username("alice")["id"]
+    assert raw_schedules(user_id) == [("PAY", 850125, "integer", None, sources["Salary"]),
+                                      ("RENT", 120055, "integer", categories["Housing"], None)]
+
+    response = client.put('/recurring/RENT', json={"amount": 1250, "category": "Home"}, headers=headers)
+    assert response.get_json()["amount"] == 1250
+    assert response.get_json()["category"] == "Home"
+    assert client.put('/recurring/PAY', json={"amount": 1.0001}, headers=headers).status_code == 400
+
+    # Materialized rows get the same amounts and names
+    client.post('/recurring/materialize', json={"through": "2025-01-31"}, headers=headers)
+    assert client.get('/transactions/RENT-20250101', headers=headers).get_json()["category"] == "Home"
+    assert client.get('/income/PAY-20250101', headers=headers).get_json()["amount"] == 850.125
+
+    # The account's amounts now include a schedule
+    response = client.put('/accounts/KWD', json={"currency": "USD"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_schedules_with_names_and_real_amounts_are_migrated(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "JPY", "name": "Tokyo", "currency": "JPY"}, headers=headers)
+    client.post('/accounts', json={"id": "USD", "name": "Checking", "currency": "USD"}, headers=headers)
+    user_id = db.get_user_by_username("alice")["id"]
+
+    with db.tenant(user_id):
+        conn = db.get_db_connection()
+        conn.execute("DROP TABLE recurring_schedules")
+        conn.execute("""CREATE TABLE recurring_schedules (
+                            id TEXT PRIMARY KEY, name TEXT NOT NULL, target TEXT NOT NULL,
+                            account_id TEXT NOT NULL, amount REAL NOT NULL, type TEXT, category TEXT,
+                            note TEXT, frequency TEXT NOT NULL, interval INTEGER NOT NULL DEFAULT 1,
+                            day_of_month INTEGER, weekday INTEGER, week_of_month INTEGER,
+                            start_date TEXT NOT NULL, end_date TEXT, materialized_through TEXT,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+        conn.executemany(
+            "INSERT INTO recurring_schedules (id, name, target, account_id, amount, type, category, frequency, "
+            "day_of_month, start_date) VALUES (?, ?, ?, ?, ?, ?, ?, 'monthly', 1, '2025-01-01')",
+            [("GYM", "Gym", "transactions", "USD", 39.99, "expense", "Fitness"),
+             ("PAY", "Pay", "income", "JPY", 300000.0, None, "Salary")]
+        )
+        conn.commit()
+        db.close_db_connection(conn)
+        db.init_db(verbose=False)
+
+    assert [row[1:3] for row in raw_schedules(user_id)] == [(3999, "integer"), (300000, "integer")]
+    schedules = {row["id"]: row for row in client.get('/recurring', headers=headers).get_json()["schedules"]}
+    assert (schedules["GYM"]["amount"], schedules["GYM"]["category"]) == (39.99, "Fitness")
+    assert (schedules["PAY"]["amount"], schedules["PAY"]["category"]) == (300000, "Salary")
+
+
+def add_schedule(client, headers, id, **fields):
+    body = {"id": id, "name": id, "target": "transactions", "type": "expense", "account_id": "ACC",
+            "amount": 10, "start_date": "2025-01-01", **fields}
+    return client.post('/recurring', json=body, headers=headers)
+
+
+def materialize(client, headers, through, **body):
+    return client.post('/recurring/materialize', json={"through": through, **body}, headers=headers).get_json()
+
+
+def occurrence_dates(client, headers, schedule_id):
+    rows = client.get('/transactions', headers=headers).get_json()["transactions"]
+    return sorted(row["date"] for row in rows if row["id"].startswith(schedule_id + "-"))
+
+
+def test_monthly_and_weekly_occurrences(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    add_schedule(client, headers, "D31", frequency="monthly", day_of_month=31, start_date="2024-01-31")
+    add_schedule(client, headers, "LAST", frequency="monthly", day_of_month=-1, start_date="2024-01-01")
+    add_schedule(client, headers, "BI", frequency="monthly", day_of_month=15, interval=2, start_date="2024-01-20")
+    add_schedule(client, headers, "FRI", frequency="weekly", weekday=4, interval=2, start_date="2024-01-01",
+                 end_date="2024-02-10")
+
+    assert materialize(client, headers, "2024-06-30")["schedules"] == 4
+    # Day 31 falls on the last day of shorter months, including a leap February
+    assert occurrence_dates(client, headers, "D31") == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30",
+                                                        "2024-05-31", "2024-06-30"]
+    assert occurrence_dates(client, headers, "LAST") == occurrence_dates(client, headers, "D31")
+    # Every other month from the start month; January's 15th is before the start
+    assert occurrence_dates(client, headers, "BI") == ["2024-03-15", "2024-05-15"]
+    # Every other Friday from the first one on or after the start, until the end date
+    assert occurrence_dates(client, headers, "FRI") == ["2024-01-05", "2024-01-19", "2024-02-02"]
+    assert client.get('/transactions/D31-20240229', headers=headers).get_json()["note"] == "D31"
+
+
+def test_nth_weekday_occurrences(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    add_schedule(client, headers, "TUE2", frequency="nth_weekday", weekday=1, week_of_month=2)
+    add_schedule(client, headers, "FRILAST", frequency="nth_weekday", weekday=4, week_of_month=-1)
+    add_schedule(client, headers, "MON5", frequency="nth_weekday", weekday=0, week_of_month=5)
+    add_schedule(client, headers, "PAY", target="income", category="Salary", frequency="nth_weekday",
+                 weekday=2, week_of_month=1, amount=2000)
+
+    materialize(client, headers, "2025-06-30")
+    assert occurrence_dates(client, headers, "TUE2") == ["2025-01-14", "2025-02-11", "2025-03-11", "2025-04-08",
+                                                         "2025-05-13", "2025-06-10"]
+    assert occurrence_dates(client, headers, "FRILAST") == ["2025-01-31", "2025-02-28", "2025-03-28",
+                                                            "2025-04-25", "2025-05-30", "2025-06-27"]
+    # Only months with five Mondays
+    assert occurrence_dates(client, headers, "MON5") == ["2025-03-31", "2025-06-30"]
+    income = client.get('/income', headers=headers).get_json()["income"]
+    assert sorted(row["date"] for row in income) == ["2025-01-01", "2025-02-05", "2025-03-05", "2025-04-02",
+                                                     "2025-05-07", "2025-06-04"]
+    assert {row["source"] for row in income} == {"Salary"}
+
+
+def test_materialize_is_idempotent_and_keeps_deleted_occurrences_deleted(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    add_schedule(client, headers, "RENT", frequency="monthly", day_of_month=1)
+    add_schedule(client, headers, "GYM", frequency="weekly", weekday=0)
+
+    assert materialize(client, headers, "2025-03-31")["created"] == {"transactions": 16, "income": 0}
+    assert materialize(client, headers, "2025-03-31")["created"] == {"transactions": 0, "income": 0}
+    assert materialize(client, headers, "2025-02-28")["created"] == {"transactions": 0, "income": 0}
+
+    client.delete('/transactions/RENT-20250201', headers=headers)
+    result = materialize(client, headers, "2025-04-30", schedule_id="RENT")
+    assert result["schedules"] == 1
+    assert result["created"] == {"transactions": 1, "income": 0}
+    assert occurrence_dates(client, headers, "RENT") == ["2025-01-01", "2025-03-01", "2025-04-01"]
+    assert client.get('/recurring/RENT', headers=headers).get_json()["materialized_through"] == "2025-04-30"
+
+    # GYM catches up from its own mark
+    assert materialize(client, headers, "2025-04-30")["created"] == {"transactions": 4, "income": 0}
+    assert len(occurrence_dates(client, headers, "GYM")) == 17
+
+
+def test_invalid_schedules_are_rejected(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+
+    for fields in ({"frequency": "monthly", "day_of_month": 32}, {"frequency": "monthly", "day_of_month": 0},
+                   {"frequency": "monthly"}, {"frequency": "weekly", "weekday": 7},
+                   {"frequency": "nth_weekday", "weekday": 1, "week_of_month": 6},
+                   {"frequency": "daily"}, {"frequency": "weekly", "weekday": 1, "interval": 0},
+                   {"frequency": "monthly", "day_of_month": 1, "end_date": "2024-12-31"},
+                   {"frequency": "monthly", "day_of_month": 1, "amount": -5},
+                   {"frequency": "monthly", "day_of_month": 1, "account_id": "NOPE"}):
+        assert add_schedule(client, headers, "BAD", **fields).status_code == 400, fields
+
+    assert client.post('/recurring/materialize', json={"through": "soon"}, headers=headers).status_code == 400
+    assert client.post('/recurring/materialize', json={"schedule_id": "NOPE"}, headers=headers).status_code == 400
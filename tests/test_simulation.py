@@ -0,0 +1,103 @@
+import numpy as np
+
+import services.simulation_service as simulation_service
+from services import SimulationService
+
+
+def seed_history(client, headers, food=(100, 100, 100)):
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    for i, amount in enumerate(food):
+        month = f"2025-0{i + 1}"
+        client.post('/income', json={"id": f"S{i}", "account_id": "ACC", "date": f"{month}-01", "amount": 1000,
+                                     "source": "Salary"}, headers=headers)
+        client.post('/transactions', json={"id": f"R{i}", "account_id": "ACC", "date": f"{month}-02", "amount": 400,
+                                           "type": "expense", "category": "Rent"}, headers=headers)
+        client.post('/transactions', json={"id": f"F{i}", "account_id": "ACC", "date": f"{month}-15",
+                                           "amount": amount, "type": "expense", "category": "Food"}, headers=headers)
+
+
+def simulate(client, headers, **body):
+    return client.post('/stats/simulate', json=body, headers=headers)
+
+
+def test_steady_history_projects_exactly_and_applies_shocks(client, login):
+    headers = login("alice")
+    seed_history(client, headers)
+
+    for method in ("bootstrap", "normal"):
+        result = simulate(client, headers, months=4, paths=200, method=method, seed=1).get_json()
+        assert result["starting_balance"] == 1500
+        assert result["history_months"] == ["2025-01", "2025-03"]
+        assert result["months"] == ["2025-04", "2025-05", "2025-06", "2025-07"]
+        assert result["mean"] == [2000, 2500, 3000, 3500]
+        assert set(result["percentiles"]) == {"p5", "p25", "p50", "p75", "p95"}
+        assert all(band == result["mean"] for band in result["percentiles"].values())
+
+    shocks = [{"kind": "expense", "category": "Food", "factor": 3, "months": [2, 3]},
+              {"kind": "income", "factor": 0.5, "months": [4]},
+              {"kind": "expense", "amount": 2500, "months": [1]},
+              {"kind": "income", "amount": 50}]
+    result = simulate(client, headers, months=4, paths=50, shocks=shocks, starting_balance=0,
+                      percentiles=[50], seed=2).get_json()
+    # Net per month: 500 - 2500 + 50, 500 - 200 + 50 twice, then 500 - 500 + 50
+    assert result["percentiles"] == {"p50": [-1950, -1600, -1250, -1200]}
+    assert result["probability_negative"] == [1, 1, 1, 1]
+    assert {(s["kind"], s["key"]): s["monthly_mean"] for s in result["series"]} == {
+        ("expense", "Food"): 100, ("expense", "Rent"): 400, ("income", "Salary"): 1000}
+
+
+def test_percentiles_follow_the_resampled_months(client, login):
+    headers = login("alice")
+    seed_history(client, headers, food=(100, 300, 700))
+
+    body = dict(months=6, paths=4000, starting_balance=0, percentiles=[5, 50, 95], seed=42)
+    result = simulate(client, headers, **body).get_json()
+    assert result == simulate(client, headers, **body).get_json()
+    assert result != simulate(client, headers, **dict(body, seed=43)).get_json()
+
+    # Bootstrap months replay one of the three historical nets
+    nets = np.array([500, 300, -100])
+    picks = np.random.default_rng(42).integers(0, 3, (4000, 6))
+    balances = np.cumsum(nets[picks], axis=1)
+    for p in (5, 50, 95):
+        assert result["percentiles"][f"p{p:g}"] == np.round(np.percentile(balances, p, axis=0), 2).tolist()
+    assert result["mean"] == np.round(balances.mean(axis=0), 2).tolist()
+    assert result["probability_negative"][0] == round(float((balances[:, 0] < 0).mean()), 4)
+
+    normal = simulate(client, headers, **dict(body, method="normal")).get_json()
+    bands = [normal["percentiles"][p] for p in ("p5", "p50", "p95")]
+    assert all(low < mid < high for low, mid, high in zip(*bands))
+    assert abs(normal["mean"][-1] - 6 * 700 / 3) < 60
+
+
+def test_large_runs_are_chunked_reproducibly(client, login, monkeypatch):
+    headers = login("alice")
+    seed_history(client, headers, food=(100, 300, 700))
+    monkeypatch.setattr(simulation_service, "SIMULATION_PARALLEL_MIN_PATHS", 100)
+    monkeypatch.setattr(simulation_service, "SIMULATION_CHUNK_PATHS", 64)
+    monkeypatch.setattr(simulation_service, "SIMULATION_N_JOBS", 1)
+
+    table = np.array([[500.0, 300.0, -100.0]] * 3)
+    first = SimulationService.run(table, table.mean(axis=1), np.zeros(3), "bootstrap", 300, seed=5)
+    assert first.shape == (300, 3)
+    np.testing.assert_array_equal(first, SimulationService.run(table, table.mean(axis=1), np.zeros(3),
+                                                               "bootstrap", 300, seed=5))
+    assert simulate(client, headers, months=3, paths=300, seed=5).get_json()["paths"] == 300
+
+
+def test_invalid_simulations_are_rejected(client, login):
+    headers = login("alice")
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    response = simulate(client, headers)
+    assert response.status_code == 400
+    assert "at least 2 months" in response.get_json()["error"]
+
+    seed_history(client, headers)
+    for body in ({"months": 0}, {"months": 61}, {"paths": 0}, {"method": "garch"}, {"percentiles": [101]},
+                 {"account_id": "NOPE"}, {"shocks": {"kind": "expense"}}, {"shocks": ["x"]},
+                 {"shocks": [{"kind": "transfer", "factor": 2}]},
+                 {"shocks": [{"kind": "expense", "factor": -1}]},
+                 {"shocks": [{"kind": "expense", "category": "Travel", "factor": 2}]},
+                 {"months": 3, "shocks": [{"kind": "income", "amount": 10, "months": [4]}]},
+                 {"paths": "many"}):
+        assert simulate(client, headers, **body).status_code == 400, body
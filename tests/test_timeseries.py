@@ -0,0 +1,65 @@
+def seed(client, headers):
+    client.post('/accounts', json={"id": "ACC", "name": "Main", "currency": "USD"}, headers=headers)
+    client.post('/accounts', json={"id": "CARD", "name": "Card", "currency": "USD"}, headers=headers)
+    for i, (date, amount, category, account) in enumerate([
+        ("2024-12-30", 5, "Food", "ACC"),    # Monday
+        ("2025-01-01", 10, "Food", "ACC"),   # Wednesday, same week
+        ("2025-01-06", 20, "Rent", "CARD"),  # next Monday
+        ("2025-01-31", 7.5, "Food", "CARD"),
+        ("2025-03-02", 30, "Rent", "ACC"),
+    ]):
+        client.post('/transactions', json={"id": f"T{i}", "account_id": account, "date": date, "amount": amount,
+                                           "type": "expense", "category": category}, headers=headers)
+    client.post('/transactions', json={"id": "REFUND", "account_id": "ACC", "date": "2025-01-02", "amount": 4,
+                                       "type": "income", "category": "Food"}, headers=headers)
+    client.post('/income', json={"id": "I1", "account_id": "ACC", "date": "2025-01-01", "amount": 100,
+                                 "source": "Salary"}, headers=headers)
+
+
+def timeseries(client, headers, query):
+    return client.get(f'/stats/timeseries?{query}', headers=headers).get_json()
+
+
+def test_buckets_per_granularity(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    series = timeseries(client, headers, 'granularity=month')
+    assert series["buckets"] == ["2024-12", "2025-01", "2025-02", "2025-03"]
+    assert series["series"] == [{"key": "Total", "values": [5, 37.5, 0, 30], "total": 72.5}]
+
+    series = timeseries(client, headers, 'granularity=week')
+    assert series["buckets"][:3] == ["2024-12-30", "2025-01-06", "2025-01-13"]
+    assert series["buckets"][-1] == "2025-02-24"
+    assert series["series"][0]["values"][:2] == [15, 20]
+    assert series["series"][0]["values"][-1] == 30
+
+    series = timeseries(client, headers, 'granularity=day&from=2024-12-30&to=2025-01-02')
+    assert series["buckets"] == ["2024-12-30", "2024-12-31", "2025-01-01", "2025-01-02"]
+    assert series["series"][0]["values"] == [5, 0, 10, 0]
+
+    series = timeseries(client, headers, 'granularity=year')
+    assert series["buckets"] == ["2024", "2025"]
+    assert series["series"][0]["values"] == [5, 67.5]
+
+
+def test_metrics_groups_and_empty_ranges(client, login):
+    headers = login("alice")
+    seed(client, headers)
+
+    series = timeseries(client, headers, 'metric=net&granularity=month&from=2025-01-01&to=2025-01-31')
+    assert series["series"] == [{"key": "Total", "values": [66.5], "total": 66.5}]
+    series = timeseries(client, headers, 'metric=income&granularity=year&group_by=category')
+    assert {entry["key"]: entry["values"] for entry in series["series"]} == {"Food": [4], "Salary": [100]}
+
+    series = timeseries(client, headers, 'granularity=month&group_by=account&from=2025-01-01&to=2025-02-28')
+    assert series["buckets"] == ["2025-01", "2025-02"]
+    assert {entry["key"]: entry["values"] for entry in series["series"]} == {"ACC": [10, 0], "CARD": [27.5, 0]}
+
+    series = timeseries(client, headers, 'granularity=month&from=2030-01-01&to=2030-02-28')
+    assert series["buckets"] == ["2030-01", "2030-02"]
+    assert series["series"] == []
+
+    assert client.get('/stats/timeseries?granularity=quarter', headers=headers).status_code == 400
+    assert client.get('/stats/timeseries?metric=balance', headers=headers).status_code == 400
+    assert client.get('/stats/timeseries?group_by=note', headers=headers).status_code == 400